@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+
+from hashlib import md5
+from tempfile import mkstemp as _mkstemp
+
+
+_MOONKEYS = ['rise_time', 'rise_az', 'set_time', 'set_az', 'transit_time', 'transit_az', 'transit_alt']
+
+_ALMANACS = {}
+
+def almanacPath(obs, directory=None):
+    """
+    Returns the path (without extension) of the almanac of an observatory or a :class:`Site`: its ``ObservatoryList`` id and a hash of the site parameters
+    """
+    if directory is None: directory = _core.almanacDir
+    site = repr((round(float(obs.long), 12), round(float(obs.lat), 12), float(obs.elevation), float(obs.pressure), float(obs.temp), str(obs.timezone), float(obs.horizon), float(_core.E.Date(obs.epoch))))
+    obsid = _core.re.sub(r'[^a-z0-9_-]', '', str(getattr(obs, 'id', None) or 'custom').lower()) or 'custom'
+    return _core.os.path.join(directory, "%s_%s" % (obsid, md5(site.encode('utf8')).hexdigest()[:12]))
+
+
+def findAlmanac(obs, directory=None):
+    """
+    Returns the :class:`Almanac` of the observatory or :class:`Site` ``obs`` if it was built, else ``None``. Almanacs are opened once per process, and re-opened if their file changed
+    """
+    path = almanacPath(obs, directory=directory)
+    try:
+        mtime = _core.os.stat(path+'.nights.npy').st_mtime
+    except OSError:
+        _ALMANACS.pop(path, None)
+        return None
+    if path not in _ALMANACS or _ALMANACS[path].mtime!=mtime:
+        _ALMANACS[path] = Almanac(path)
+    return _ALMANACS[path]
+
+
+def buildAlmanac(obs, fromDate, toDate, directory=None, **kwargs):
+    """
+    Precomputes the nights of an observatory from ``fromDate`` to ``toDate`` and stores them on disk, where :func:`Observatory.process_obs` will find them automatically
+
+    Args:
+      * obs (:class:`Observatory`): the observatory
+      * fromDate, toDate (see below): the range of dates of the almanac, in UT
+      * directory (str) [optional]: the directory of the almanacs, default is ``~/.astroobs/almanac`` or the ``ASTROOBS_ALMANAC`` environment variable
+
+    Kwargs:
+      See :class:`Almanac`
+
+    Returns:
+      The :class:`Almanac`
+
+    Stored for each night:
+      * the sun events of all twilights, see :func:`Observatory.sun_events`
+      * the moon rise, set and transit, searched from the start of the default ``dates`` vector of :func:`Observatory.process_obs`
+      * the Chebyshev segments of the :class:`MoonCache` of the site
+
+    .. note::
+      * ``fromDate`` and ``toDate`` can be date-tuples ``(yyyy, mm, dd, [hh, mm, ss])``, timestamps, datetime structures or ephem.Date instances.
+      * The almanac of a site is identified by the ``ObservatoryList`` id and site parameters (coordinates, elevation, pressure, temperature, timezone, epoch), building it again replaces it
+
+    >>> import astroobs as obs
+    >>> o = obs.Observatory('vlt')
+    >>> obs.buildAlmanac(o, (2015,1,1), (2025,1,1))
+    """
+    if directory is None: directory = _core.almanacDir
+    path = almanacPath(obs, directory=directory)
+    grid = obs._night_grid(_core.rangeDates(fromDate=fromDate, toDate=toDate, dday=1), pts=2)
+    dtype = [('night', 'f8'), ('start', 'f8')] + grid['events'].dtype.descr + [('moon_'+item, 'f8') for item in _MOONKEYS] + [('moon_alwaysUp', 'i1')]
+    nights = _core.np.zeros(grid['midnights'].size, dtype=dtype)
+    nights['night'] = grid['midnights']
+    nights['start'] = grid['dates'][:, 0]
+    for key in grid['events'].dtype.names:
+        nights[key] = grid['events'][key]
+    from .Night import _riseSetTransit # Night reads the almanacs
+    site = obs.site
+    for idx, start in enumerate(nights['start']):
+        moon = _riseSetTransit(site, _core.E.Moon(), start)
+        for item in _MOONKEYS:
+            nights['moon_'+item][idx] = _core.np.nan if moon[item] is None else float(moon[item])
+        nights['moon_alwaysUp'][idx] = int(moon.get('alwaysUp', -1))
+    cache = obs._moonCache()
+    segs = _core.np.arange(_core.np.floor(nights['start'].min()/cache.span)-1, _core.np.floor(nights['start'].max()/cache.span)+3).astype(int)
+    cache.evaluate((segs+0.5)*cache.span) # fits all segments
+    moon = _core.np.zeros(segs.size, dtype=[('seg', 'i8'), ('coefs', 'f8', cache._coefs[segs[0]].shape)])
+    moon['seg'] = segs
+    moon['coefs'] = [cache._coefs[item] for item in segs]
+    if not _core.os.path.isdir(directory): _core.os.makedirs(directory)
+    for ext, data in [('.moon.npy', moon), ('.nights.npy', nights)]: # nights last: its presence marks a complete almanac
+        fd, tmp = _mkstemp(suffix='.tmp.npy', dir=directory) # one per builder, so that concurrent builds do not collide
+        with _core.os.fdopen(fd, 'wb') as f:
+            _core.np.save(f, data)
+        _core.os.replace(tmp, path+ext) # atomic: readers see the old or the new file, never none
+    return findAlmanac(obs, directory=directory)
+
+
+class Almanac(object):
+    """
+    A read-only almanac of an observatory built by :func:`buildAlmanac`, memory-mapped from disk
+
+    Args:
+      * path (str): the path of the almanac, without extension, see :func:`almanacPath`
+
+    Kwargs:
+      * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+
+    Raises:
+      N/A
+    """
+    def __init__(self, path, **kwargs):
+        self._raiseError = bool(kwargs.get('raiseError', False))
+        self.path = str(path)
+        self.mtime = _core.os.stat(self.path+'.nights.npy').st_mtime
+        self.nights = _core.np.load(self.path+'.nights.npy', mmap_mode='r')
+        self.moon = _core.np.load(self.path+'.moon.npy', mmap_mode='r')
+
+    def _info(self):
+        return "Almanac of %i nights from %s to %s" % (self.nights.size, _core.E.Date(self.nights['night'][0]), _core.E.Date(self.nights['night'][-1]))
+    def __repr__(self):
+        return self._info()
+    def __str__(self):
+        return self._info()
+
+    def night(self, midnight):
+        """
+        Returns the row of the night whose local midnight in UT is ``midnight`` (ephem.Date), or ``None`` if out of the almanac
+        """
+        idx = _core.np.searchsorted(self.nights['night'], float(midnight)-1e-6)
+        if idx>=self.nights.size or abs(self.nights['night'][idx]-float(midnight))>1e-6: return None
+        return self.nights[idx]
+
+    def moon_events(self, row):
+        """
+        Returns the rise, set and transit attributes of the moon of a night ``row``, as a dictionary; ``alwaysUp`` is only given in polar cases
+        """
+        ret = {}
+        for item in _MOONKEYS:
+            value = row['moon_'+item]
+            ret[item] = None if _core.np.isnan(value) else (_core.E.Date(value) if item.endswith('time') else float(value))
+        if row['moon_alwaysUp']>=0: ret['alwaysUp'] = bool(row['moon_alwaysUp'])
+        return ret
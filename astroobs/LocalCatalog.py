@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+from . import _astroobsexception as _exc
+
+from .Target import _radians
+from .TargetSIMBAD import TargetSIMBAD
+
+
+_BANDS = ['U', 'B', 'V', 'R', 'I', 'J', 'H', 'K']
+
+def _normName(name):
+    """
+    Normalizes a target name for the catalog index: lower case, without whitespaces, so that ``'HD 172167'``, ``'hd172167'`` and ``' Hd  172167'`` are the same
+    """
+    return "".join(str(name).lower().split())
+
+
+class LocalCatalog(object):
+    """
+    Loads a local star catalog to resolve target names without SIMBAD, see :func:`Observation.add_target`
+
+    Args:
+      * dataFile (str): path+file to the catalog. See below
+
+    Kwargs:
+      * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+
+    Raises:
+      * Exception: if a line of the catalog is not complete or not understood
+
+    The catalog is a text file, as the observatories database: lines starting with ``#`` are comments, except the ``#heads#`` line which gives the columns, separated by ``;``. Columns are identified by the first word of their header (case insensitive):
+      * ``name`` (mandatory): the main name of the target
+      * ``ra`` (mandatory): the right ascension, 'hh:mm:ss.s' or decimal degrees
+      * ``dec`` (mandatory): the declination, '+/-dd:mm:ss.s' or decimal degrees
+      * ``aliases``: other names of the target, separated by ``|``
+      * ``hd``, ``hr``, ``hip``: the catalog numbers, which are also indexed as names (e.g. 'HD 172167')
+      * ``sptype``: the spectral type
+      * ``plx``: the parallax (mas)
+      * ``U``, ``B``, ``V``, ``R``, ``I``, ``J``, ``H``, ``K``: the magnitudes
+
+    Empty values are missing values. Names are indexed in lower case and without whitespaces.
+
+    >>> import astroobs as obs
+    >>> cat = obs.LocalCatalog('bright.txt')
+    >>> cat['alf lyr']
+    {'ra': '18:36:56.336', 'dec': '+38:47:01.28', 'flux': {'V': 0.03}, 'sptype': 'A0Va', 'plx': 130.23, 'hd': 172167, 'hr': 7001, 'hip': 91262}
+    >>> o = obs.Observation('ohp', local_date=(2015,3,31))
+    >>> o.catalog = cat
+    >>> o.add_target('HD172167')
+    """
+    def __init__(self, dataFile, **kwargs):
+        self._raiseError = bool(kwargs.get('raiseError', False))
+        self.dataFile = str(dataFile)
+        self._load(**kwargs)
+
+    def _load(self, **kwargs):
+        """
+        Loads the catalog and builds the name index
+        """
+        lines = [item.strip() for item in open(self.dataFile).readlines()]
+        heads = [item[7:] for item in lines if item[:7]=='#heads#']
+        if len(heads)==0:
+            if _exc.raiseIt(_exc.UncompleteCatalog, self._raiseError, self.dataFile, '#heads#'): return
+        cols = dict((item.strip().split(' ')[0].lower(), idx) for idx, item in enumerate(heads[0].split(';')) if item.strip()!="")
+        for item in ['name', 'ra', 'dec']:
+            if item not in cols:
+                if _exc.raiseIt(_exc.UncompleteCatalog, self._raiseError, self.dataFile, item): return
+        self.names = []
+        self.records = []
+        self._index = {}
+        for line in lines:
+            if line[:1]=='#' or line=="": continue
+            item = [value.strip() for value in line.split(';')]
+            get = lambda key: item[cols[key]] if key in cols and cols[key]<len(item) and item[cols[key]]!="" else None
+            try:
+                record = {'ra': self._angle(get('ra'), 15.), 'dec': self._angle(get('dec'), 1.),
+                          'flux': dict((band, float(get(band.lower()))) for band in _BANDS if get(band.lower()) is not None),
+                          'sptype': str(get('sptype') or ""), 'plx': None if get('plx') is None else float(get('plx'))}
+                for key in ['hd', 'hr', 'hip']:
+                    record[key] = None if get(key) is None else int(_core.make_num(get(key)))
+            except (TypeError, ValueError):
+                _exc.raiseIt(_exc.UncompleteCatalog, self._raiseError, self.dataFile, line) # reported, then the line is skipped
+                continue
+            idx = len(self.records)
+            self.names.append(str(get('name')))
+            self.records.append(record)
+            aliases = [get('name')] + (get('aliases') or "").split('|') + ["%s %i" % (key, record[key]) for key in ['hd', 'hr', 'hip'] if record[key] is not None]
+            for alias in aliases:
+                alias = _normName(alias)
+                if alias!="" and alias not in self._index: self._index[alias] = idx
+
+    @staticmethod
+    def _angle(value, factor):
+        """
+        Returns a sexagesimal angle string as is, and a decimal degree angle in hours (``factor=15``) or degrees (``factor=1``). Raises ValueError if the angle cannot be parsed
+        """
+        if value is None: raise ValueError(value)
+        try:
+            return repr(float(value)/factor)
+        except ValueError:
+            _radians(str(value), hours=(factor==15.)) # checks it now rather than at the first use of the target
+            return str(value)
+
+    def _info(self):
+        return "Local catalog of %i targets, %i names" % (len(self.records), len(self._index))
+    def __repr__(self):
+        return self._info()
+    def __str__(self):
+        return self._info()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, name):
+        return _normName(name) in self._index
+
+    def __getitem__(self, name):
+        idx = self._index.get(_normName(name))
+        if idx is None:
+            if _exc.raiseIt(_exc.TargetMissingCatalog, self._raiseError, name): return
+            return None
+        return self.records[idx]
+
+    def get(self, name, default=None):
+        """
+        Returns the record (see :class:`SIMBADCache`) of the target ``name``, or ``default`` if it is not in the catalog
+        """
+        idx = self._index.get(_normName(name))
+        return default if idx is None else self.records[idx]
+
+    def target(self, name, obs=None, **kwargs):
+        """
+        Returns the target ``name`` from the catalog as a :class:`TargetSIMBAD` with the same attributes (``flux``, ``sptype``, ``plx``, ``hd``, ``hr``, ``hip``), optionally processed for the observatory ``obs``; ``None`` if it is not in the catalog
+        """
+        record = self.get(name)
+        if record is None:
+            if _exc.raiseIt(_exc.TargetMissingCatalog, self._raiseError, name): return
+            return None
+        kwargs['record'] = record
+        return TargetSIMBAD(name=name, obs=obs, **kwargs)
@@ -30,6 +30,7 @@ from . import _core
 from . import _astroobsexception as _exc
 
 from .Target import Target
+from .Night import _nightMoonEphem
 
 class Moon(Target):
     """
@@ -90,7 +91,7 @@ class Moon(Target):
         A pretty printable version of the mean of the declination of the moon
         """
         dms = self._dec.dms
-        return "%s%i°%i'%2.1f\"" % ((dms[0].mean()>0)*'+', dms[0].mean(), dms[1].mean(), dms[2].mean())
+        return "%s%i°%i'%2.1f\"" % ('+' if dms[0].mean()>0 else '', dms[0].mean(), dms[1].mean(), dms[2].mean())
     @decStr.setter
     def decStr(self, value):
         if _exc.raiseIt(_exc.ReadOnly, self._raiseError, 'decStr'): return
@@ -156,6 +157,8 @@ class Moon(Target):
 
         .. note::
           * All previous attributes are vectors related to the time vector of the observatory used for processing: ``obs.dates``
+          * With the default numpy engine, the moon of the ``night`` of the observatory is used, interpolated from the :class:`MoonCache` of the observatory site (see :func:`processNight`); ``engine='pyephem'`` computes it with pyephem for each element of ``obs.dates``
+          * The observatory is not modified
 
         Other attributes:
           * ``rise_time``, ``rise_az``: the time (ephem.Date) and the azimuth (degree) of the rise of the moon
@@ -165,32 +168,22 @@ class Moon(Target):
         .. warning::
           * it can occur that the moon does not rise or set for an observatory/date combination. In that case, the corresponding attributes will be set to ``None``, i.e. ``set_time``, ``set_az``, ``rise_time``, ``rise_az``. In that case, an additional parameter is added to the Moon object: ``Moon.alwaysUp`` which is ``True`` if the Moon never sets and ``False`` if it never rises above the horizon.
         """
-        save_date = obs.date # saves the date
-        obs.date = _core.E.Date(obs.dates[0])
-        self.ha = []
-        self.airmass = []
-        self.phase = []
-        self.alt = []
-        self.az = []
-        self._ra = []
-        self._dec = []
-        target = _core.E.Moon()
-        self._set_RiseSetTransit(target=target, obs=obs, **kwargs)
-        for t in range(len(obs.dates)):
-            obs.date = obs.dates[t] # forces obs date for target calculations
-            target.compute(obs) # target calculation
-            self.phase.append(target.phase)
-            self.airmass.append(_core.rad_to_airmass(target.alt))
-            self.alt.append(target.alt)
-            self.az.append(target.az)
-            self._ra.append(target.a_ra)
-            self._dec.append(target.a_dec)
-            self.ha.append(obs.lst[t] - target.a_ra)
-        obs.date = save_date # sets obs date back
-        self.alt = _core.np.rad2deg(self.alt)
-        self.az = _core.np.rad2deg(self.az)
-        self.ha = _core.np.rad2deg(self.ha)
-        self._ra = _core.np.rad2deg(_core.Angle(self._ra, 'rad'))
-        self._dec = _core.np.rad2deg(_core.Angle(self._dec, 'rad'))
-        self.airmass = _core.np.asarray(self.airmass)
-        self.phase = _core.np.asarray(self.phase)
+        night = obs.night
+        if _core.pyephemEngine(kwargs):
+            self._set_night(_nightMoonEphem(night.site, night.dates, night.lst))
+        else:
+            self._set_night(night.moon)
+
+    def _set_night(self, moon):
+        """
+        Sets the attributes of the moon from a :class:`NightMoon`
+        """
+        for k, v in moon.events.items():
+            setattr(self, k, v)
+        self.phase = moon.phase
+        self.airmass = moon.airmass
+        self.alt = moon.alt
+        self.az = moon.az
+        self.ha = moon.ha
+        self._raRad = moon.a_ra
+        self._decRad = moon.a_dec
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+from . import _astroobsexception as _exc
+
+
+_CACHES = {}
+
+def getMoonCache(long, lat, elevation, epoch=None, span=1., deg=16, **kwargs):
+    """
+    Returns the :class:`MoonCache` shared by all observatories of the same site and epoch, creates it if needed
+
+    Args:
+      * long, lat (float - radian): the longitude and latitude of the site
+      * elevation (float - m): the elevation of the site
+      * epoch (ephem.Date) [optional]: the epoch of the astrometric ra-dec, default is J2000
+      * span (float - day) [optional]: the time span of each Chebyshev segment
+      * deg (int) [optional]: the degree of the Chebyshev polynomials
+    """
+    if epoch is None: epoch = _core.E.J2000
+    key = (float(long), float(lat), float(elevation), float(_core.E.Date(epoch)), float(span), int(deg))
+    if key not in _CACHES:
+        _CACHES.setdefault(key, MoonCache(long=long, lat=lat, elevation=elevation, epoch=epoch, span=span, deg=deg, **kwargs)) # the first one wins if threads race
+    return _CACHES[key]
+
+
+class MoonCache(object):
+    """
+    Caches the Chebyshev coefficients of the position and phase of the Moon for an observing site, fitted on pyephem over segments of ``span`` days, so that the Moon is evaluated at any dates by polynomial evaluation. Segments are fitted when first needed.
+
+    Args:
+      * long, lat (float - radian): the longitude and latitude of the site
+      * elevation (float - m): the elevation of the site
+      * epoch (ephem.Date) [optional]: the epoch of the astrometric ra-dec ``a_ra``, ``a_dec``, default is J2000
+      * span (float - day) [optional]: the time span of each Chebyshev segment
+      * deg (int) [optional]: the degree of the Chebyshev polynomials
+
+    Kwargs:
+      * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+
+    Raises:
+      N/A
+
+    .. note::
+      * With the default ``span=1`` and ``deg=16``, the interpolated positions are within 0.001 arcsec of pyephem and the phase within 1e-4 %, i.e. pyephem's own numerical noise. Fewer coefficients per day degrade fast: ``span=2``, ``deg=20`` gives 0.05 arcsec, ``span=1``, ``deg=12`` gives 0.02 arcsec
+      * The positions are topocentric, without refraction: the refraction depends on the pressure and temperature and is applied when computing altitudes
+    """
+    _keys = ['ra', 'dec', 'a_ra', 'a_dec', 'phase']
+
+    def __init__(self, long, lat, elevation, epoch=None, span=1., deg=16, **kwargs):
+        self._raiseError = bool(kwargs.get('raiseError', False))
+        self.long = float(long)
+        self.lat = float(lat)
+        self.elevation = float(elevation)
+        self.epoch = float(_core.E.Date(_core.E.J2000 if epoch is None else epoch))
+        self.span = float(span)
+        self.deg = int(deg)
+        self._nodes = _core.np.cos(_core.np.pi*(_core.np.arange(self.deg+1)+0.5)/(self.deg+1))
+        self._coefs = {}
+        self._stores = {}
+
+    def _info(self):
+        return "Moon cache at %s %s - %i segments of %2.1f days" % (_core.E.degrees(self.long), _core.E.degrees(self.lat), len(self._coefs), self.span)
+    def __repr__(self):
+        return self._info()
+    def __str__(self):
+        return self._info()
+
+    @property
+    def nsegments(self):
+        """
+        The number of Chebyshev segments fitted so far
+        """
+        return len(self._coefs)
+    @nsegments.setter
+    def nsegments(self, value):
+        if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "nsegments"): return
+
+    def attach(self, key, segs, coefs):
+        """
+        Attaches precomputed segments (e.g. memory-mapped from an :class:`Almanac`) under ``key``, used instead of fitting. ``segs`` are the contiguous segment indices and ``coefs`` their coefficients, of the span and degree of the cache
+        """
+        if len(segs)==0 or _core.np.shape(coefs)[1:]!=(len(self._keys), self.deg+1): return
+        self._stores[key] = (int(segs[0]), int(segs[-1]), coefs)
+
+    def _fit(self, seg):
+        """
+        Fits the Chebyshev coefficients of the segment index ``seg``, from pyephem at Chebyshev nodes, unless it is found in an attached store
+        """
+        for first, last, coefs in self._stores.values():
+            if first<=seg<=last:
+                self._coefs[seg] = _core.np.array(coefs[seg-first])
+                return
+        ob = _core.E.Observer()
+        ob.lon = self.long
+        ob.lat = self.lat
+        ob.elevation = self.elevation
+        ob.pressure = 0.
+        ob.epoch = self.epoch
+        moon = _core.E.Moon()
+        values = []
+        for d in (seg+(self._nodes+1)/2.)*self.span:
+            ob.date = d
+            moon.compute(ob)
+            values.append((moon.ra, moon.dec, moon.a_ra, moon.a_dec, moon.phase))
+        values = _core.np.asarray(values)
+        values[:, 0] = _core.np.unwrap(values[:, 0])
+        values[:, 2] = _core.np.unwrap(values[:, 2])
+        self._coefs[seg] = _core.np.polynomial.chebyshev.chebfit(self._nodes, values, self.deg)
+
+    def evaluate(self, dates):
+        """
+        Evaluates the Moon at ``dates`` (ephem.Date, any shape)
+
+        Returns a dictionary of arrays of the shape of ``dates``:
+          * ``ra``, ``dec``: the apparent topocentric right ascension and declination (radian)
+          * ``a_ra``, ``a_dec``: the astrometric topocentric right ascension and declination (radian)
+          * ``phase``: the illuminated fraction of the surface (%)
+        """
+        dates = _core.np.asarray(dates, dtype=float)
+        segs = _core.np.floor(dates/self.span).astype(int)
+        values = _core.np.empty((len(self._keys),)+dates.shape)
+        for seg in _core.np.unique(segs):
+            if seg not in self._coefs: self._fit(seg)
+            here = segs==seg
+            x = 2*(dates[here]/self.span-seg)-1
+            values[:, here] = _core.np.polynomial.chebyshev.chebval(x, self._coefs[seg])
+        values[0] %= 2*_core.np.pi
+        values[2] %= 2*_core.np.pi
+        return dict(zip(self._keys, values))
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+from . import _astroobsexception as _exc
+from . import _kernels
+
+from . import _cache
+
+from .MoonCache import getMoonCache
+from .Almanac import findAlmanac
+
+from collections import namedtuple
+
+
+_nightCache = _cache.LRUCache(maxsize=64)
+
+def night_cache_info():
+    """
+    Returns the statistics of the cache of nights shared by all observatories (see :func:`processNight`): a dictionary with ``hits``, ``misses``, ``size``, ``maxsize``
+    """
+    return _nightCache.info()
+
+def night_cache_clear(maxsize=None):
+    """
+    Empties the cache of nights shared by all observatories and resets its statistics, optionally changes its maximum number of nights ``maxsize``
+    """
+    _nightCache.clear(maxsize=maxsize)
+
+
+class Site(namedtuple('Site', ['long', 'lat', 'elevation', 'temp', 'pressure', 'horizon', 'epoch', 'timezone', 'horizon_obs', 'moonAvoidRadius', 'id'])):
+    """
+    The immutable description of an observing site, as given by :func:`Observatory.site`
+
+    Fields:
+      * ``long``, ``lat`` (float - radian): the longitude and latitude
+      * ``elevation`` (float - m): the elevation
+      * ``temp`` (float - degC), ``pressure`` (float - mBar): the atmosphere, for the refraction
+      * ``horizon`` (float - radian): the altitude of the horizon
+      * ``epoch`` (float): the epoch (ephem.Date) of the ra-dec coordinates
+      * ``timezone`` (str): the timezone, e.g. ``'Europe/Paris'``
+      * ``horizon_obs`` (float - degrees): the minimum altitude at which a target can be observed
+      * ``moonAvoidRadius`` (float - degrees): the minimum distance between a target and the moon
+      * ``id`` (str): the id of the observatory in the database, ``None`` for custom sites
+    """
+    __slots__ = ()
+
+
+class NightMoon(namedtuple('NightMoon', ['phase', 'airmass', 'alt', 'az', 'ha', 'a_ra', 'a_dec', 'events'])):
+    """
+    The moon over a :class:`Night`: read-only vectors of its ``phase`` (%), ``airmass``, ``alt``, ``az``, ``ha`` (degrees) and astrometric ``a_ra``, ``a_dec`` (radian) for each element of ``Night.dates``, and the dictionary ``events`` of its rise, set and transit attributes, see :func:`Moon.process`
+    """
+    __slots__ = ()
+
+
+class Night(namedtuple('Night', ['site', 'date', 'events', 'dates', 'lst', 'moon'])):
+    """
+    The immutable description of a processed night, as returned by :func:`processNight`
+
+    Fields:
+      * ``site`` (:class:`Site`): the site
+      * ``date`` (float): the local midnight in UT (ephem.Date)
+      * ``events``: the sun events of the night, see :func:`Observatory.sun_events`
+      * ``dates``: the read-only vector of Dublin Julian Dates of the night
+      * ``lst``: the read-only vector of local sidereal times (hours) of ``dates``
+      * ``moon`` (:class:`NightMoon`): the moon over ``dates``
+    """
+    __slots__ = ()
+
+
+def _readonly(arr):
+    """
+    Returns ``arr`` as a read-only float array
+    """
+    arr = _core.np.asarray(arr, dtype=float)
+    arr.flags.writeable = False
+    return arr
+
+
+def _observer(site, date=None):
+    """
+    Returns a standalone pyephem Observer of the ``site``, at ``date`` if given
+    """
+    ob = _core.E.Observer()
+    ob.lon, ob.lat, ob.elevation = site.long, site.lat, site.elevation
+    ob.temp, ob.pressure, ob.horizon, ob.epoch = site.temp, site.pressure, site.horizon, site.epoch
+    if date is not None: ob.date = date
+    return ob
+
+
+def _riseSetTransit(site, body, start):
+    """
+    Searches with pyephem the next setting of the pyephem ``body`` after ``start``, the previous rising before this setting, and the next transit after this rising (after ``start`` if the body does not rise or set)
+
+    Returns the dictionary of the attributes ``rise_time``, ``rise_az``, ``set_time``, ``set_az``, ``transit_time``, ``transit_az``, ``transit_alt`` (ephem.Date and degrees, ``None`` if the body does not rise or set); ``alwaysUp`` is only given in that case
+    """
+    ob = _observer(site, start)
+    ret = {'rise_time': None, 'rise_az': None, 'set_time': None, 'set_az': None}
+    try: # try block to catch NeverUp or AlwaysUp errors from pyephem in case of polar region
+        ret['set_time'] = ob.next_setting(body)
+        ob.date = ret['set_time']
+        body.compute(ob)
+        ret['set_az'] = _core.np.rad2deg(body.az)
+        ret['rise_time'] = ob.previous_rising(body)
+        ob.date = ret['rise_time']
+        body.compute(ob)
+        ret['rise_az'] = _core.np.rad2deg(body.az)
+    except _core.E.AlwaysUpError:
+        ret['alwaysUp'] = True
+    except _core.E.NeverUpError:
+        ret['alwaysUp'] = False
+    ob.date = start if ret['rise_time'] is None else ret['rise_time']
+    ret['transit_time'] = ob.next_transit(body)
+    ob.date = ret['transit_time']
+    body.compute(ob)
+    ret['transit_az'] = _core.np.rad2deg(body.az)
+    ret['transit_alt'] = _core.np.rad2deg(body.alt)
+    return ret
+
+
+def _moonAltaz(site, dates):
+    """
+    Returns the apparent altitude and azimuth (radian) of the moon at ``dates`` (any shape), interpolated from the :class:`MoonCache` of the site
+    """
+    dates = _core.np.asarray(dates, dtype=float)
+    moon = getMoonCache(long=site.long, lat=site.lat, elevation=site.elevation, epoch=site.epoch).evaluate(dates)
+    ha, alt, az = _kernels.altaz(ra=moon['ra'], dec=moon['dec'], lst=_kernels.sidereal_time(dates, site.long), lat=site.lat, pressure=site.pressure, temp=site.temp)
+    return alt, az
+
+
+def _nightDates(site, date, events, pts=200, margin=15, fullhour=False, sampling='linear', tol=0.05, curves=None):
+    """
+    Returns the vector of dates of the night of local midnight ``date``, from its sun ``events``: see :func:`processNight`
+    """
+    if not (_core.np.isnan(events['sunset']) or _core.np.isnan(events['sunrise'])):
+        if fullhour:
+            start = _core.E.Date(int(events['sunset']*24)/24.)
+            end = _core.E.Date(int(events['sunrise']*24+1)/24.)
+        else:
+            start = _core.E.Date(float(events['sunset']) - margin*_core.E.minute)
+            end = _core.E.Date(float(events['sunrise']) + margin*_core.E.minute)
+    else: # no sunrise or sunset, polar regions: from local midday to local midday
+        localnight = _core.convertTime(_core.E.Date(date), site.timezone, 'utc', format='dt')
+        start = _core.convertTime(localnight.replace(hour=12, minute=0, second=0, microsecond=0), 'utc', site.timezone, format='ed')
+        end = _core.convertTime(_core.E.Date(_core.E.Date(localnight)+1).datetime().replace(hour=11, minute=59, second=59, microsecond=0), 'utc', site.timezone, format='ed')
+    dates = _core.np.linspace(start, end, int(pts))
+    if sampling=='adaptive':
+        if curves is None: curves = lambda t: _core.np.rad2deg(_moonAltaz(site, t)[0])[None, :]
+        sunevents = [events['sun'+item+mode] for item in ['set', 'rise'] for mode, hzn in _kernels.TWILIGHTS]
+        dates = _kernels.adaptive_grid(start=dates[0], end=dates[-1], func=curves, events=[item for item in sunevents if not _core.np.isnan(item)], pts=pts, tol=tol)
+    return dates
+
+
+def _nightMoon(site, dates, lst, events=None):
+    """
+    Returns the :class:`NightMoon` at ``dates``, interpolated from the :class:`MoonCache` of the site. Its rise, set and transit are searched with pyephem unless ``events`` are given
+    """
+    moon = getMoonCache(long=site.long, lat=site.lat, elevation=site.elevation, epoch=site.epoch).evaluate(dates)
+    ha, alt, az = _kernels.altaz(ra=moon['ra'], dec=moon['dec'], lst=lst*_core.np.pi/12, lat=site.lat, pressure=site.pressure, temp=site.temp)
+    if events is None: events = _riseSetTransit(site, _core.E.Moon(), dates[0])
+    return NightMoon(phase=_readonly(moon['phase']), airmass=_readonly(_kernels.rad_to_airmass(alt)), alt=_readonly(_core.np.rad2deg(alt)), az=_readonly(_core.np.rad2deg(az)), ha=_readonly(_core.np.rad2deg(ha)), a_ra=_readonly(moon['a_ra']), a_dec=_readonly(moon['a_dec']), events=events)
+
+
+def _nightMoonEphem(site, dates, lst):
+    """
+    Reference of :func:`_nightMoon`: pyephem computation for each element of ``dates``
+    """
+    ob = _observer(site)
+    body = _core.E.Moon()
+    events = _riseSetTransit(site, body, dates[0])
+    values = []
+    for t in range(len(dates)):
+        ob.date = dates[t]
+        body.compute(ob)
+        values.append((body.phase, _core.rad_to_airmass(body.alt), body.alt, body.az, _kernels.wrap_pi(lst[t]*_core.np.pi/12 - body.ra), body.a_ra, body.a_dec))
+    values = _core.np.asarray(values, dtype=float).reshape(-1, 7)
+    return NightMoon(phase=_readonly(values[:, 0]), airmass=_readonly(values[:, 1]), alt=_readonly(_core.np.rad2deg(values[:, 2])), az=_readonly(_core.np.rad2deg(values[:, 3])), ha=_readonly(_core.np.rad2deg(values[:, 4])), a_ra=_readonly(values[:, 5]), a_dec=_readonly(values[:, 6]), events=events)
+
+
+def processNight(site, date, pts=200, margin=15, fullhour=False, sampling='linear', tol=0.05, curves=None, **kwargs):
+    """
+    Processes the twilights, the dates, the sidereal time and the moon of a night, without any observatory object: nothing is modified, so that any number of threads can process nights of one site at once
+
+    Args:
+      * site (:class:`Site`): the site, e.g. ``Observatory.site``
+      * date (see below): the local midnight of the night in UT, as ``Observatory.date``
+      * pts, margin, fullhour, sampling, tol: see :func:`Observatory.process_obs`
+      * curves (callable) [optional]: with ``'adaptive'`` sampling, ``curves(dates)`` returns the (n_curves x n_dates) curves (degrees) followed by the sampling, each crossing a threshold of interest at 0. Default is the altitude of the moon
+
+    Kwargs:
+      * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+
+    Raises:
+      * KeyError: if the sampling mode is unknown
+
+    Returns:
+      The :class:`Night`
+
+    .. note::
+      * ``date`` can be a date-tuple ``(yyyy, mm, dd, [hh, mm, ss])``, timestamp, datetime structure or ephem.Date instance.
+      * The nights precomputed by :func:`buildAlmanac` for the site are read from disk
+      * With ``'linear'`` sampling, the nights are kept in a cache keyed by site, night, ``pts``, ``margin`` and ``fullhour``, see :func:`night_cache_info`, :func:`night_cache_clear`
+
+    >>> import astroobs as obs
+    >>> site = obs.Observatory('vlt').site
+    >>> night = obs.processNight(site, (2015,1,1,5))
+    >>> night.moon.alt.max()
+    """
+    date = float(_core.cleanTime(date, format='ed'))
+    sampling = str(sampling).lower()
+    if sampling not in ['linear', 'adaptive']:
+        if _exc.raiseIt(_exc.UnknownSampling, bool(kwargs.get('raiseError', False)), sampling): return
+    key = None
+    if sampling=='linear':
+        key = tuple(site[:8]) + (round(date, 8), int(pts), float(margin), bool(fullhour))
+        night = _nightCache.get(key)
+        if night is not None:
+            return night if night.site==site else night._replace(site=site)
+    almanac = findAlmanac(site)
+    events = None if almanac is None else almanac.night(date)
+    moonevents = None
+    if events is None:
+        events = _kernels.sun_events(nights=[date], long=site.long, lat=site.lat, horizon=site.horizon, pressure=site.pressure, temp=site.temp)[0]
+    else: # precomputed night
+        getMoonCache(long=site.long, lat=site.lat, elevation=site.elevation, epoch=site.epoch).attach(almanac.path, almanac.moon['seg'], almanac.moon['coefs'])
+        start, moonevents = float(events['start']), almanac.moon_events(events)
+        events = _core.np.array(events)[()]
+    dates = _nightDates(site, date, events, pts=pts, margin=margin, fullhour=fullhour, sampling=sampling, tol=tol, curves=curves)
+    if moonevents is not None and abs(start-dates[0])>=1e-9: moonevents = None # searched from another start
+    lst = _kernels.sidereal_time(dates, site.long)*12/_core.np.pi # get radians to hours
+    night = Night(site=site, date=date, events=events, dates=_readonly(dates), lst=_readonly(lst), moon=_nightMoon(site, dates, lst, events=moonevents))
+    if key is not None: _nightCache.put(key, night)
+    return night
+
+
+def processTargets(night, coords, epochs):
+    """
+    Processes fixed targets for a night, without any observatory or target object: nothing is modified, so that it can run in threads or worker processes
+
+    Args:
+      * night (:class:`Night`): the night, see :func:`processNight`
+      * coords: the (n x 2) ra-dec (radian) of the targets in their input epochs
+      * epochs (list of str): the n 'YYYY' input epochs of the targets
+
+    Returns:
+      * radec: the (n x 4) apparent ra-dec and astrometric ra-dec in the epoch of the site (radian)
+      * rst: the rise, set and transit columns, see :func:`_kernels.rise_set_transit`
+      * block: the (n x n_dates) arrays ``airmass``, ``ha``, ``alt``, ``az``, ``moondist``, see :func:`_kernels.block`
+    """
+    site = night.site
+    coords = _core.np.asarray(coords, dtype=float).reshape(-1, 2)
+    ob = _observer(site, night.dates[len(night.dates)//2]) # apparent ra-dec at mid-night, its drift over a night is negligible
+    body = _core.E.FixedBody()
+    epochdates = {}
+    radec = _core.np.empty((len(coords), 4))
+    for idx, ((ra, dec), epoch) in enumerate(zip(coords, epochs)):
+        if epoch not in epochdates: epochdates[epoch] = _core.E.Date(str(int(epoch))) # as Target._ephemBody
+        body._ra, body._dec, body._epoch = ra, dec, epochdates[epoch]
+        body.compute(ob)
+        radec[idx] = body.ra, body.dec, body.a_ra, body.a_dec
+    rst = _kernels.rise_set_transit(ra=radec[:,0], dec=radec[:,1], t0=float(night.dates[0]), long=site.long, lat=site.lat, horizon=site.horizon, pressure=site.pressure, temp=site.temp)
+    block = _kernels.block(ra=radec[:,0], dec=radec[:,1], lst=night.lst*_core.np.pi/12, lat=site.lat, moonaz=_core.np.deg2rad(night.moon.az), moonalt=_core.np.deg2rad(night.moon.alt), pressure=site.pressure, temp=site.temp)
+    return radec, rst, block
@@ -28,10 +28,23 @@
 
 from . import _core
 from . import _astroobsexception as _exc
+from . import _kernels
 
 from .Observatory import Observatory
 from .Target import Target
-from .TargetSIMBAD import TargetSIMBAD
+from .TargetSIMBAD import TargetSIMBAD, resolveSIMBAD
+from .Night import processTargets
+
+import multiprocessing as _mp
+
+_MINCHUNK = 256 # minimum number of targets per process
+
+def _process_targets(args):
+    """
+    :func:`processTargets` on the tuple ``args`` (night, coords, epochs), as mapped over worker processes
+    """
+    return processTargets(*args)
+
 
 class Observation(Observatory):
     """
@@ -46,6 +59,12 @@ class Observation(Observatory):
     Kwargs:
       * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
       * fig: TBD
+      * n_jobs (int): the number of processes over which the processing of the targets is spread by :func:`add_targets`, :func:`change_date` and :func:`change_obs`, ``-1`` for all cores. Default is the ``n_jobs`` attribute. Nothing is parallelised below 512 (``2*_MINCHUNK``) targets to process. The pool of processes is created at the first parallel processing and kept for the next ones, until :func:`close`
+      * pool (``multiprocessing.Pool``): a pool of processes provided by the caller, used instead of the pool of the observation when parallelising; it is not closed by the observation
+
+    Attributes:
+      * catalog (:class:`LocalCatalog`): a local catalog in which target names are searched before SIMBAD, default is ``None``
+      * n_jobs (int): the default number of processes used to process the targets, see the ``n_jobs`` kwarg. Default is ``None``: one process
 
     Raises:
       See :class:`Observatory`
@@ -111,7 +130,7 @@ class Observation(Observatory):
             self._targets = value
             for item in self._targets:
                 item._ticked = True
-                item.process(obs=self, **kwargs)
+            self._process(recalcAll=True, **kwargs)
 
     @property
     def ticked(self):
@@ -139,7 +158,7 @@ class Observation(Observatory):
           N/A
 
         .. note::
-          * Automatically reprocesses the target for the given observatory and date if it is selected for observation
+          * Automatically reprocesses the target for the given observatory and date if it is selected for observation, its row of ``Observation.block`` being refreshed
 
         >>> import astroobs.obs as obs
         >>> o = obs.Observation('ohp', local_date=(2015,3,31,23,59,59))
@@ -155,7 +174,7 @@ class Observation(Observatory):
             self._targets[tgt]._ticked = bool(forceTo)
         else:
             self._targets[tgt]._ticked = not bool(self._targets[tgt]._ticked)
-        if self._targets[tgt]._ticked: self._targets[tgt].process(self, **kwargs)
+        if self._targets[tgt]._ticked: self._process_new([self._targets[tgt]], **kwargs)
     
 
     def add_target(self, tgt, ra=None, dec=None, name="", **kwargs):
@@ -170,17 +189,18 @@ class Observation(Observatory):
         
         ``tgt`` arg can be:
           * a :class:`Target` instance: all other parameters are ignored
-          * a target name (string): if ``ra`` and ``dec`` are not ``None``, the target is added with the provided coordinates; if ``None``, a SIMBAD search is performed on ``tgt``. ``name`` is ignored
+          * a target name (string): if ``ra`` and ``dec`` are not ``None``, the target is added with the provided coordinates; if ``None``, the name is searched in the local catalog ``Observation.catalog`` (see :class:`LocalCatalog`) if any, then in SIMBAD. ``name`` is ignored
           * a ra-dec string ('hh:mm:ss.s +/-dd:mm:ss.s'): in that case, ``ra`` and ``dec`` will be ignored and ``name`` will be the name of the target
 
         Kwargs:
-          See :class:`Observation`
+          * See :class:`Observation`
+          * catalog (:class:`LocalCatalog`): overrides the local catalog ``Observation.catalog``
 
         Raises:
           * ValueError: if ra-dec formating was not understood
 
         .. note::
-          * Automatically processes the target for the given observatory and date
+          * Automatically processes the target for the given observatory and date, its row being appended to ``Observation.block``
 
         >>> import astroobs.obs as obs
         >>> o = obs.Observation('ohp', local_date=(2015,3,31,23,59,59))
@@ -205,7 +225,10 @@ class Observation(Observatory):
                 ra, dec = _core.radecFromStr(str(tgt)) # does it look like a coordinates string?
                 tt = Target(ra=ra, dec=dec, name=name, **kwargs)
                 self._targets += [tt]
-            except: # let's try simbad
+            except: # let's try the local catalog, then simbad
+                catalog = kwargs.get('catalog', getattr(self, 'catalog', None))
+                record = None if catalog is None else catalog.get(tgt)
+                if record is not None: kwargs['record'] = record
                 tt = TargetSIMBAD(name=tgt, **kwargs)
                 if not getattr(tt, '_error', False):
                     self._targets += [tt]
@@ -215,7 +238,52 @@ class Observation(Observatory):
             _exc.raiseIt(_exc.InputNotUnderstood, self._raiseError, tgt)
             return
         self._targets[-1]._ticked = True
-        self._targets[-1].process(obs=self, **kwargs)
+        self._process_new([self._targets[-1]], **kwargs)
+
+    def add_targets(self, names, query=None, batch=50, workers=4, retries=3, backoff=1., **kwargs):
+        """
+        Adds many targets to the observation list from their names: from the local catalog ``Observation.catalog`` if any (see :class:`LocalCatalog`), else resolved together by :func:`resolveSIMBAD`: SIMBAD cache first, then batched and concurrent SIMBAD queries. A name which cannot be resolved does not stop the others
+
+        Args:
+          * names (list of str): the names of the targets
+          * query, batch, workers, retries, backoff [optional]: see :func:`resolveSIMBAD`
+
+        Kwargs:
+          * See :class:`Observation`
+          * cache, ttl, offline: see :class:`TargetSIMBAD`
+          * catalog (:class:`LocalCatalog`): overrides the local catalog ``Observation.catalog``
+
+        Raises:
+          N/A
+
+        Returns:
+          A dictionary giving, for each name, ``None`` if the target was added, or the error message
+
+        .. note::
+          * Automatically processes the new targets for the given observatory and date. Only the new targets are processed, their rows are appended to ``Observation.block``
+
+        >>> import astroobs as obs
+        >>> o = obs.Observation('ohp', local_date=(2015,3,31))
+        >>> o.add_targets(['vega', 'arcturus', 'notastar'])
+        {'vega': None, 'arcturus': None, 'notastar': 'not found in SIMBAD'}
+        """
+        if not hasattr(self, '_targets'): self._targets = []
+        names = [str(item) for item in names]
+        catalog = kwargs.get('catalog', getattr(self, 'catalog', None))
+        local = {} if catalog is None else dict((name, catalog.get(name)) for name in names if name in catalog)
+        records, errors = resolveSIMBAD([name for name in names if name not in local], query=query, batch=batch, workers=workers, retries=retries, backoff=backoff, **kwargs)
+        records.update(local)
+        ret = {}
+        tgts = []
+        for name in names:
+            if name in records:
+                tt = TargetSIMBAD(name=name, record=records[name], **kwargs)
+                tt._ticked = True
+                tgts.append(tt)
+            ret[name] = errors.get(name, None)
+        self._targets += tgts
+        if len(tgts)>0: self._process_new(tgts, **kwargs)
+        return ret
 
     def rem_target(self, tgt, **kwargs):
         """
@@ -257,10 +325,178 @@ class Observation(Observatory):
         Processes all target for the given observatory and date
         Args:
           * recalcAll (bool or None) [optional]: if ``False`` (default): only targets selected for observation are re-processed, if ``True``: all targets are re-processed, if ``None``: no re-process
+
+        Kwargs:
+          * n_jobs (int): the number of processes over which the targets are spread, ``-1`` for all cores. Default is the ``n_jobs`` attribute, or one process. Not used with ``engine='pyephem'``, nor below 512 (``2*_MINCHUNK``) targets
+          * pool (``multiprocessing.Pool``): see :class:`Observation`
+
+        .. note::
+          * With the default numpy engine, all targets are processed at once into the (n_targets x n_dates) arrays of ``Observation.block``, the vector attributes of each target being row-views of these arrays
+          * The targets are processed for the immutable ``night`` of the observatory by :func:`processTargets`: the observatory is not modified. With ``n_jobs``, the night is sent to a pool of processes, each processing a chunk of targets, and the results are gathered in bulk
         """
-        for item in self.targets:
-            if item._ticked or recalcAll: item.process(self, **kwargs)
-        
+        tgts = [item for item in self.targets if item._ticked or recalcAll]
+        if _core.pyephemEngine(kwargs):
+            for item in tgts:
+                item.process(self, **kwargs)
+            return
+        radec, rst, self._block = self._process_block(tgts, **kwargs)
+        self._blocktargets = tgts
+        self._set_rows(tgts, radec, rst)
+
+    def _process_new(self, tgts, **kwargs):
+        """
+        Processes the targets ``tgts`` alone, e.g. just added or ticked: the rows of those already in ``Observation.block`` are refreshed in place, the others are appended to it. The block is rebuilt by :func:`_process` if it is not of the current night
+        """
+        if _core.pyephemEngine(kwargs):
+            for item in tgts:
+                item.process(self, **kwargs)
+            return
+        block = getattr(self, '_block', None)
+        if block is None or block['alt'].shape[1:]!=_core.np.shape(self.night.dates):
+            self._process(recalcAll=False, **kwargs)
+            return
+        radec, rst, new = self._process_block(tgts, **kwargs)
+        index = dict((id(item), idx) for idx, item in enumerate(self._blocktargets))
+        rows = [index.get(id(item)) for item in tgts]
+        fresh = [idx for idx, row in enumerate(rows) if row is None]
+        for idx, row in enumerate(rows):
+            if row is None: continue
+            for key in block:
+                block[key][row] = new[key][idx]
+        if len(fresh)>0:
+            self._block = dict((key, _core.np.concatenate([block[key], new[key][fresh]])) for key in block)
+            for idx, item in enumerate(self._blocktargets):
+                if _core.np.may_share_memory(getattr(item, 'alt', None), block['alt']): item._set_block(self._block, idx) # still a row of the previous block
+            for count, idx in enumerate(fresh):
+                rows[idx] = len(self._blocktargets)+count
+            self._blocktargets = self._blocktargets + [tgts[idx] for idx in fresh]
+        self._set_rows(tgts, radec, rst, rows=rows)
+
+    def _process_block(self, tgts, **kwargs):
+        """
+        Processes the targets ``tgts`` together with :func:`processTargets`, spread over processes with ``n_jobs``
+
+        Returns the radec, rise-set-transit and block arrays of :func:`processTargets`
+        """
+        night = self.night
+        coords = _core.np.asarray([item._coords for item in tgts], dtype=float).reshape(-1, 2)
+        epochs = [item.input_epoch for item in tgts]
+        n_jobs = kwargs.get('n_jobs', getattr(self, 'n_jobs', None))
+        n_jobs = _mp.cpu_count() if n_jobs is not None and int(n_jobs)<0 else int(n_jobs or 1)
+        nchunks = min(n_jobs*4, len(tgts)//_MINCHUNK)
+        if n_jobs<=1 or nchunks<=1:
+            return processTargets(night, coords, epochs)
+        chunks = _core.np.array_split(_core.np.arange(len(tgts)), nchunks)
+        pool = kwargs.get('pool', None)
+        if pool is None: pool = self._workers(n_jobs)
+        results = pool.map(_process_targets, [(night, coords[chunk], [epochs[idx] for idx in chunk]) for chunk in chunks])
+        radec = _core.np.concatenate([item[0] for item in results])
+        rst = dict((key, _core.np.concatenate([item[1][key] for item in results])) for key in results[0][1])
+        block = dict((key, _core.np.concatenate([item[2][key] for item in results])) for key in results[0][2])
+        return radec, rst, block
+
+    def _workers(self, n_jobs):
+        """
+        Returns the pool of ``n_jobs`` processes of the observation, created when first needed and kept for the next processings, see :func:`close`
+        """
+        if getattr(self, '_pool', None) is not None and self._poolSize!=n_jobs: self.close()
+        if getattr(self, '_pool', None) is None:
+            self._pool = _mp.Pool(n_jobs)
+            self._poolSize = n_jobs
+        return self._pool
+
+    def close(self):
+        """
+        Stops the pool of processes of the observation, if any. A new one is created by the next parallel processing
+        """
+        pool = getattr(self, '_pool', None)
+        self._pool = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def __del__(self):
+        pool = getattr(self, '_pool', None)
+        if pool is not None: pool.terminate()
+
+    def _set_rows(self, tgts, radec, rst, rows=None):
+        """
+        Sets the attributes of the targets ``tgts`` from their ``rows`` of ``Observation.block`` (default is the first rows), and from the radec and rise-set-transit arrays of :func:`processTargets`
+        """
+        if rows is None: rows = range(len(tgts))
+        for idx, item in enumerate(tgts):
+            item._set_block(self._block, rows[idx])
+            item._set_rst(rst, idx)
+            item._raRad, item._decRad = radec[idx, 2], radec[idx, 3] # displayed in the observatory epoch, as Target._set_epochRadec
+
+    @property
+    def block(self):
+        """
+        The (n_targets x n_dates) arrays ``airmass``, ``ha``, ``alt``, ``az``, ``moondist`` of the targets processed together at the last date or observatory change, as a dictionary. The ``targets`` key gives the corresponding list of targets
+        """
+        if not hasattr(self, '_block'): return {}
+        ret = dict(self._block)
+        ret['targets'] = list(self._blocktargets)
+        return ret
+    @block.setter
+    def block(self, value):
+        if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "block"): return
+
+
+    def plan(self, fromDate="now", toDate="now+30day", dday=1, recalcAll=False, chunk=8, **kwargs):
+        """
+        Computes at once, for all targets and all nights of a date range, the durations of the observability categories given by :func:`Target.whenobs`. The sun, the sidereal time and the moon are processed once per night for all targets
+
+        Args:
+          * fromDate (see below): the start date of the range, default is now
+          * toDate (see below): the end date of the range, default is 30 days after ``fromDate``
+          * dday (int): the step in days between two nights of the range
+          * recalcAll (bool) [optional]: if ``False`` (default): only targets selected for observation are planned, if ``True``: all targets are planned
+          * chunk (int) [optional]: the number of targets processed together, which bounds the memory use
+
+        Kwargs:
+          See :class:`Observation`, ``pts``, ``margin``, ``fullhour`` of :func:`Observatory.process_obs` and ``exact`` of :func:`Target.whenobs`
+
+        Raises:
+          N/A
+
+        Returns:
+          * dates: the UT dates of the nights (n_nights)
+          * targets: the list of planned targets (n_targets)
+          * retval: a (n_targets x n_nights) numpy structured array of durations in hours, with keys ``obs``, ``moon``, ``dusk``, ``duskmoon``, ``dawn``, ``dawnmoon``, ``darklow``, ``twighlightlow`` as in :func:`Target.whenobs`
+
+        .. note::
+          * ``fromDate`` and ``toDate`` can be date-tuples ``(yyyy, mm, dd, [hh, mm, ss])``, timestamps, datetime structures or ephem.Date instances.
+          * Neither the observation nor its targets are modified
+
+        >>> import astroobs as obs
+        >>> o = obs.Observation('vlt', local_date=(2015,1,1), moonAvoidRadius=15, horizon_obs=40)
+        >>> o.add_target('aldebaran')
+        >>> o.add_target('canopus')
+        >>> dates, targets, retval = o.plan((2015,1,1), (2015,7,1))
+        >>> retval['obs'].sum(axis=1) # optimal hours over the semester
+        """
+        tgts = [item for item in self.targets if item._ticked or recalcAll]
+        dates = _core.rangeDates(fromDate=fromDate, toDate=toDate, dday=dday)
+        grid = self._night_grid(dates, **kwargs)
+        retval = _core.np.zeros((len(tgts), dates.size), dtype=[(key, 'f8') for key in _kernels.WHENOBS_KEYS])
+        if len(tgts)==0: return dates, tgts, retval
+        radec = _core.np.asarray([item._range_radec(obs=self, grid=grid) for item in tgts])
+        chunk = max(1, int(chunk))
+        for idx in range(0, len(tgts), chunk):
+            retval[idx:idx+chunk] = self._range_whenobs(ra=radec[idx:idx+chunk, :, 0], dec=radec[idx:idx+chunk, :, 1], grid=grid, **kwargs)
+        return dates, tgts, retval
+
+    def _sampling_curves(self, dates):
+        """
+        Returns the (n_curves x n_dates) curves (degrees) followed by the adaptive sampling of :func:`Observatory.process_obs`: the altitude of the moon, and the altitudes of the targets relative to ``horizon_obs``
+        """
+        curves = super(Observation, self)._sampling_curves(dates)
+        if len(self.targets)==0: return curves
+        ra = _core.np.asarray([item._raRad for item in self.targets])[:, None]
+        dec = _core.np.asarray([item._decRad for item in self.targets])[:, None]
+        ha, alt, az = _kernels.altaz(ra=ra, dec=dec, lst=_kernels.sidereal_time(dates, self.long), lat=self.lat, pressure=self.pressure, temp=self.temp)
+        return _core.np.r_[curves, _core.np.rad2deg(alt)-self.horizon_obs]
 
     def change_date(self, ut_date=None, local_date=None, recalcAll=False, **kwargs):
         """
@@ -28,9 +28,13 @@
 
 from . import _core
 from . import _astroobsexception as _exc
+from . import _kernels
 
 from .ObservatoryList import ObservatoryList
 from .Moon import Moon
+from .MoonCache import getMoonCache
+from .Night import Site, Night, processNight, night_cache_info, night_cache_clear, _observer as _siteObserver, _moonAltaz, _nightDates, _nightMoonEphem, _readonly
+
 
 class Observatory(_core.E.Observer, object):
     """
@@ -45,6 +49,7 @@ class Observatory(_core.E.Observer, object):
 
     Kwargs:
       * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+      * engine (str): ``'numpy'`` (default) for the vectorized calculations, ``'pyephem'`` for the reference pyephem loops
       * fig: TBD
 
     Raises:
@@ -67,6 +72,8 @@ class Observatory(_core.E.Observer, object):
       * ``lst``: the local sidereal time corresponding to each ``dates`` element
       * ``localTimeOffest``: gives the shift in days between UT and local time: local=UT+localTimeOffest
       * ``moon``: points to the :class:`Moon` target processed for the given observatory and date
+      * ``site``: the immutable :class:`Site` of the observatory, see :func:`processNight`
+      * ``night``: the immutable :class:`Night` processed for the given observatory and date, see :func:`process_obs`
     Twilight attributes:
       * For the next three attributes, ``XXX`` shall be replaced by {'' (blank), 'civil', 'nautical', 'astro'} for, respectively, horizon, -6, -12, and -18 degrees altitude
       * ``sunriseXXX``: gives the sunrise time for different twilights, in Dublin Julian Dates. e.g.: ``observatory.sunrise``
@@ -97,7 +104,7 @@ class Observatory(_core.E.Observer, object):
         if long is None and lat is None and elevation is None and timezone is None: # gave directly an obsid, supposely
             obslist = ObservatoryList(dataFile=dataFile, **kwargs)
             obs = str(obs).lower()
-            if obs in obslist.obsids: # if correct id
+            if obs in obslist.obsdic: # if correct id
                 for k, v in obslist.obsdic[obs].items(): # copy the site info to self
                     setattr(self, k, v)
                 self.id = obs
@@ -142,9 +149,9 @@ class Observatory(_core.E.Observer, object):
         self.upd_date(local_date=local_date, ut_date=ut_date, force=True, **kwargs)
 
 
-    def _calc_sunRiseSet(self, mode='', **kwargs):
+    def _calc_sunRiseSet(self, mode='', events=None, **kwargs):
         """
-        Processes sunrise, sunset in UTC and night duration in hour and adds info to the object as attributes
+        Processes sunrise, sunset in UTC and night duration in hour and adds info to the object as attributes, and to the sun ``events`` row if given (see :func:`sun_events`)
         mode can be: '' (horizon), 'astro' (-18 degrees), 'nautical' (-12 degrees),'civil' (-6 degrees)
 
         assumption: self.date is local midnight of the observation date and is expressed in UT
@@ -153,23 +160,79 @@ class Observatory(_core.E.Observer, object):
         mode = str(mode).lower()
         if mode not in horizs.keys():
             if _exc.raiseIt(_exc.UnknownTwilight, self._raiseError, mode): return
-        s1, s2 = self.horizon, self.date # save initial obs values
-        self.horizon = horizs[mode.lower()] # set horizon from mode
+        ob = self._observer()
+        ob.horizon = horizs[mode] # set horizon from mode
+        ob.date = self.date
         # init in case of error
-        setattr(self, "sunrise"+mode.lower(), None)
-        setattr(self, "sunset"+mode.lower(), None)
-        setattr(self, "len_night"+mode.lower(), 0.)
+        setattr(self, "sunrise"+mode, None)
+        setattr(self, "sunset"+mode, None)
+        setattr(self, "len_night"+mode, 0.)
+        dark, light = False, False
         try: # try block to catch NeverUp or AlwaysUp errors from pyephem in case of polar region
-            v = self.next_rising(_core.E.Sun())
-            setattr(self, "sunrise"+mode.lower(), v) # adds property sunrise of mode
-            self.date = v
-            setattr(self, "sunset"+mode.lower(), self.previous_setting(_core.E.Sun())) # adds property sunset of mode
-            setattr(self, "len_night"+mode.lower(), (getattr(self, "sunrise"+mode.lower()) - getattr(self, "sunset"+mode.lower()))*24)
+            v = ob.next_rising(_core.E.Sun())
+            setattr(self, "sunrise"+mode, v) # adds property sunrise of mode
+            ob.date = v
+            setattr(self, "sunset"+mode, ob.previous_setting(_core.E.Sun())) # adds property sunset of mode
+            setattr(self, "len_night"+mode, (getattr(self, "sunrise"+mode) - getattr(self, "sunset"+mode))*24)
         except _core.E.AlwaysUpError:
             self.alwaysDark = False
+            light = True
         except _core.E.NeverUpError:
             self.alwaysDark = True
-        self.horizon, self.date = s1, s2 # restore initial obs values
+            dark = True
+        if events is not None:
+            for item in ['sunrise', 'sunset']:
+                value = getattr(self, item+mode)
+                events[item+mode] = _core.np.nan if value is None else float(value)
+            events['len_night'+mode] = getattr(self, "len_night"+mode)
+            events['alwaysDark'+mode] = dark
+            events['alwaysLight'+mode] = light
+
+
+    def _set_sunRiseSet(self, events):
+        """
+        Adds the sunrise, sunset and night duration attributes of all modes to the object, from one night of :func:`sun_events`
+        """
+        for mode, alt in _kernels.TWILIGHTS:
+            if _core.np.isnan(events['sunrise'+mode]):
+                setattr(self, "sunrise"+mode, None)
+                setattr(self, "sunset"+mode, None)
+            else:
+                setattr(self, "sunrise"+mode, _core.E.Date(events['sunrise'+mode]))
+                setattr(self, "sunset"+mode, _core.E.Date(events['sunset'+mode]))
+            setattr(self, "len_night"+mode, float(events['len_night'+mode]))
+            if events['alwaysDark'+mode]:
+                self.alwaysDark = True
+            elif events['alwaysLight'+mode]:
+                self.alwaysDark = False
+
+
+    def sun_events(self, nights=None, **kwargs):
+        """
+        Solves at once the sunsets, sunrises and night durations of all twilight modes, for several nights
+
+        Args:
+          * nights (list of dates) [optional]: the UT times of the local midnights of the nights, as the ``date`` attribute; default is the night of the observatory
+
+        Kwargs:
+          See :class:`Observatory`
+
+        Raises:
+          N/A
+
+        Returns:
+          A numpy structured array with one row per night and, for each ``XXX`` in {'' (blank), 'civil', 'nautical', 'astro'}, the fields:
+            * ``sunriseXXX``, ``sunsetXXX``: the sunrise following the local midnight and the sunset preceeding it, in Dublin Julian Dates, NaN in polar cases
+            * ``len_nightXXX``: the night duration in hours, 0 in polar cases
+            * ``alwaysDarkXXX``, ``alwaysLightXXX``: whether the sun stays below, or above, the twilight altitude
+
+        .. note::
+          * ``nights`` elements can be date-tuples ``(yyyy, mm, dd, [hh, mm, ss])``, timestamps, datetime structures or ephem.Date instances.
+          * The events are solved with vectorized numpy calculations, in agreement with pyephem to about a second out of polar regions
+        """
+        if nights is None: nights = [self.date]
+        nights = _core.np.asarray([float(_core.cleanTime(item, format='ed')) for item in nights])
+        return _kernels.sun_events(nights=nights, long=self.long, lat=self.lat, horizon=self.horizon, pressure=self.pressure, temp=self.temp)
 
 
     def upd_date(self, ut_date=None, local_date=None, force=False, **kwargs):
@@ -197,13 +260,13 @@ class Observatory(_core.E.Observer, object):
           * If neither of those are given, the date is automatically set to *tonight* or *now* (whether the sun has already set or not)
         """
         stored_date = getattr(self, 'localnight', _core.datetime(2000, 1, 1))
-        s1 = self.date # saves initiprocess_obsal date value
         # set the local_date to this night's sunset time in local time so we can get the local day/month/year
         if local_date is None and ut_date is None: # default set to tonight midnight if date not provided
-            self.date = _core.E.now() # takes the now for temporary calculation
+            ob = self._observer()
+            ob.date = _core.E.now() # takes the now for temporary calculation
             try: # are we in a polar region ?
-                self.date = _core.E.Date(self.next_rising(_core.E.Sun()))
-                local_date = _core.convertTime(self.previous_setting(_core.E.Sun()), self.timezone, 'utc', format='dt')
+                ob.date = _core.E.Date(ob.next_rising(_core.E.Sun()))
+                local_date = _core.convertTime(ob.previous_setting(_core.E.Sun()), self.timezone, 'utc', format='dt')
             except (_core.E.AlwaysUpError, _core.E.NeverUpError): # yes sire
                 if _core.convertTime(_core.E.now(), self.timezone, 'utc', format='dt').hour<12: # yest
                     local_date = _core.E.Date(_core.convertTime(_core.E.now(), self.timezone, 'utc', format='ed')-1).datetime()
@@ -215,7 +278,6 @@ class Observatory(_core.E.Observer, object):
             local_date = _core.cleanTime(local_date, format='dt')
         # check if the date has changed
         if stored_date.year==local_date.year and stored_date.month==local_date.month and stored_date.day==local_date.day and force is False: # didn't change
-            self.date = s1 # set initial value back
             return False
         else: # the date has changed
             self.localTimeOffest = _core.convertTime(_core.E.now(), self.timezone, 'utc', format='ed')-_core.E.now()
@@ -225,56 +287,214 @@ class Observatory(_core.E.Observer, object):
             return True
 
 
-    def process_obs(self, pts=200, margin=15, fullhour=False, **kwargs):
+    def process_obs(self, pts=200, margin=15, fullhour=False, sampling='linear', tol=0.05, **kwargs):
         """
         Processes all twilights as well as moon rise, set and position through night for the given observatory and date.
         Creates the vector ``observatory.dates`` which is the vector containing all timestamps at which the moon and the targets will be processed.
 
         Args:
-          * pts (int) [optional]: the size of the ``dates`` vector, whose elements are linearly spaced in time
+          * pts (int) [optional]: the size of the ``dates`` vector, whose elements are linearly spaced in time; the maximum size of the ``dates`` vector if ``sampling`` is ``'adaptive'``
           * margin (float - minutes) [optional]: the margin between the first element of the vector ``dates`` and the sunset, and between the sunrise and its last element
           * fullhour (bool) [optional]: if ``True``, then the vector ``dates`` will start and finish on the first full hour preceeding sunset and following sunrise
+          * sampling (str) [optional]: ``'linear'`` (default) for linearly spaced ``dates``, or ``'adaptive'`` for ``dates`` which include the twilights, the moon rise and set (and the crossings of ``horizon_obs`` by the targets of an :class:`Observation`), and which are dense only where the curves are not linear. The number of samples is given by :func:`npts`
+          * tol (float - degree) [optional]: with ``'adaptive'`` sampling, the maximum error of the linear interpolation of the curves between two samples
 
         Kwargs:
           See :class:`Observatory`
 
         Raises:
           * KeyError: if the twilight keyword is unknown
+          * KeyError: if the sampling mode is unknown
           * Exception: if the observatory object has no date
 
         .. note::
-          In case the observatory is in polar regions where the sun does not alway set and rise everyday, the first and last elements of the ``dates`` vector are set to local midday right before and after the local midnight of the observation date. e.g.: 24h night centered on the local midnight.
+          * In case the observatory is in polar regions where the sun does not alway set and rise everyday, the first and last elements of the ``dates`` vector are set to local midday right before and after the local midnight of the observation date. e.g.: 24h night centered on the local midnight.
+          * With the numpy engine, the nights precomputed by :func:`buildAlmanac` for the site are read from disk
+          * With ``'linear'`` sampling and the numpy engine, the processed nights are kept in a cache shared by all observatories and keyed by site, night, ``pts``, ``margin`` and ``fullhour``, so that going back to a known night is a lookup. The read-only ``dates``, ``lst`` and vectors of the ``moon`` are then shared with the cache. See :func:`night_cache_info`, :func:`night_cache_clear`
+          * The night is processed by :func:`processNight` from the immutable ``site`` of the observatory, then kept under the ``night`` attribute. Only the date and the attributes of the night are set on the observatory: the calculations never modify its ``date`` or ``horizon`` temporarily
         """
-        def set_data_range(sunset, sunrise, numdates, margin=15, fullhour=False):
-            """Returns a numpy array of numdates dates linearly spaced in time, from margin minutes before sunset to margin minutes after sunrise if fullhour is False, and from the previous full hour before sunset to next full hour after sunrise if fullhour is True."""
-            if fullhour:
-                ss = _core.E.Date(int(sunset*24)/24.)
-                sr = _core.E.Date(int(sunrise*24+1)/24.)
-            else:
-                ss = _core.E.Date(float(sunset) - margin*_core.E.minute)
-                sr = _core.E.Date(float(sunrise) + margin*_core.E.minute)
-            return _core.np.linspace(ss, sr, int(numdates))
         if not hasattr(self, "date"):
             if _exc.raiseIt(_exc.NoObservatoryDate, self._raiseError, obs): return
         self.date = _core.cleanTime(self.date, format='ed')
+        sampling = str(sampling).lower()
+        if not _core.pyephemEngine(kwargs):
+            night = processNight(self.site, self.date, pts=pts, margin=margin, fullhour=fullhour, sampling=sampling, tol=tol, curves=self._sampling_curves, raiseError=self._raiseError)
+            if night is not None: self._set_night(night)
+            return
+        if sampling not in ['linear', 'adaptive']:
+            if _exc.raiseIt(_exc.UnknownSampling, self._raiseError, sampling): return
+        site = self.site
+        events = _core.np.zeros((), dtype=_kernels.SUN_EVENTS_DTYPE)
         for mode in ['','astro','nautical','civil']: # gets sunrise and sunsets for all modes
-            self._calc_sunRiseSet(mode=mode, **kwargs)
-        if self.sunset is not None and self.sunrise is not None:
-            self.dates = set_data_range(sunset=self.sunset, sunrise=self.sunrise, numdates=pts, margin=margin, fullhour=fullhour) # gets linearly spaced dates along the night
-        else: # no sunrise or sunset, observatory in polar regions
-            startnight = _core.convertTime(self.localnight.replace(hour=12, minute=0, second=0), 'utc', self.timezone, format='ed')
-            endnight = _core.convertTime(_core.E.Date(_core.E.Date(self.localnight)+1).datetime().replace(hour=11, minute=59, second=59), 'utc', self.timezone, format='ed')
-            self.dates = set_data_range(sunset=startnight, sunrise=endnight, numdates=pts, margin=0, fullhour=False) # gets linearly spaced dates along the night
+            self._calc_sunRiseSet(mode=mode, events=events, **kwargs)
+        events = events[()]
+        dates = _nightDates(site, self.date, events, pts=pts, margin=margin, fullhour=fullhour, sampling=sampling, tol=tol, curves=self._sampling_curves)
         # computes the lst
-        s1 = self.date
-        self.lst = []
-        for d in self.dates:
-            self.date = d
-            self.lst.append(self.sidereal_time())
-        self.lst = _core.np.asarray(self.lst)*12/_core.np.pi # get radians to hours
-        self.date = s1
-        # computes the Moon
-        self.moon = Moon(obs=self)
+        ob = self._observer()
+        lst = []
+        for d in dates:
+            ob.date = d
+            lst.append(ob.sidereal_time())
+        lst = _core.np.asarray(lst)*12/_core.np.pi # get radians to hours
+        self._set_night(Night(site=site, date=float(self.date), events=events, dates=_readonly(dates), lst=_readonly(lst), moon=_nightMoonEphem(site, dates, lst)))
+
+
+    def _set_night(self, night):
+        """
+        Sets the sun events, ``dates``, ``lst`` and ``moon`` attributes of the observatory from a processed :class:`Night`
+        """
+        self._set_sunRiseSet(night.events)
+        self.dates, self.lst = night.dates, night.lst
+        moon = Moon(raiseError=self._raiseError)
+        moon._set_night(night.moon)
+        self.moon = moon
+        self._night = night
+
+    @property
+    def night(self):
+        """
+        The immutable :class:`Night` for which the observatory was last processed, see :func:`process_obs`. It can be given to :func:`processTargets` from any thread, whatever the observatory becomes
+        """
+        return self._night
+    @night.setter
+    def night(self, value):
+        if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "night"): return
+
+    @property
+    def site(self):
+        """
+        The immutable :class:`Site` of the observatory, built from its current attributes, see :func:`processNight`
+        """
+        return Site(long=float(self.long), lat=float(self.lat), elevation=float(self.elevation), temp=float(self.temp), pressure=float(self.pressure), horizon=float(self.horizon), epoch=float(self.epoch), timezone=str(self.timezone), horizon_obs=float(self.horizon_obs), moonAvoidRadius=float(self.moonAvoidRadius), id=getattr(self, 'id', None))
+    @site.setter
+    def site(self, value):
+        if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "site"): return
+
+
+    def _sampling_curves(self, dates):
+        """
+        Returns the (n_curves x n_dates) curves (degrees) followed by the adaptive sampling of :func:`process_obs`, each crossing a threshold of interest at 0: the altitude of the moon
+        """
+        return _core.np.rad2deg(self._moon_altaz(dates)[0])[None, :]
+
+    @property
+    def npts(self):
+        """
+        The number of samples of the ``dates`` vector of the night, see :func:`process_obs`
+        """
+        return len(self.dates)
+    @npts.setter
+    def npts(self, value):
+        if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "npts"): return
+
+    def _observer(self):
+        """
+        Returns a standalone pyephem Observer of the site, so calculations can run without mutating the observatory
+        """
+        return _siteObserver(self.site)
+
+
+    def _local_midnights(self, ut_dates):
+        """
+        Returns the local nights (datetime, local time) and their midnights in UT (ephem.Date floats) corresponding to each element of ``ut_dates``, as :func:`upd_date`
+        """
+        localnights = [_core.convertTime(_core.E.Date(item), self.timezone, 'utc', format='dt').replace(hour=23, minute=59, second=59) for item in ut_dates]
+        midnights = _core.np.asarray([float(_core.convertTime(item, 'utc', self.timezone, format='ed')) for item in localnights])
+        return localnights, midnights
+
+
+    def _moonCache(self):
+        """
+        Returns the :class:`MoonCache` of the site of the observatory
+        """
+        return getMoonCache(long=self.long, lat=self.lat, elevation=self.elevation, epoch=self.epoch, raiseError=self._raiseError)
+
+    def _moon_altaz(self, dates, **kwargs):
+        """
+        Returns the apparent altitude and azimuth (radian) of the moon at ``dates`` (any shape), interpolated from the :class:`MoonCache` of the site, or computed with pyephem on a standalone observer with ``engine='pyephem'``
+        """
+        dates = _core.np.asarray(dates, dtype=float)
+        if not _core.pyephemEngine(kwargs): return _moonAltaz(self.site, dates)
+        ob = self._observer()
+        moon = _core.E.Moon()
+        alt = _core.np.empty(dates.shape)
+        az = _core.np.empty(dates.shape)
+        for idx, d in enumerate(dates.flat):
+            ob.date = d
+            moon.compute(ob)
+            alt.flat[idx] = moon.alt
+            az.flat[idx] = moon.az
+        return alt, az
+
+
+    def _night_grid(self, ut_dates, pts=200, margin=15, fullhour=False, **kwargs):
+        """
+        Builds at once the (n_nights x pts) time grid of the nights given by ``ut_dates``, as :func:`process_obs` would for each of them, without modifying the observatory
+
+        Returns a dictionary:
+          * ``midnights``: the local midnights in UT (n_nights)
+          * ``events``: the sun events, see :func:`sun_events` (n_nights)
+          * ``alwaysDark``: the polar night flags, as the attribute ``alwaysDark`` (n_nights)
+          * ``dates``, ``lst``, ``moonalt``, ``moonaz``: (n_nights x pts) arrays of time (Dublin Julian Dates), local sidereal time and apparent moon position (radian)
+        """
+        localnights, midnights = self._local_midnights(ut_dates)
+        events = _kernels.sun_events(nights=midnights, long=self.long, lat=self.lat, horizon=self.horizon, pressure=self.pressure, temp=self.temp)
+        start = events['sunset'].copy()
+        end = events['sunrise'].copy()
+        if fullhour:
+            start = _core.np.floor(start*24)/24.
+            end = _core.np.floor(end*24+1)/24.
+        else:
+            start -= margin*_core.E.minute
+            end += margin*_core.E.minute
+        for idx in _core.np.nonzero(_core.np.isnan(events['sunset']) | _core.np.isnan(events['sunrise']))[0]: # no sunrise or sunset, polar regions
+            start[idx] = _core.convertTime(localnights[idx].replace(hour=12, minute=0, second=0), 'utc', self.timezone, format='ed')
+            end[idx] = _core.convertTime(_core.E.Date(_core.E.Date(localnights[idx])+1).datetime().replace(hour=11, minute=59, second=59), 'utc', self.timezone, format='ed')
+        dates = start[:, None] + (end-start)[:, None]*_core.np.linspace(0, 1, int(pts))[None, :]
+        moonalt, moonaz = self._moon_altaz(dates, **kwargs)
+        return {'midnights': midnights, 'events': events, 'alwaysDark': _kernels.alwaysdark(events, getattr(self, 'alwaysDark', False)),
+                'dates': dates, 'lst': _kernels.sidereal_time(dates, self.long), 'moonalt': moonalt, 'moonaz': moonaz}
+
+
+    def _processed_grid(self):
+        """
+        Returns the one-night grid of the night for which the observatory was last processed (see :func:`process_obs`), from its attributes, with the same keys as :func:`_night_grid` and the durations ``weights`` (hours) of its samples, whatever their sampling
+        """
+        dates = _core.np.asarray(self.dates, dtype=float)[None, :]
+        events = _core.np.zeros(1, dtype=_kernels.SUN_EVENTS_DTYPE)
+        for mode, alt in _kernels.TWILIGHTS:
+            for key in ['sunrise', 'sunset']:
+                value = getattr(self, key+mode, None)
+                events[key+mode] = _core.np.nan if value is None else float(value)
+        return {'midnights': _core.np.asarray([float(self.date)]), 'events': events, 'alwaysDark': _core.np.asarray([getattr(self, 'alwaysDark', False) is True]),
+                'dates': dates, 'lst': (_core.np.asarray(self.lst, dtype=float)*_core.np.pi/12)[None, :], 'moonalt': _core.np.deg2rad(self.moon.alt)[None, :], 'moonaz': _core.np.deg2rad(self.moon.az)[None, :],
+                'weights': _core.np.gradient(dates[0])[None, :]*24}
+
+
+    def _range_whenobs(self, ra, dec, grid, exact=False, alt=None, moondist=None, **kwargs):
+        """
+        Computes the observability categories of :func:`Target.whenobs` on a night grid (see :func:`_night_grid`), for the apparent positions ``ra`` and ``dec`` (radian) given for each night, with optional leading dimensions (e.g. n_targets x n_nights)
+
+        If ``exact`` is ``True``, the durations are integrated between the exact crossing times of ``horizon_obs`` and ``moonAvoidRadius``, refined from the grid where the thresholds are crossed; else they are counted on the grid samples. The curves ``alt`` and ``moondist`` of the targets on the grid can be given if already computed
+        """
+        if alt is None or moondist is None:
+            alt, moondist = _kernels.grid_altmoondist(ra=ra, dec=dec, lst=grid['lst'], moonaz=grid['moonaz'], moonalt=grid['moonalt'], lat=self.lat, pressure=self.pressure, temp=self.temp)
+        if not exact:
+            return _kernels.whenobs_stats(dates=grid['dates'], alt=alt, moondist=moondist, events=grid['events'], alwaysdark=grid['alwaysDark'], horizon_obs=self.horizon_obs, moonAvoidRadius=self.moonAvoidRadius, weights=grid.get('weights'))
+        ra = _core.np.asarray(ra, dtype=float)
+        dec = _core.np.asarray(dec, dtype=float)
+        def target_altaz(t, where):
+            ha, talt, taz = _kernels.altaz(ra=ra[where], dec=dec[where], lst=_kernels.sidereal_time(t, self.long), lat=self.lat, pressure=self.pressure, temp=self.temp)
+            return talt, taz
+        def falt(t, where):
+            return _core.np.rad2deg(target_altaz(t, where)[0])-self.horizon_obs
+        def fmoon(t, where):
+            talt, taz = target_altaz(t, where)
+            moonalt, moonaz = self._moon_altaz(t)
+            return _core.np.rad2deg(_kernels.separation(taz, talt, moonaz, moonalt))-self.moonAvoidRadius
+        altroots = _kernels.cell_roots(grid['dates'], alt-self.horizon_obs, falt)
+        moonroots = _kernels.cell_roots(grid['dates'], moondist-self.moonAvoidRadius, fmoon)
+        return _kernels.whenobs_exact(dates=grid['dates'], alt=alt, moondist=moondist, altroots=altroots, moonroots=moonroots, events=grid['events'], alwaysdark=grid['alwaysDark'], horizon_obs=self.horizon_obs, moonAvoidRadius=self.moonAvoidRadius)
 
 
     @property
@@ -293,8 +513,7 @@ class Observatory(_core.E.Observer, object):
         >>>     plt.plot([E.now(), E.now()], [o.moon.alt.min(),o.moon.alt.max()], 'r--')
         """
         now = _core.E.now()
-        deltadates = (self.dates[1]-self.dates[0])/2.
-        if now<self.dates[0]-deltadates or now>self.dates[-1]+deltadates: return None
+        if now<self.dates[0]-(self.dates[1]-self.dates[0])/2. or now>self.dates[-1]+(self.dates[-1]-self.dates[-2])/2.: return None
         return (_core.np.abs(self.dates-_core.E.now())).argmin()
     @nowArg.setter
     def nowArg(self, value):
@@ -412,9 +631,10 @@ class Observatory(_core.E.Observer, object):
             if kwargs.get('time', '').lower()!='lst':
                 t0 = min(max(float(kwargs.get('t0', start_default)), self.dates[0]), self.dates[-1])
             else:
-                start_default = self.lst[0]+_core.np.median(_core.np.diff(self.lst[:4]))*(start_default-self.dates[0])/(self.dates[1]-self.dates[0])
+                lstrate = (lst1-self.lst[0])/(self.dates[-1]-self.dates[0]) # hours of lst per day
+                start_default = self.lst[0]+lstrate*(start_default-self.dates[0])
                 t0lst = min(max(float(kwargs.get('t0', start_default)), self.lst[0]), lst1)
-                t0 = self.dates[0] + (t0lst - self.lst[0])/_core.np.median(_core.np.diff(self.lst[:4]))*(self.dates[1]-self.dates[0])
+                t0 = self.dates[0] + (t0lst - self.lst[0])/lstrate
             # prepare x-axis and ticks
             xaxisvalues = _core.np.r_[_core.np.arange(t0, self.dates[0], -dt/24.)[::-1], _core.np.arange(t0, self.dates[-1], dt/24.)[1:]]
             if kwargs.get('time', '').lower()=='loc':
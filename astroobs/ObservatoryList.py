@@ -29,6 +29,116 @@
 from . import _core
 from . import _astroobsexception as _exc
 
+from threading import Lock as _Lock
+from contextlib import contextmanager as _contextmanager
+import tempfile as _tempfile
+from hashlib import md5 as _md5
+try:
+    import fcntl as _fcntl
+except ImportError: # no inter-process lock on this platform
+    _fcntl = None
+
+
+# process-wide registry of the parsed databases: absolute path -> (file signature, parsed database)
+_registry = {}
+_registryLock = _Lock()
+# edits of the database files between the threads of this process, the inter-process lock being the lock files
+_editLock = _Lock()
+
+
+def _signature(dataFile):
+    """
+    Signature of a database file, which changes whenever the file is modified or replaced
+    """
+    st = _core.os.stat(dataFile)
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+def _parse(dataFile):
+    """
+    Reads a database file once and returns its parsed content, as a dictionary ``heads``, ``lines``, ``wholefile``, ``obsids``, ``obsdic`` and ``error``: the first line not understood, if any
+    """
+    f = open(dataFile)
+    wholefile = [item.strip() for item in f.readlines()]
+    f.close()
+    ret = {'heads': [item for item in wholefile if item[:7]=='#heads#'][0][7:],
+           'lines': [item for item in wholefile if (item[:1]!='#' and item!="")],
+           'wholefile': wholefile,
+           'obsdic': {},
+           'error': None}
+    ret['obsids'] = [item.split(';')[0].lower() for item in ret['lines']]
+    for item in ret['lines']:
+        item = item.split(';')
+        try:
+            ret['obsdic'][item[0].lower()] = {'name':str(item[1]),'long':_core.E.degrees(item[2]),'lat':_core.E.degrees(item[3]),'elevation':float(item[4]),'temp':float(item[5]),'pressure':float(item[6]),'timezone':str(item[7]),'moonAvoidRadius':float(item[8])}
+        except:
+            ret['error'] = item[1]+" ("+item[0]+")" if len(item)>1 else item[0]
+            break
+    return ret
+
+
+def _database(dataFile, force=False):
+    """
+    Returns the parsed database of ``dataFile`` from the process-wide registry, which is only re-read when the file changed (or if ``force``)
+    """
+    path = _core.os.path.abspath(dataFile)
+    sig = _signature(path)
+    with _registryLock:
+        cached = _registry.get(path)
+    if force or cached is None or cached[0]!=sig:
+        cached = (sig, _parse(path))
+        with _registryLock:
+            _registry[path] = cached
+    return cached[1]
+
+
+def _lockPath(dataFile):
+    """
+    Returns the path of the lock file of a database file, in the user directory ``~/.astroobs/locks`` (or the ``ASTROOBS_LOCKS`` environment variable) and keyed by a hash of the absolute path of the database, so that nothing is written next to the database
+    """
+    path = _core.os.path.abspath(dataFile)
+    return _core.os.path.join(_core.lockDir, "%s_%s.lock" % (_core.os.path.basename(path), _md5(path.encode('utf8')).hexdigest()[:12]))
+
+
+@_contextmanager
+def _locked(dataFile):
+    """
+    Context of an exclusive edit of a database file, between the threads of this process and, where available, between processes (lock file, see :func:`_lockPath`)
+    """
+    with _editLock:
+        if _fcntl is None:
+            yield
+            return
+        if not _core.os.path.isdir(_core.lockDir): _core.os.makedirs(_core.lockDir)
+        f = open(_lockPath(dataFile), 'a')
+        try:
+            _fcntl.flock(f.fileno(), _fcntl.LOCK_EX)
+            yield
+        finally:
+            _fcntl.flock(f.fileno(), _fcntl.LOCK_UN)
+            f.close()
+
+
+def _write(dataFile, content):
+    """
+    Replaces atomically the content of a database file: the new content is written to a temporary file of the same directory, then renamed over the database
+    """
+    path = _core.os.path.abspath(dataFile)
+    fd, tmp = _tempfile.mkstemp(dir=_core.os.path.dirname(path), prefix='.'+_core.os.path.basename(path)+'.')
+    try:
+        f = _core.os.fdopen(fd, 'w')
+        f.write(content)
+        f.flush()
+        _core.os.fsync(f.fileno())
+        f.close()
+        if _core.os.path.exists(path):
+            _core.os.chmod(tmp, _core.os.stat(path).st_mode & 0o777)
+        getattr(_core.os, 'replace', _core.os.rename)(tmp, path)
+    except:
+        if _core.os.path.exists(tmp): _core.os.remove(tmp)
+        raise
+
+
 def show_all_obs(dataFile=None, **kwargs):
     """
     A quick function to view all available observatories
@@ -53,6 +163,10 @@ class ObservatoryList(object):
       * Exception: if a mandatory input parameter is missing when loading all observatories
 
     Use :func:`add`, :func:`rem`, :func:`mod` to add, remove or modify an observatory to the database.
+
+    .. note::
+      * The database is parsed once per process and shared by all instances (and by :class:`Observatory`), it is only re-read when the file is modified
+      * Edits are serialized between threads and processes (lock file in ``~/.astroobs/locks``, or the ``ASTROOBS_LOCKS`` environment variable) and written atomically: a temporary file is renamed over the database
     
     >>> import astroobs.obs as obs
     >>> ol = obs.ObservatoryList()
@@ -89,21 +203,18 @@ class ObservatoryList(object):
         self._raiseError = bool(kwargs.get('raiseError', False))
         self._load(**kwargs)
 
-    def _load(self, **kwargs):
+    def _load(self, force=False, **kwargs):
         """
-        Loads the list of observatories from the database using dataFile property
+        Loads the list of observatories from the database using dataFile property. The database is parsed once per process and only re-read when the file is modified
         """
-        self.heads = [item.strip() for item in open(self.dataFile).readlines() if item.strip()[:7]=='#heads#'][0][7:]
-        self.lines = [item.strip() for item in open(self.dataFile).readlines() if (item.strip()[:1]!='#' and item.strip()!="")]
-        self._wholefile = [item.strip() for item in open(self.dataFile).readlines()]
-        self.obsids = [item.strip().split(';')[0].lower() for item in open(self.dataFile).readlines() if (item.strip()[:1]!='#' and item.strip()!="")]
-        allsplitobs = [item.split(';') for item in self.lines]
-        self.obsdic = {}
-        for item in allsplitobs:
-            try:
-                self.obsdic.update({item[0]:{'name':str(item[1]),'long':_core.E.degrees(item[2]),'lat':_core.E.degrees(item[3]),'elevation':float(item[4]),'temp':float(item[5]),'pressure':float(item[6]),'timezone':str(item[7]),'moonAvoidRadius':float(item[8])}})
-            except:
-              if _exc.raiseIt(_exc.UncompleteObservatory, self._raiseError, item[1]+" ("+item[0]+")"): return
+        db = _database(self.dataFile, force=force)
+        self.heads = db['heads']
+        self.lines = list(db['lines'])
+        self._wholefile = list(db['wholefile'])
+        self.obsids = list(db['obsids'])
+        self.obsdic = dict((k, dict(v)) for k, v in db['obsdic'].items())
+        if db['error'] is not None:
+            if _exc.raiseIt(_exc.UncompleteObservatory, self._raiseError, db['error']): return
 
     def _info(self):
         if not hasattr(self,'obsids'):
@@ -116,7 +227,7 @@ class ObservatoryList(object):
 
     def __getitem__(self, key):
         key = str(key).lower()
-        if key not in self.obsids:
+        if key not in self.obsdic:
             if _exc.raiseIt(_exc.UnknownObservatory, self._raiseError, key): return
         return self.obsdic[key]
 
@@ -149,14 +260,17 @@ class ObservatoryList(object):
           >>>     print(tz)
         """
         obsid = str(obsid).lower().strip()
-        if obsid in self.obsids or obsid.find(' ')!=-1 or obsid.find(';')!=-1:
-            if _exc.raiseIt(_exc.DuplicateObservatory, self._raiseError, obsid): return
-        else:
-            f = open(self.dataFile, 'a')
-            newobs = '\n%s;%s;%s;%s;%4.1f;%2.1f;%4.1f;%s;%3.1f' % (obsid, str(name).replace(";",""), str(long).replace(";",""), str(lat).replace(";",""), float(elevation), float(temp), float(pressure), str(timezone).replace(";",""), float(moonAvoidRadius))
-            f.write(newobs)
-            f.close()
-            self._load(**kwargs)
+        with _locked(self.dataFile):
+            self._load(force=True, **kwargs) # edits from other processes
+            if obsid in self.obsdic or obsid.find(' ')!=-1 or obsid.find(';')!=-1:
+                if _exc.raiseIt(_exc.DuplicateObservatory, self._raiseError, obsid): return
+            else:
+                newobs = '\n%s;%s;%s;%s;%4.1f;%2.1f;%4.1f;%s;%3.1f' % (obsid, str(name).replace(";",""), str(long).replace(";",""), str(lat).replace(";",""), float(elevation), float(temp), float(pressure), str(timezone).replace(";",""), float(moonAvoidRadius))
+                f = open(self.dataFile)
+                content = f.read()
+                f.close()
+                _write(self.dataFile, content+newobs)
+                self._load(**kwargs)
 
     def rem(self, obsid, **kwargs):
         """
@@ -173,14 +287,14 @@ class ObservatoryList(object):
           * Exception: if a mandatory input parameter is missing when reloading all observatories
         """
         obsid = str(obsid).lower().strip()
-        if obsid not in self.obsids:
-            if _exc.raiseIt(_exc.UnknownObservatory, self._raiseError, obsid): return
-        else:
-            newlines = '\n'.join([item.strip() for item in self._wholefile if item.split(';')[0].lower()!=obsid])
-            f = open(self.dataFile, 'w')
-            f.writelines(newlines)
-            f.close()
-            self._load(**kwargs)
+        with _locked(self.dataFile):
+            self._load(force=True, **kwargs) # edits from other processes
+            if obsid not in self.obsdic:
+                if _exc.raiseIt(_exc.UnknownObservatory, self._raiseError, obsid): return
+            else:
+                newlines = '\n'.join([item.strip() for item in self._wholefile if item.split(';')[0].lower()!=obsid])
+                _write(self.dataFile, newlines)
+                self._load(**kwargs)
 
     def mod(self, obsid, name, long, lat, elevation, timezone, temp=15.0, pressure=1010.0, moonAvoidRadius=0.25, **kwargs):
         """
@@ -200,16 +314,80 @@ class ObservatoryList(object):
           Refer to :func:`add` for details on input parameters
         """
         obsid = str(obsid).lower().strip()
-        if obsid not in self.obsids:
-            if _exc.raiseIt(_exc.UnknownObservatory, self._raiseError): return
-        else:
-            newobs = '\n%s;%s;%s;%s;%4.1f;%2.1f;%4.1f;%s;%3.1f' % (str(obsid).lower().strip(), str(name).replace(";",""), str(long).replace(";",""), str(lat).replace(";",""), float(elevation), float(temp), float(pressure), str(timezone).replace(";",""), float(moonAvoidRadius))
-            newlines = '\n'.join([item.strip() for item in self._wholefile if item.split(';')[0].lower()!=str(obsid).lower()])
-            newlines += newobs
-            f = open(self.dataFile, 'w')
-            f.writelines(newlines)
-            f.close()
-            self._load(**kwargs)
+        with _locked(self.dataFile):
+            self._load(force=True, **kwargs) # edits from other processes
+            if obsid not in self.obsdic:
+                if _exc.raiseIt(_exc.UnknownObservatory, self._raiseError, obsid): return
+            else:
+                newobs = '\n%s;%s;%s;%s;%4.1f;%2.1f;%4.1f;%s;%3.1f' % (obsid, str(name).replace(";",""), str(long).replace(";",""), str(lat).replace(";",""), float(elevation), float(temp), float(pressure), str(timezone).replace(";",""), float(moonAvoidRadius))
+                newlines = '\n'.join([item.strip() for item in self._wholefile if item.split(';')[0].lower()!=obsid])
+                newlines += newobs
+                _write(self.dataFile, newlines)
+                self._load(**kwargs)
+
+    def site(self, obsid, horizon_obs=None, epoch='2000', **kwargs):
+        """
+        Returns the immutable :class:`Site` of an observatory of the database, as ``Observatory.site`` would be for ``Observatory(obsid, horizon_obs=horizon_obs, epoch=epoch)``
+
+        Args:
+          * obsid (str): id of the observatory
+          * horizon_obs (float - degrees) [optional]: minimum altitude at which a target can be observed, default is 30 degrees altitude
+          * epoch (str) [optional]: the 'YYYY' year in which all ra-dec coordinates are converted
+
+        Kwargs:
+          * moonAvoidRadius (float - degrees): overrides the database value
+
+        Raises:
+          * KeyError: if the observatory ID does not exist
+        """
+        obsid = str(obsid).lower()
+        if obsid not in self.obsdic:
+            if _exc.raiseIt(_exc.UnknownObservatory, self._raiseError, obsid): return
+        from .Night import Site # only needed here, not at import
+        item = self.obsdic[obsid]
+        epoch = str(int(epoch))
+        epoch = _core.E.J2000 if epoch=='2000' else (_core.E.B1950 if epoch=='1950' else _core.E.Date(epoch)) # as Observatory
+        return Site(long=float(item['long']), lat=float(item['lat']), elevation=float(item['elevation']), temp=float(item['temp']), pressure=float(item['pressure']),
+                    horizon=float(-_core.np.sqrt(2*float(item['elevation'])/_core.E.earth_radius)), epoch=float(epoch), timezone=str(item['timezone']),
+                    horizon_obs=30. if horizon_obs is None else float(horizon_obs), moonAvoidRadius=float(kwargs.get('moonAvoidRadius', item['moonAvoidRadius'])), id=obsid)
+
+    def sweep(self, targets, local_date, obsids=None, horizon_obs=None, n_jobs=None, **kwargs):
+        """
+        Evaluates targets for the same local night at several observatories of the database at once, e.g. to find which telescopes of a network observe them best. No :class:`Observatory` is built: the nights and targets of the sites are processed by :func:`processNight` and :func:`processTargets`, possibly over a pool of processes
+
+        Args:
+          * targets: the list of fixed :class:`Target` (e.g. :class:`TargetSIMBAD`) or names, or a :class:`TargetCatalog`
+          * local_date (see below): the date of the night, in the local time of each observatory
+          * obsids (list of str) [optional]: the ids of the observatories, default is all observatories of the database
+          * horizon_obs (float - degrees) [optional]: minimum altitude at which a target can be observed, default is 30 degrees altitude
+          * n_jobs (int) [optional]: the number of processes over which the sites are spread, ``-1`` for all cores. Default is one process
+
+        Kwargs:
+          * pts, margin, fullhour: see :func:`Observatory.process_obs`
+          * moonAvoidRadius (float - degrees): overrides the database values
+          * catalog, query, batch, workers, retries, backoff, cache, ttl, offline: the resolution of the target names, see :func:`Observation.add_targets`
+
+        Raises:
+          * KeyError: if an observatory ID does not exist
+          * :class:`TargetMissingSIMBAD`: if a target name cannot be resolved
+
+        Returns:
+          * obsids: the list of the ids of the observatories (n_sites)
+          * retval: a (n_sites x n_targets) numpy structured array with keys:
+            * ``hours``: the optimal observation duration in hours, as the ``obs`` category of :func:`Target.whenobs`
+            * ``airmass``: the best airmass between sunset and sunrise, ``nan`` if the target does not rise during the night
+            * ``transit_time``: the transit time (ephem.Date), see :func:`Target.process`
+
+        .. note::
+          * ``local_date`` can be a date-tuple ``(yyyy, mm, dd)``, timestamp, datetime structure or ephem.Date instance.
+
+        >>> import astroobs as obs
+        >>> t = [obs.TargetSIMBAD('vega'), obs.TargetSIMBAD('canopus')]
+        >>> obsids, retval = obs.ObservatoryList().sweep(t, (2015,1,1), n_jobs=-1)
+        >>> [obsids[idx] for idx in retval['hours'].argmax(axis=0)] # best site of each target
+        """
+        from .Sweep import sweep # the compute stack is only needed here, not at import
+        return sweep(self, targets, local_date, obsids=obsids, horizon_obs=horizon_obs, n_jobs=n_jobs, **kwargs)
 
     def nameList(self):
         """
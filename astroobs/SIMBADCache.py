@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+
+import sqlite3
+import json
+from time import time as _time
+
+
+_CHUNK = 500 # names per SELECT, under the sqlite limit of bound parameters
+
+
+def _normName(name):
+    """
+    Normalizes a target name for the cache: lower case, single spaces
+    """
+    return " ".join(str(name).lower().split())
+
+
+class SIMBADCache(object):
+    """
+    A persistent cache of SIMBAD name resolutions, stored in a sqlite database shared by all processes
+
+    Args:
+      * path (str) [optional]: path+file of the database, default is ``~/.astroobs/simbad.sqlite`` or the ``ASTROOBS_SIMBAD_CACHE`` environment variable
+      * ttl (float - days) [optional]: the time-to-live of the records, after which SIMBAD is queried again
+      * offline (bool) [optional]: if ``True``, SIMBAD is never queried, and expired records are used
+
+    Raises:
+      N/A
+
+    The records are dictionaries with keys ``ra`` ('hh mm ss.s'), ``dec`` ('+dd mm ss.s'), ``flux`` (dictionary of magnitudes), ``sptype``, ``plx`` (mas), ``hd``, ``hr``, ``hip`` (``None`` if not applicable). The statistics of the cache are given by :func:`info`
+    """
+    def __init__(self, path=None, ttl=30., offline=False):
+        self.path = _core.simbadCacheFile if path is None else str(path)
+        self.ttl = float(ttl)
+        self.offline = bool(offline)
+        self._created = None # the path whose directory and table exist
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.queries = 0
+
+    def _connect(self):
+        """
+        Opens the database; its directory and table are created at the first connection to ``path``
+        """
+        if self._created!=self.path:
+            directory = _core.os.path.dirname(self.path)
+            if directory!="" and not _core.os.path.isdir(directory): _core.os.makedirs(directory)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if self._created!=self.path:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS simbad (name TEXT PRIMARY KEY, record TEXT, time REAL)")
+            self._created = self.path
+        return conn
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM simbad").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _read(self, name):
+        """
+        Returns the record of ``name`` and its age in days, or ``(None, None)``
+        """
+        return self._read_many([name]).get(name, (None, None))
+
+    def _read_many(self, names):
+        """
+        Returns a dictionary of the records of ``names`` found in the database and their age in days, read over one connection
+        """
+        keys = dict((name, _normName(name)) for name in names)
+        unique = list(set(keys.values()))
+        rows = {}
+        conn = self._connect()
+        try:
+            for i in range(0, len(unique), _CHUNK):
+                chunk = unique[i:i+_CHUNK]
+                rows.update((row[0], row[1:]) for row in conn.execute("SELECT name, record, time FROM simbad WHERE name IN (%s)" % (",".join("?"*len(chunk))), chunk))
+        finally:
+            conn.close()
+        now = _time()
+        return dict((name, (json.loads(rows[key][0]), (now-rows[key][1])/86400.)) for name, key in keys.items() if key in rows)
+
+    def put(self, name, record):
+        """
+        Stores the ``record`` of the target ``name``
+        """
+        self.put_many({name: record})
+
+    def put_many(self, records):
+        """
+        Stores the dictionary ``records`` of records by target name, in one transaction
+        """
+        if len(records)==0: return
+        now = _time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO simbad (name, record, time) VALUES (?, ?, ?)", [(_normName(name), json.dumps(record), now) for name, record in records.items()])
+        finally:
+            conn.close()
+
+    def get(self, name, ttl=None, offline=None):
+        """
+        Returns the cached record of the target ``name``, or ``None`` if it is absent or expired (unless offline)
+        """
+        return self.get_many([name], ttl=ttl, offline=offline)[name]
+
+    def get_many(self, names, ttl=None, offline=None):
+        """
+        Returns a dictionary of the cached records of the targets ``names``, read over one connection; ``None`` for the names absent or expired (unless offline)
+        """
+        if ttl is None: ttl = self.ttl
+        if offline is None: offline = self.offline
+        found = self._read_many(names)
+        records = {}
+        for name in names:
+            record, age = found.get(name, (None, None))
+            if record is None:
+                self.misses += 1
+            elif age>ttl and not offline:
+                self.expired += 1
+                record = None
+            else:
+                self.hits += 1
+            records[name] = record
+        return records
+
+    def resolve(self, name, query, ttl=None, offline=None):
+        """
+        Returns the record of the target ``name`` from the cache, or from ``query(name)`` which is then cached. If the query fails, an expired record is returned if any
+
+        Args:
+          * name (str): the name of the target
+          * query (callable): returns the record of a name from SIMBAD, ``None`` if not found; may raise on network errors
+          * ttl (float - days) [optional]: overrides the time-to-live of the cache
+          * offline (bool) [optional]: overrides the offline mode of the cache
+
+        Returns ``None`` if the target is unknown or, in offline mode, absent from the cache
+        """
+        if offline is None: offline = self.offline
+        record = self.get(name, ttl=ttl, offline=offline)
+        if record is not None or offline: return record
+        self.queries += 1
+        try:
+            record = query(name)
+        except Exception:
+            stale, age = self._read(name)
+            if stale is None: raise
+            return stale
+        if record is not None: self.put(name, record)
+        return record
+
+    def clear(self):
+        """
+        Empties the cache and resets its statistics
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM simbad")
+        finally:
+            conn.close()
+        self._reset_stats()
+
+    def info(self):
+        """
+        Returns a dictionary of the statistics of the cache: ``hits``, ``misses``, ``expired``, ``queries`` (to SIMBAD), ``size``
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'expired': self.expired, 'queries': self.queries, 'size': len(self)}
+
+
+simbadCache = SIMBADCache()
+
+def simbad_cache_info():
+    """
+    Returns the statistics of the SIMBAD cache, see :func:`SIMBADCache.info`
+    """
+    return simbadCache.info()
+
+def simbad_cache_clear():
+    """
+    Empties the SIMBAD cache and resets its statistics
+    """
+    simbadCache.clear()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+from . import _astroobsexception as _exc
+from . import _kernels
+
+from .Night import processNight, processTargets
+from .TargetCatalog import TargetCatalog
+from .TargetSIMBAD import TargetSIMBAD, resolveSIMBAD
+
+import multiprocessing as _mp
+
+
+def _sweep_site(args):
+    """
+    Evaluates targets for one site, as mapped over worker processes by :func:`sweep`. ``args`` is the tuple (site, midnight, coords, epochs, nightkwargs)
+
+    Returns the n_targets durations of the observability categories (a structured array with keys :data:`_kernels.WHENOBS_KEYS`), best airmass and transit time
+    """
+    site, midnight, coords, epochs, nightkwargs = args
+    night = processNight(site, _core.E.Date(midnight), **nightkwargs) # plain floats would be timestamps
+    radec, rst, block = processTargets(night, coords, epochs)
+    dates = _core.np.asarray(night.dates)[None, :]
+    events = _core.np.asarray(night.events)[None][list(_core.np.dtype(_kernels.SUN_EVENTS_DTYPE).names)]
+    alwaysdark = _kernels.alwaysdark(events)
+    stats = _kernels.whenobs_stats(dates=dates, alt=block['alt'][:, None, :], moondist=block['moondist'][:, None, :], events=events, alwaysdark=alwaysdark, horizon_obs=site.horizon_obs, moonAvoidRadius=site.moonAvoidRadius, weights=_core.np.gradient(dates[0])[None, :]*24)
+    if _core.np.isnan(events['sunset'][0]) or _core.np.isnan(events['sunrise'][0]):
+        dark = _core.np.zeros(dates.shape, dtype=bool) | alwaysdark[0]
+    else:
+        dark = (dates>events['sunset'][0]) & (dates<events['sunrise'][0])
+    airmass = _core.np.where(dark & (block['alt']>0), block['airmass'], _core.np.inf).min(axis=-1)
+    airmass[_core.np.isinf(airmass)] = _core.np.nan
+    return stats[:, 0], airmass, rst['transit_time']
+
+
+def _sweep_shard(args):
+    """
+    :func:`_sweep_site` for several nights of one site, as mapped over worker processes by the batch command (see ``python -m astroobs -h``). ``args`` is the tuple (site, midnights, coords, epochs, nightkwargs)
+
+    Returns the (n_nights x n_targets) durations, best airmass and transit time
+    """
+    site, midnights, coords, epochs, nightkwargs = args
+    results = [_sweep_site((site, midnight, coords, epochs, nightkwargs)) for midnight in midnights]
+    return tuple(_core.np.asarray([item[idx] for item in results]) for idx in range(3))
+
+
+def _resolve(targets, raiseError=False, **kwargs):
+    """
+    Returns the list ``targets`` where the names are replaced by their :class:`TargetSIMBAD`: from the local catalog ``catalog`` if given (see :class:`LocalCatalog`), else resolved together by :func:`resolveSIMBAD`, as :func:`Observation.add_targets`. Returns ``None`` if a name cannot be resolved
+    """
+    names = [item for item in targets if isinstance(item, str)]
+    if len(names)==0: return list(targets)
+    catalog = kwargs.get('catalog', None)
+    local = {} if catalog is None else dict((name, catalog.get(name)) for name in names if name in catalog)
+    records, errors = resolveSIMBAD([name for name in names if name not in local], **kwargs)
+    records.update(local)
+    for name in names:
+        if name not in records:
+            if _exc.raiseIt(_exc.TargetMissingSIMBAD, raiseError, name): return
+    return [TargetSIMBAD(name=item, record=records[item], raiseError=raiseError) if isinstance(item, str) else item for item in targets]
+
+
+def sweep(obslist, targets, local_date, obsids=None, horizon_obs=None, n_jobs=None, **kwargs):
+    """
+    Evaluates targets for the same local night at several observatories of the :class:`ObservatoryList` ``obslist``, see :func:`ObservatoryList.sweep`
+    """
+    obsids = list(obslist.obsids) if obsids is None else [str(item).lower() for item in obsids]
+    sites = []
+    for obsid in obsids:
+        sites.append(obslist.site(obsid, horizon_obs=horizon_obs, **kwargs))
+        if sites[-1] is None: return # unknown id
+    if isinstance(targets, TargetCatalog):
+        coords = _core.np.c_[targets._ra, targets._dec]
+        epochs = [str(item) for item in targets._epoch]
+    else:
+        targets = _resolve(targets, raiseError=obslist._raiseError, **kwargs)
+        if targets is None: return # unresolved name
+        coords = _core.np.asarray([item._coords for item in targets], dtype=float).reshape(-1, 2)
+        epochs = [item.input_epoch for item in targets]
+    localnight = _core.cleanTime(local_date, format='dt').replace(hour=23, minute=59, second=59) # as Observatory.upd_date
+    nightkwargs = dict((key, kwargs[key]) for key in ['pts', 'margin', 'fullhour'] if key in kwargs)
+    jobs = [(site, _core.convertTime(localnight, 'utc', site.timezone, format='ed'), coords, epochs, nightkwargs) for site in sites]
+    n_jobs = _mp.cpu_count() if n_jobs is not None and int(n_jobs)<0 else int(n_jobs or 1)
+    if n_jobs<=1 or len(jobs)<=1:
+        results = [_sweep_site(item) for item in jobs]
+    else:
+        pool = _mp.Pool(min(n_jobs, len(jobs)))
+        try:
+            results = pool.map(_sweep_site, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    retval = _core.np.zeros((len(sites), len(coords)), dtype=[('hours', 'f8'), ('airmass', 'f8'), ('transit_time', 'f8')])
+    for idx, (stats, airmass, transit) in enumerate(results):
+        retval['hours'][idx] = stats['obs']
+        retval['airmass'][idx] = airmass
+        retval['transit_time'][idx] = transit
+    return obsids, retval
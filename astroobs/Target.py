@@ -28,6 +28,31 @@
 
 from . import _core
 from . import _astroobsexception as _exc
+from . import _kernels
+
+from .Night import processTargets, _observer, _riseSetTransit
+
+def _radians(value, hours=False):
+    """
+    Converts a coordinate to radian: floats are degrees, strings are sexagesimal ``'hh:mm:ss.s'`` hours if ``hours`` else ``'+/-dd:mm:ss.s'`` degrees, with ``':'`` or whitespace separators
+    """
+    if isinstance(value, (int, float, _core.np.number)):
+        return float(_core.np.deg2rad(value))
+    value = str(value).strip()
+    try:
+        return float(_core.E.hours(value) if hours else _core.E.degrees(value))
+    except (ValueError, TypeError): # any other format understood by astropy
+        return float(_core.Angle(value+('h' if hours else 'd')).rad)
+
+
+def _cancelled(cancel):
+    """
+    Returns whether a stream must stop: ``cancel`` is ``None``, an event-like object with an ``is_set`` method (e.g. ``threading.Event``) or a callable returning ``True`` to stop
+    """
+    if cancel is None: return False
+    if hasattr(cancel, 'is_set'): return bool(cancel.is_set())
+    return bool(cancel())
+
 
 class Target(object):
     """
@@ -42,33 +67,52 @@ class Target(object):
 
     Kwargs:
       * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+      * engine (str): ``'numpy'`` (default) to process the target with vectorized array operations, ``'pyephem'`` to use the reference pyephem per-sample loop
 
     Raises:
       N/A
     """
     def __init__(self, ra, dec, name, input_epoch='2000', obs=None, **kwargs):
         self._raiseError = bool(kwargs.get('raiseError', False))
-        if isinstance(ra, (float, int)):
-            self._ra = _core.Angle(ra, 'deg')
-        else:
-            self._ra = _core.Angle(str(ra)+'h')
-        self._dec = _core.Angle(str(dec)+'d')
+        self._set_coords(ra=_radians(ra, hours=True), dec=_radians(dec))
         self.name = str(name)
         self.input_epoch = str(int(input_epoch))
         if obs is not None: self.process(obs=obs, **kwargs)
 
+    def _set_coords(self, ra, dec):
+        """
+        Sets the ra-dec (radian) of the target in its input epoch. They are also the displayed coordinates, until the target is processed
+        """
+        self._coords = (float(ra), float(dec))
+        self._raRad, self._decRad = self._coords
+        self._body = None
+
     def __getitem__(self, key):
         return getattr(self, str(key).lower(), None)
 
     def _info(self):
-        if not hasattr(self,'_ra') or not hasattr(self,'_dec') or not hasattr(self,'name'):
+        if not hasattr(self,'_raRad') or not hasattr(self,'_decRad') or not hasattr(self,'name'):
             if _exc.raiseIt(_exc.NonTarget, self._raiseError): return
-        return "Target: '%s', %ih%im%2.1fs %s%i°%i'%2.1f\"%s" % (self.name, self._ra.hms[0], self._ra.hms[1], self._ra.hms[2], ('+' if self._dec.dms[0]>0 else ''), self._dec.dms[0], _core.np.abs(self._dec.dms[1]), _core.np.abs(self._dec.dms[2]), '' if not hasattr(self, "_ticked") else (', O' if getattr(self, "_ticked", False) else ', -'))
+        return "Target: '%s', %s %s%s" % (self.name, self.raStr, self.decStr, '' if not hasattr(self, "_ticked") else (', O' if getattr(self, "_ticked", False) else ', -'))
     def __repr__(self):
         return self._info()
     def __str__(self):
         return self._info()
 
+    @property
+    def _ra(self):
+        """
+        The displayed right ascension as an astropy Angle, only built on demand
+        """
+        return _core.Angle(self._raRad, 'rad')
+
+    @property
+    def _dec(self):
+        """
+        The displayed declination as an astropy Angle, only built on demand
+        """
+        return _core.Angle(self._decRad, 'rad')
+
     @property
     def ra(self):
         """
@@ -106,46 +150,30 @@ class Target(object):
         """
         A pretty printable version of the declination of the target
         """
-        dms = self._dec.dms
-        return "%s%i°%i'%2.1f\"" % ('+' if dms[0]>0 else '', dms[0], dms[1], dms[2])
+        dms = _core.np.abs(self._dec.dms)
+        return "%s%i°%i'%2.1f\"" % ('+' if self._decRad>0 else ('-' if self._decRad<0 else ''), dms[0], dms[1], dms[2])
     @decStr.setter
     def decStr(self, value):
         if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "dectr"): return
 
-    def _set_RiseSetTransit(self, target, obs, **kwargs):
+    def _set_rst(self, rst, idx):
         """
-        Adds to self the attributes set_time, set_az, rise_time, rise_az, transit_az, transit_alt, transit_time of a target given an observatory.
-        Set to rise/set attributes to None in case the target does not rise/set
+        Sets the rise, set and transit attributes of the target from the element ``idx`` of the columns returned by :func:`_kernels.rise_set_transit`
         """
-        s1 = obs.date # save initial obs values
-        obs.date = obs.dates[0]
         self.rise_time = None
         self.rise_az = None
         self.set_time = None
         self.set_az = None
-        try: # try block to catch NeverUp or AlwaysUp errors from pyephem in case of polar region
-            self.set_time = obs.next_setting(target)
-            obs.date = self.set_time
-            target.compute(obs)
-            self.set_az = _core.np.rad2deg(target.az)
-            self.rise_time = obs.previous_rising(target)
-            obs.date = self.rise_time
-            target.compute(obs)
-            self.rise_az = _core.np.rad2deg(target.az)
-        except _core.E.AlwaysUpError:
-            self.alwaysUp = True
-        except _core.E.NeverUpError:
-            self.alwaysUp = False
-        if self.rise_time is not None:
-            obs.date = self.rise_time
+        if rst['alwaysUp'][idx]>=0:
+            self.alwaysUp = bool(rst['alwaysUp'][idx])
         else:
-            obs.date = obs.dates[0]
-        self.transit_time = obs.next_transit(target)
-        obs.date = self.transit_time
-        target.compute(obs)
-        self.transit_az = _core.np.rad2deg(target.az)
-        self.transit_alt = _core.np.rad2deg(target.alt)
-        obs.date = s1 # restore initial obs values
+            self.set_time = _core.E.Date(float(rst['set_time'][idx]))
+            self.set_az = float(_core.np.rad2deg(rst['set_az'][idx]))
+            self.rise_time = _core.E.Date(float(rst['rise_time'][idx]))
+            self.rise_az = float(_core.np.rad2deg(rst['rise_az'][idx]))
+        self.transit_time = _core.E.Date(float(rst['transit_time'][idx]))
+        self.transit_az = float(_core.np.rad2deg(rst['transit_az'][idx]))
+        self.transit_alt = float(_core.np.rad2deg(rst['transit_alt'][idx]))
 
     def process(self, obs, **kwargs):
         """
@@ -162,13 +190,14 @@ class Target(object):
 
         Creates vector attributes:
           * ``airmass``: the airmass of the target
-          * ``ha``: the hour angle of the target (degrees)
+          * ``ha``: the hour angle of the target (degrees, in [-180, 180[)
           * ``alt``: the altitude of the target (degrees - horizon is 0)
           * ``az``: the azimuth of the target (degrees)
           * ``moondist``: the angular distance between the moon and the target (degrees)
 
         .. note::
           * All previous attributes are vectors related to the time vector of the observatory used for processing, stored under ``dates`` attribute
+          * The target is processed for the ``night`` of the observatory by :func:`processTargets`, the observatory is not modified
 
         Other attributes:
           * ``rise_time``, ``rise_az``: the time (ephem.Date) and the azimuth (degree) of the rise of the target
@@ -178,28 +207,67 @@ class Target(object):
         .. warning::
           * it can occur that the target does not rise or set for an observatory/date combination. In that case, the corresponding attributes will be set to ``None``, i.e. ``set_time``, ``set_az``, ``rise_time``, ``rise_az``. In that case, an additional parameter is added to the Target object: ``Target.alwaysUp`` which is ``True`` if the target never sets and ``False`` if it never rises above the horizon.
         """
-        save_date = obs.date # saves the date
-        obs.date = obs.dates[0]
+        night = obs.night
+        if _core.pyephemEngine(kwargs):
+            target = self._ephemBody()
+            self._process_ephem(target=target, night=night, **kwargs)
+            self._set_epochRadec(target)
+        else:
+            radec, rst, block = processTargets(night, [self._coords], [self.input_epoch])
+            self._set_block(block, 0)
+            self._set_rst(rst, 0)
+            self._raRad, self._decRad = radec[0, 2], radec[0, 3] # displayed in the observatory epoch, as _set_epochRadec
+
+    def _ephemBody(self):
+        """
+        Returns the pyephem body of the target, built once from its coordinates and input epoch, then reused
+        """
+        key = (self._coords, self.input_epoch)
+        if getattr(self, '_body', None) is None or self._bodyKey!=key:
+            body = _core.E.FixedBody()
+            body.name = self.name
+            body._ra, body._dec = self._coords
+            body._epoch = _core.E.Date(str(int(self.input_epoch))) # as the 'YYYY' epoch of a readdb line
+            self._body = body
+            self._bodyKey = key
+        return self._body
+
+    def _set_epochRadec(self, target):
+        """
+        Sets the displayed ra-dec of the target to the epoch of the observatory, from its processed pyephem body
+        """
+        self._raRad = float(target.a_ra)
+        self._decRad = float(target.a_dec)
+
+    def _set_block(self, block, idx):
+        """
+        Points the vector attributes of the target to the row ``idx`` of a (n_targets x n_dates) block, see :func:`_kernels.block`
+        """
+        for key in ['airmass', 'ha', 'alt', 'az', 'moondist']:
+            setattr(self, key, block[key][idx])
+
+    def _process_ephem(self, target, night, **kwargs):
+        """
+        Reference processing: pyephem computation for each element of ``night.dates``, on a standalone observer of the site
+        """
+        ob = _observer(night.site)
         self.airmass = []
         self.ha = []
         self.alt = []
         self.az = []
         self.moondist = []
-        targetdb = "star,f|V|G2,%s,%s%s,0.0,%s" % (':'.join(list(map(str, self.ra))), '-'*(self.dec[0]<0), ':'.join(list(map(str, list(map(abs, self.dec))))), int(self.input_epoch))
-        target = _core.E.readdb(targetdb)
-        self._set_RiseSetTransit(target=target, obs=obs, **kwargs)
-        for t in range(len(obs.dates)):
-            obs.date = obs.dates[t] # forces the obs date for target calculation
-            target.compute(obs)
+        for k, v in _riseSetTransit(night.site, target, night.dates[0]).items():
+            setattr(self, k, v)
+        moonaz = _core.np.deg2rad(night.moon.az)
+        moonalt = _core.np.deg2rad(night.moon.alt)
+        for t in range(len(night.dates)):
+            ob.date = night.dates[t] # the date for target calculation
+            target.compute(ob)
             self.airmass.append(_core.rad_to_airmass(target.alt))
             self.alt.append(target.alt)
             self.az.append(target.az)
-            self.ha.append(obs.lst[t] - target.a_ra)
-            self.moondist.append(_core.E.separation([self.az[t], self.alt[t]], [_core.np.deg2rad(obs.moon.az[t]), _core.np.deg2rad(obs.moon.alt[t])]))
-        # set radec to obs epoch
-        self._ra = _core.np.rad2deg(_core.Angle(target.a_ra, unit='rad'))
-        self._dec = _core.np.rad2deg(_core.Angle(target.a_dec, unit='rad'))
-        obs.date = save_date # sets obs date back
+            self.ha.append(_kernels.wrap_pi(night.lst[t]*_core.np.pi/12 - target.ra))
+            self.moondist.append(_core.E.separation([self.az[t], self.alt[t]], [moonaz[t], moonalt[t]]))
         self.alt = _core.np.rad2deg(self.alt)
         self.az = _core.np.rad2deg(self.az)
         self.ha = _core.np.rad2deg(self.ha)
@@ -210,30 +278,52 @@ class Target(object):
         """
         Does the calculations for whenobs method
         """
-        if fromDate=="now":
-            fromDate = _core.E.now()
-        else:
-            fromDate = _core.cleanTime(fromDate, format='ed')
-        if toDate=="now+30day":
-            toDate = _core.E.Date(fromDate+30)
-        else:
-            toDate = _core.cleanTime(toDate, format='ed')
+        if _core.pyephemEngine(kwargs):
+            return self._whenobs_ephem(obs=obs, fromDate=fromDate, toDate=toDate, plot=plot, ret=ret, dday=dday, **kwargs)
+        dates = _core.rangeDates(fromDate=fromDate, toDate=toDate, dday=dday)
+        grid = obs._night_grid(dates, **kwargs)
+        radec = self._range_radec(obs=obs, grid=grid)
+        retval = obs._range_whenobs(ra=radec[:, 0], dec=radec[:, 1], grid=grid, **kwargs)
+        return dates, retval, list(_kernels.WHENOBS_KEYS)
+
+    def _range_radec(self, obs, grid, step=30):
+        """
+        Returns the (n_nights x 2) apparent ra-dec (radian) of the target at each mid-night of a night grid of the observatory (see :func:`Observatory._night_grid`), computed every ``step`` nights and interpolated in-between. Neither the target nor the observatory are modified
+        """
+        ob = obs._observer()
+        body = self._ephemBody()
+        mids = grid['dates'][:, grid['dates'].shape[1]//2]
+        nodes = _core.np.unique(_core.np.r_[_core.np.arange(0, mids.size, max(1, int(step))), mids.size-1])
+        radec = []
+        for d in mids[nodes]:
+            ob.date = d
+            body.compute(ob)
+            radec.append((body.ra, body.dec))
+        radec = _core.np.asarray(radec, dtype=float).reshape(-1, 2)
+        ra = _core.np.interp(mids, mids[nodes], _core.np.unwrap(radec[:, 0]))
+        dec = _core.np.interp(mids, mids[nodes], radec[:, 1])
+        return _core.np.c_[ra, dec]
+
+    def _whenobs_ephem(self, obs, fromDate="now", toDate="now+30day", plot=True, ret=False, dday=1, **kwargs):
+        """
+        Reference calculations for whenobs method, processing the observatory and the target night by night
+        """
         old_date = obs.date
-        dday = max(1, int(dday))
-        dates = _core.np.arange(fromDate, toDate, dday)
+        dates = _core.rangeDates(fromDate=fromDate, toDate=toDate, dday=dday)
         retval = []
         for date in dates:
             obs.upd_date(ut_date=_core.E.Date(date), **kwargs)
+            dt = _core.np.gradient(obs.dates)*24 # duration of each sample, also for non-linear sampling
             # checks for polar night/day
             if obs.sunset is None or obs.sunrise is None: # if polar
                 if obs.alwaysDark:
                     gooddates = _core.np.ones(len(obs.dates), dtype=bool)
                 else:
-                    retval.append((0., 0., obs.dates.size*dt, 0., 0., 0., 0.))
+                    retval.append((0., 0., dt.sum(), 0., 0., 0., 0., 0.))
                     continue
             else:
                 gooddates = ((obs.dates>obs.sunset) & (obs.dates<obs.sunrise))
-            dt = (obs.dates[1]-obs.dates[0])*24
+            dt = dt[gooddates]
             self.process(obs=obs, **kwargs)
             badalt = (self.alt[gooddates]<obs.horizon_obs)
             if obs.sunsetastro is None or obs.sunriseastro is None: # no astro set or rise of target
@@ -252,7 +342,7 @@ class Target(object):
             obsbadmoon = ((_core.np.logical_not(badsunrising)) & (_core.np.logical_not(badsunsetting)) & (_core.np.logical_not(badalt)) & (badmoon))
             darkbadalt = ((badalt) & (_core.np.logical_not(badsunrising)) & (_core.np.logical_not(badsunsetting)))
             twighlightbadalt = ((badalt) & ((badsunrising) | (badsunsetting)))
-            retval.append((obsgoodmoon.sum()*dt, obsbadmoon.sum()*dt, sunsettinggoodmoon.sum()*dt, sunsettingbadmoon.sum()*dt, sunrisinggoodmoon.sum()*dt, sunrisingbadmoon.sum()*dt, darkbadalt.sum()*dt, twighlightbadalt.sum()*dt))
+            retval.append(((obsgoodmoon*dt).sum(), (obsbadmoon*dt).sum(), (sunsettinggoodmoon*dt).sum(), (sunsettingbadmoon*dt).sum(), (sunrisinggoodmoon*dt).sum(), (sunrisingbadmoon*dt).sum(), (darkbadalt*dt).sum(), (twighlightbadalt*dt).sum()))
         # set the date back
         obs.upd_date(ut_date=old_date, **kwargs)
         self.process(obs=obs, **kwargs)
@@ -261,6 +351,67 @@ class Target(object):
         retval = _core.np.asarray(retval, dtype=[(key, 'f8') for key in retkeys])
         return dates, retval, retkeys
 
+    def iwhenobs(self, obs, fromDate="now", toDate="now+30day", dday=1, chunk=30, cancel=None, **kwargs):
+        """
+        Generator form of :func:`Target.whenobs`: yields the durations of the observability categories night after night, as soon as they are computed
+
+        Args:
+          * obs (:class:`Observatory`): the observatory for which to process the target
+          * fromDate (see below): the start date of the range
+          * toDate (see below): the end date of the range (excluded), ``None`` for an endless stream
+          * dday: the step in days between two nights
+          * chunk (int): the number of nights processed at once, the memory used does not depend on the length of the range
+          * cancel [optional]: ``threading.Event`` or callable returning ``True`` to stop the stream, checked before each night
+
+        Kwargs:
+          See :class:`Target`, ``pts``, ``margin``, ``fullhour`` of :func:`Observatory.process_obs` and ``exact`` of :func:`Target.whenobs`
+
+        Raises:
+          N/A
+
+        Yields:
+          * date: the UT date of the night (ephem.Date), as the ``dates`` returned by :func:`Target.whenobs`
+          * record: a numpy structured scalar of durations in hours, with keys ``obs``, ``moon``, ``dusk``, ``duskmoon``, ``dawn``, ``dawnmoon``, ``darklow``, ``twighlightlow``
+
+        >>> import astroobs as obs
+        >>> o = obs.Observatory('ohp', local_date=(2015, 1, 1))
+        >>> t = obs.Target(10, 20, 'star')
+        >>> for date, record in t.iwhenobs(o, (2015, 1, 1), None):
+        ...     if record['obs']>2: break
+
+        .. note::
+          * The stream can be stopped at any time with ``break``, the ``close`` method of the generator or ``cancel``. It resumes from the night following the last one yielded with ``fromDate=ephem.Date(date+dday)``
+          * ``local_date`` and ``ut_date`` can be date-tuples ``(yyyy, mm, dd, [hh, mm, ss])``, timestamps, datetime structures or ephem.Date instances.
+          * With the default numpy engine, neither ``obs`` nor the target are modified; the records are equal to those of :func:`Target.whenobs`, up to the interpolation of the target position which restarts at each chunk
+        """
+        if fromDate=="now":
+            fromDate = _core.E.now()
+        else:
+            fromDate = _core.cleanTime(fromDate, format='ed')
+        if toDate=="now+30day":
+            toDate = fromDate+30
+        elif toDate is None:
+            toDate = _core.np.inf
+        else:
+            toDate = _core.cleanTime(toDate, format='ed')
+        dday = max(1, int(dday))
+        chunk = max(1, int(chunk))
+        idx = 0
+        while True:
+            dates = fromDate + _core.np.arange(idx, idx+chunk)*dday # as _core.rangeDates
+            dates = dates[dates<toDate]
+            if dates.size==0 or _cancelled(cancel): return
+            idx += chunk
+            if _core.pyephemEngine(kwargs):
+                retval = self._whenobs_ephem(obs=obs, fromDate=_core.E.Date(dates[0]), toDate=_core.E.Date(dates[-1]+0.5), dday=dday, **kwargs)[1]
+            else:
+                grid = obs._night_grid(dates, **kwargs)
+                radec = self._range_radec(obs=obs, grid=grid)
+                retval = obs._range_whenobs(ra=radec[:, 0], dec=radec[:, 1], grid=grid, **kwargs)
+            for i in range(dates.size):
+                if i>0 and _cancelled(cancel): return
+                yield _core.E.Date(dates[i]), retval[i]
+
     def whenobs(self, obs, fromDate="now", toDate="now+30day", plot=True, ret=False, dday=1, **kwargs):
         """
         Processes the target for the given observatory and dat.
@@ -280,12 +431,15 @@ class Target(object):
           * ncol: number of columns in the legend, default is 3, refer to plt.legend
           * columnspacing: spacing between columns in the legend, refer to plt.legend
           * lfs: legend font size, default is 11
+          * exact (bool): if ``True``, the durations are integrated between the exact crossing times of ``horizon_obs``, ``moonAvoidRadius`` and the twilights, so that a coarse grid (e.g. ``pts=40``) gives precise results. Default is ``False``: the durations are counted on the grid samples. Not available with ``engine='pyephem'``
 
         Raises:
           N/A
 
         .. note::
           * ``local_date`` and ``ut_date`` can be date-tuples ``(yyyy, mm, dd, [hh, mm, ss])``, timestamps, datetime structures or ephem.Date instances.
+          * With the default numpy engine, the whole range is processed at once on a (nights x samples) grid and neither ``obs`` nor the target are modified. ``engine='pyephem'`` processes ``obs`` and the target night by night
+          * See :func:`Target.iwhenobs` to stream the nights of long ranges as they are computed
         """
         defaultlegend = True
         dates, retval, retkeys = self._whenobs(obs=obs, fromDate=fromDate, toDate=toDate, plot=plot, ret=ret, dday=dday, **kwargs)
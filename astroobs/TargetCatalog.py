@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+from . import _core
+from . import _astroobsexception as _exc
+from . import _kernels
+
+from .Target import Target
+
+
+# processed columns: name, dtype. Times are ephem.Date, angles are degrees, durations are hours
+_COLUMNS = [('rise_time', 'f8'), ('set_time', 'f8'), ('transit_time', 'f8'),
+            ('rise_az', 'f4'), ('set_az', 'f4'), ('transit_az', 'f4'), ('transit_alt', 'f4'),
+            ('alwaysUp', 'i1'), ('max_alt', 'f4')] + [(key, 'f4') for key in _kernels.WHENOBS_KEYS]
+
+# reference directions for the fit of the apparent places: the 26 neighbours of the origin in a cube
+_REFXYZ = _core.np.asarray([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1) if (x, y, z)!=(0, 0, 0)], dtype=float)
+_REFXYZ /= _core.np.sqrt((_REFXYZ**2).sum(axis=1))[:, None]
+
+
+def _apparentPlaces(ob, ra, dec, epochs, pyephem=False):
+    """
+    Returns the apparent ra-dec (radian) of fixed targets for the pyephem observer ``ob`` at its date, from their ra-dec (radian) in their 'YYYY' input ``epochs``. The transformation is fitted on the reference directions for each epoch, unless ``pyephem`` is ``True``: each target is then computed with pyephem
+    """
+    epochs = _core.np.asarray(epochs).astype(int)
+    appra = _core.np.empty(ra.size)
+    appdec = _core.np.empty(ra.size)
+    body = _core.E.FixedBody()
+    for epoch in _core.np.unique(epochs):
+        sel = (epochs==epoch)
+        body._epoch = _core.E.Date(str(int(epoch)))
+        if pyephem:
+            app = []
+            for r, d in zip(ra[sel], dec[sel]):
+                body._ra, body._dec = r, d
+                body.compute(ob)
+                app.append((body.ra, body.dec))
+            app = _core.np.asarray(app, dtype=float).reshape(-1, 2)
+            appra[sel], appdec[sel] = app[:, 0], app[:, 1]
+            continue
+        app = []
+        for r, d in zip(*_kernels.xyz_to_radec(_REFXYZ)):
+            body._ra, body._dec = r, d
+            body.compute(ob)
+            app.append((body.ra, body.dec))
+        app = _core.np.asarray(app, dtype=float)
+        rot, beta = _kernels.apparent_fit(_REFXYZ, _kernels.radec_to_xyz(app[:, 0], app[:, 1]))
+        appra[sel], appdec[sel] = _kernels.apparent_apply(ra[sel], dec[sel], rot, beta)
+    return appra, appdec
+
+
+class TargetCatalog(object):
+    """
+    Array-backed container of fixed targets, for very large target lists (e.g. 10^5 - 10^6 survey fields). Names, coordinates, epochs, the ticked mask and the processed quantities are stored as contiguous columns; selection, ticking and processing are vectorized, and :class:`Target` objects are only created on demand
+
+    Args:
+      * ra (array of float - degrees): the right ascensions of the targets
+      * dec (array of float - degrees): the declinations of the targets
+      * names (array of str) [optional]: the names of the targets, default is ``'field<index>'``
+      * input_epoch (str/int or array of str/int): the 'YYYY' year of epoch in which the ra-dec coordinates are given, for all targets or per target
+      * ticked (bool or array of bool): whether the targets are selected for observation, default is ``True``
+      * obs (:class:`Observatory`) [optional]: the observatory for which to process the catalog
+
+    Kwargs:
+      * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+      * chunk (int): the number of targets processed together, which bounds the memory use, default is 2000
+      * engine (str): ``'numpy'`` (default) computes the apparent places of all targets from a transformation fitted on a few reference directions, ``'pyephem'`` computes them with pyephem target by target
+      * exact (bool): if ``True``, the durations are integrated between the exact crossing times of the thresholds, see :func:`Target.whenobs`. Default is ``False``
+
+    Raises:
+      * :class:`CatalogShapeMismatch`: if the columns have different lengths
+
+    Columns, accessed by key (e.g. ``catalog['max_alt']``) as numpy arrays:
+      * ``name``, ``ra``, ``dec`` (degrees), ``input_epoch``, ``ticked``
+      * ``processed``: whether the target was processed at the last call of :func:`TargetCatalog.process`
+      * ``rise_time``, ``set_time``, ``transit_time`` (ephem.Date, ``nan`` if the target does not rise or set), ``rise_az``, ``set_az``, ``transit_az``, ``transit_alt`` (degrees), ``alwaysUp`` (1 if the target never sets, 0 if it never rises, -1 otherwise), as the attributes of :class:`Target`
+      * ``max_alt``: the highest altitude of the target between sunset and sunrise (degrees)
+      * ``obs``, ``moon``, ``dusk``, ``duskmoon``, ``dawn``, ``dawnmoon``, ``darklow``, ``twighlightlow``: the durations (hours) of the observability categories over the night, as in :func:`Target.whenobs`
+
+    .. note::
+      * Integer indexing returns a :class:`Target`, any other indexing (slice, boolean mask, index array) returns a new :class:`TargetCatalog`
+      * The numpy apparent places agree with pyephem within a few milliarcseconds, except within a few degrees of the Sun (light deflection, < 0.2")
+
+    >>> import astroobs as obs
+    >>> import numpy as np
+    >>> o = obs.Observatory('vlt', local_date=(2015,1,1))
+    >>> cat = obs.TargetCatalog(ra=np.random.uniform(0, 360, 100000), dec=np.random.uniform(-90, 30, 100000))
+    >>> cat.process(o)
+    >>> best = cat[cat['obs']>6]
+    >>> best[0]
+    """
+    def __init__(self, ra, dec, names=None, input_epoch='2000', ticked=True, obs=None, **kwargs):
+        self._raiseError = bool(kwargs.get('raiseError', False))
+        self._chunk = max(1, int(kwargs.get('chunk', 2000)))
+        self._ra = _core.np.deg2rad(_core.np.asarray(ra, dtype=float).ravel())
+        self._dec = _core.np.deg2rad(_core.np.asarray(dec, dtype=float).ravel())
+        n = self._ra.size
+        if self._dec.size!=n:
+            if _exc.raiseIt(_exc.CatalogShapeMismatch, self._raiseError, 'dec'): return
+        if names is None:
+            self._names = _core.np.char.mod('field%i', _core.np.arange(n))
+        else:
+            self._names = _core.np.asarray(names, dtype=str).ravel()
+        if self._names.size!=n:
+            if _exc.raiseIt(_exc.CatalogShapeMismatch, self._raiseError, 'names'): return
+        for key, value, dtype in [('_epoch', input_epoch, 'f8'), ('_ticked', ticked, bool)]:
+            value = _core.np.asarray(value).astype(dtype).ravel()
+            if value.size not in (1, n):
+                if _exc.raiseIt(_exc.CatalogShapeMismatch, self._raiseError, key[1:]): return
+            setattr(self, key, _core.np.repeat(value, n) if value.size==1 else value)
+        self._epoch = self._epoch.astype('i2')
+        self._reset()
+        if obs is not None: self.process(obs=obs, **kwargs)
+
+    def _reset(self):
+        """
+        Empties the processed columns
+        """
+        n = len(self)
+        self._processed = _core.np.zeros(n, dtype=bool)
+        self._columns = {}
+        for key, dtype in _COLUMNS:
+            self._columns[key] = _core.np.full(n, -1 if dtype=='i1' else _core.np.nan, dtype=dtype)
+
+    def __len__(self):
+        return self._ra.size
+
+    def _info(self):
+        return "TargetCatalog: %i targets, %i ticked, %i processed" % (len(self), self._ticked.sum(), self._processed.sum())
+    def __repr__(self):
+        return self._info()
+    def __str__(self):
+        return self._info()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, (int, _core.np.integer)):
+            return self.target(key)
+        return self.select(key)
+
+    def column(self, key):
+        """
+        Returns a read-only view of the column ``key`` of the catalog, see :class:`TargetCatalog`
+        """
+        key = str(key)
+        if key=='ra':
+            ret = _core.np.rad2deg(self._ra)
+        elif key=='dec':
+            ret = _core.np.rad2deg(self._dec)
+        else:
+            ret = {'name': self._names, 'input_epoch': self._epoch, 'ticked': self._ticked, 'processed': self._processed}.get(key, self._columns.get(key))
+            if ret is None: return None
+            ret = ret.view()
+        ret.flags.writeable = False
+        return ret
+
+    @property
+    def ticked(self):
+        """
+        Shows whether the targets are selected for observation, as a read-only boolean array. Use :func:`TargetCatalog.tick` to change it
+        """
+        return self.column('ticked')
+    @ticked.setter
+    def ticked(self, value):
+        if _exc.raiseIt(_exc.ReadOnly, self._raiseError, "ticked"): return
+
+    def tick(self, rows=None, forceTo=None):
+        """
+        Changes the ticked property of targets (whether they are selected for observation)
+
+        Args:
+          * rows (int, slice, boolean mask or index array) [optional]: the targets to change, default is all
+          * forceTo (bool or boolean array) [optional]: if ``True``, selects the targets for observation, if ``False``, unselects them, if ``None``, their selection is inverted
+
+        .. note::
+          * Unlike :func:`Observation.tick`, targets are not re-processed: call :func:`TargetCatalog.process` once the selection is done
+
+        >>> cat.tick(forceTo=False)
+        >>> cat.tick(cat['dec']<-60, forceTo=True)
+        """
+        if rows is None: rows = slice(None)
+        if forceTo is None:
+            self._ticked[rows] = ~self._ticked[rows]
+        else:
+            self._ticked[rows] = forceTo
+
+    def select(self, rows):
+        """
+        Returns a new :class:`TargetCatalog` with the targets ``rows`` (slice, boolean mask or index array) of the catalog, including their processed columns
+        """
+        ret = object.__new__(self.__class__)
+        ret._raiseError = self._raiseError
+        ret._chunk = self._chunk
+        for key in ['_ra', '_dec', '_names', '_epoch', '_ticked', '_processed']:
+            setattr(ret, key, _core.np.atleast_1d(getattr(self, key)[rows]).copy())
+        ret._columns = dict((key, _core.np.atleast_1d(value[rows]).copy()) for key, value in self._columns.items())
+        return ret
+
+    def target(self, idx, obs=None, **kwargs):
+        """
+        Creates the :class:`Target` of index ``idx`` of the catalog, with its ticked flag and, if it was processed, its rise, set and transit attributes. If ``obs`` is given, the target is processed for this observatory
+
+        Kwargs:
+          See :class:`Target`
+        """
+        idx = int(idx)
+        ra, dec = _core.np.rad2deg([self._ra[idx], self._dec[idx]])
+        kwargs['raiseError'] = kwargs.get('raiseError', self._raiseError)
+        tgt = Target(ra=float(ra), dec=float(dec), name=self._names[idx], input_epoch=self._epoch[idx], **kwargs)
+        tgt._ticked = bool(self._ticked[idx])
+        if self._processed[idx]:
+            for key in ['rise_time', 'set_time', 'transit_time']:
+                value = float(self._columns[key][idx])
+                setattr(tgt, key, None if _core.np.isnan(value) else _core.E.Date(value))
+            for key in ['rise_az', 'set_az', 'transit_az', 'transit_alt']:
+                value = float(self._columns[key][idx])
+                setattr(tgt, key, None if _core.np.isnan(value) else value)
+            if self._columns['alwaysUp'][idx]>=0: tgt.alwaysUp = bool(self._columns['alwaysUp'][idx])
+        if obs is not None: tgt.process(obs=obs, **kwargs)
+        return tgt
+
+    def _apparent(self, rows, obs, **kwargs):
+        """
+        Returns the apparent ra-dec (radian) of the targets ``rows`` (index array) at the mid-night of the observatory
+        """
+        ob = obs._observer()
+        ob.date = obs.dates[len(obs.dates)//2]
+        return _apparentPlaces(ob, self._ra[rows], self._dec[rows], self._epoch[rows], pyephem=_core.pyephemEngine(kwargs))
+
+    def _rows(self, rows=None, recalcAll=False):
+        """
+        Index array of the targets ``rows``, default is the ticked targets or all targets if ``recalcAll``
+        """
+        if rows is not None: return _core.np.arange(len(self))[rows].ravel()
+        if recalcAll: return _core.np.arange(len(self))
+        return _core.np.flatnonzero(self._ticked)
+
+    def process(self, obs, recalcAll=False, **kwargs):
+        """
+        Processes the catalog for the given observatory and date, filling the processed columns (see :class:`TargetCatalog`). The full (n_targets x n_dates) curves are not stored, see :func:`TargetCatalog.curves`
+
+        Args:
+          * obs (:class:`Observatory`): the observatory for which to process the catalog
+          * recalcAll (bool) [optional]: if ``False`` (default): only targets selected for observation are processed, if ``True``: all targets are processed
+
+        Kwargs:
+          See :class:`TargetCatalog`
+
+        Raises:
+          N/A
+
+        .. note::
+          * The processed columns of the targets not processed are set to ``nan``
+          * Neither the observatory nor the catalog coordinates are modified
+        """
+        self._reset()
+        rows = self._rows(recalcAll=recalcAll)
+        if rows.size==0: return
+        chunk = max(1, int(kwargs.get('chunk', self._chunk)))
+        ra, dec = self._apparent(rows=rows, obs=obs, **kwargs)
+        grid = obs._processed_grid()
+        night = _kernels.night_mask(grid['dates'], grid['events'], grid['alwaysDark'])
+        for idx in range(0, rows.size, chunk):
+            sl = slice(idx, idx+chunk)
+            rst = _kernels.rise_set_transit(ra=ra[sl], dec=dec[sl], t0=grid['dates'][0, 0], long=obs.long, lat=obs.lat, horizon=obs.horizon, pressure=obs.pressure, temp=obs.temp)
+            for key in ['rise_az', 'set_az', 'transit_az', 'transit_alt']:
+                rst[key] = _core.np.rad2deg(rst[key])
+            for key, value in rst.items():
+                self._columns[key][rows[sl]] = value
+            alt, moondist = _kernels.grid_altmoondist(ra=ra[sl, None], dec=dec[sl, None], lst=grid['lst'], moonaz=grid['moonaz'], moonalt=grid['moonalt'], lat=obs.lat, pressure=obs.pressure, temp=obs.temp)
+            stats = obs._range_whenobs(ra=ra[sl, None], dec=dec[sl, None], grid=grid, exact=kwargs.get('exact', False), alt=alt, moondist=moondist)
+            for key in _kernels.WHENOBS_KEYS:
+                self._columns[key][rows[sl]] = stats[key][:, 0]
+            if night.any(): self._columns['max_alt'][rows[sl]] = _core.np.where(night, alt[:, 0], -_core.np.inf).max(axis=-1)
+        self._processed[rows] = True
+
+    def curves(self, obs, rows=None, **kwargs):
+        """
+        Computes the full (n_targets x n_dates) curves of some targets of the catalog for the given observatory and date
+
+        Args:
+          * obs (:class:`Observatory`): the observatory
+          * rows (int, slice, boolean mask or index array) [optional]: the targets, default is the ticked targets
+
+        Kwargs:
+          See :class:`TargetCatalog`
+
+        Returns:
+          A dictionary of (n_targets x n_dates) arrays ``airmass``, ``ha``, ``alt``, ``az``, ``moondist`` as ``Observation.block``, with the index array of the targets under the ``rows`` key
+        """
+        rows = self._rows(rows=rows)
+        ra, dec = self._apparent(rows=rows, obs=obs, **kwargs)
+        ret = _kernels.block(ra=ra, dec=dec, lst=obs.lst*_core.np.pi/12, lat=obs.lat, moonaz=_core.np.deg2rad(obs.moon.az), moonalt=_core.np.deg2rad(obs.moon.alt), pressure=obs.pressure, temp=obs.temp)
+        ret['rows'] = rows
+        return ret
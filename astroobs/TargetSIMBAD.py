@@ -28,7 +28,157 @@
 from . import _core
 from . import _astroobsexception as _exc
 
-from .Target import Target
+from .Target import Target, _radians
+from .SIMBADCache import simbadCache
+
+from time import sleep as _sleep
+
+
+def _simbad():
+    """
+    Returns a Simbad query object with the fields of the records
+    """
+    customSimbad = _core.Simbad()
+    customSimbad.add_votable_fields('fluxdata(U)', 'fluxdata(B)', 'fluxdata(V)', 'fluxdata(R)', 'fluxdata(I)', 'fluxdata(J)', 'fluxdata(H)', 'fluxdata(K)', 'plx', 'sptype')
+    return customSimbad
+
+
+def _record(result, idx, ids):
+    """
+    Builds a record (see :class:`SIMBADCache`) from the row ``idx`` of a SIMBAD result table, and the list of identifiers of the target
+    """
+    record = {'ra': str(result['RA'][idx]), 'dec': str(result['DEC'][idx]), 'flux': {}, 'sptype': str(result['SP_TYPE'][idx]), 'plx': None, 'hd': None, 'hr': None, 'hip': None}
+    # copies the fluxes
+    for band in ['U', 'B', 'V', 'R', 'I', 'J', 'H', 'K']:
+        if not hasattr(result['FLUX_'+band][idx], 'mask'): record['flux'][band] = float(result['FLUX_'+band][idx])
+    if not hasattr(result['PLX_VALUE'][idx],'mask'):
+        record['plx'] = float(result['PLX_VALUE'][idx])
+    # searches for HD, HR, and HIP numbers
+    for i in ids:
+        i = str(i).strip().upper()
+        if i[:3]=='HD ':
+            record['hd'] = int(_core.make_num(_core.re.sub('^(HD)','',i).strip()))
+        if i[:3]=='HR ':
+            record['hr'] = int(_core.make_num(_core.re.sub('^(HR)','',i).strip()))
+        if i[:4]=='HIP ':
+            record['hip'] = int(_core.make_num(_core.re.sub('^(HIP)','',i).strip()))
+    return record
+
+
+def querySIMBAD(name):
+    """
+    Queries the online SIMBAD database for the target ``name``
+
+    Returns a record dictionary (see :class:`SIMBADCache`), or ``None`` if the target was not found. Network errors are raised
+    """
+    result = _simbad().query_object(name)
+    if result is None: return None
+    ids = _core.Simbad.query_objectids(name)
+    return _record(result, 0, [] if ids is None else ids['ID'])
+
+
+def querySIMBADBatch(names):
+    """
+    Queries the online SIMBAD database for several targets in a single request, identifiers included
+
+    Returns a dictionary of the records of ``names`` (see :class:`SIMBADCache`), ``None`` for the targets not found. Network errors are raised
+    """
+    names = list(names)
+    records = dict((name, None) for name in names)
+    customSimbad = _simbad()
+    customSimbad.add_votable_fields('ids')
+    result = customSimbad.query_objects(names)
+    if result is None: return records
+    if 'SCRIPT_NUMBER_ID' in result.colnames: # 1-based index of the name of each row
+        rows = [(int(item)-1, idx) for idx, item in enumerate(result['SCRIPT_NUMBER_ID'])]
+    elif len(result)==len(names):
+        rows = list(enumerate(range(len(result))))
+    else: # cannot match rows and names
+        return dict((name, querySIMBAD(name)) for name in names)
+    for nameidx, idx in rows:
+        if hasattr(result['RA'][idx], 'mask'): continue # not found
+        records[names[nameidx]] = _record(result, idx, str(result['IDS'][idx]).split('|'))
+    return records
+
+
+def resolveSIMBAD(names, query=None, batch=50, workers=4, retries=3, backoff=1., **kwargs):
+    """
+    Resolves many target names at once: from the SIMBAD cache when possible, else by batched queries run over a pool of concurrent workers, with retries
+
+    Args:
+      * names (list of str): the names of the targets
+      * query (callable) [optional]: ``query(names)`` returns the dictionary of the records of ``names`` (``None`` if not found) and may raise on network errors, default is :func:`querySIMBADBatch`. Replace it to use a local stand-in of SIMBAD or recorded responses
+      * batch (int) [optional]: the number of names per query
+      * workers (int) [optional]: the maximum number of concurrent queries
+      * retries (int) [optional]: the number of retries of a failed query
+      * backoff (float - s) [optional]: the wait before the first retry, doubled at each retry
+
+    Kwargs:
+      * cache, ttl, offline: see :class:`TargetSIMBAD`
+
+    Returns:
+      * records: a dictionary of the records of the resolved names, see :class:`SIMBADCache`
+      * errors: a dictionary of the error message of the names which could not be resolved
+
+    .. note::
+      * A failed batch does not stop the others; its names use expired cache records if any
+    """
+    if query is None: query = querySIMBADBatch
+    usecache = kwargs.get('cache', True)
+    offline = kwargs.get('offline', None)
+    if offline is None: offline = simbadCache.offline
+    records = {}
+    errors = {}
+    todo = []
+    seen = set()
+    unique = []
+    for name in names:
+        if name not in seen:
+            seen.add(name)
+            unique.append(name)
+    names = unique
+    cached = simbadCache.get_many(names, ttl=kwargs.get('ttl', None), offline=offline) if usecache else {}
+    for name in names:
+        if cached.get(name) is not None:
+            records[name] = cached[name]
+        elif offline and usecache:
+            errors[name] = "not in the SIMBAD cache and the offline mode is on"
+        else:
+            todo.append(name)
+    batches = [todo[i:i+max(int(batch), 1)] for i in range(0, len(todo), max(int(batch), 1))]
+    if len(batches)==0: return records, errors
+    def run(chunk):
+        for attempt in range(int(retries)+1):
+            try:
+                return query(chunk), None
+            except Exception as e:
+                err = e
+                if attempt<int(retries): _sleep(backoff*2**attempt)
+        return None, err
+    from multiprocessing.pool import ThreadPool # only needed here, not at import
+    pool = ThreadPool(max(1, min(int(workers), len(batches))))
+    try:
+        results = pool.map(run, batches)
+    finally:
+        pool.close()
+    simbadCache.queries += len(batches)
+    failed = [name for chunk, (result, err) in zip(batches, results) if result is None for name in chunk]
+    stale = simbadCache._read_many(failed) if usecache and len(failed)>0 else {}
+    resolved = {}
+    for chunk, (result, err) in zip(batches, results):
+        for name in chunk:
+            if result is None: # failed batch
+                if name in stale:
+                    records[name] = stale[name][0]
+                else:
+                    errors[name] = "SIMBAD query failed: %s" % (err)
+            elif result.get(name) is None:
+                errors[name] = "not found in SIMBAD"
+            else:
+                records[name] = resolved[name] = result[name]
+    if usecache: simbadCache.put_many(resolved)
+    return records, errors
+
 
 class TargetSIMBAD(Target):
     """
@@ -40,9 +190,14 @@ class TargetSIMBAD(Target):
     
     Kwargs:
       * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+      * cache (bool): if ``True`` (default), the name is resolved from the persistent SIMBAD cache when possible, see :class:`SIMBADCache`
+      * ttl (float - days): overrides the time-to-live of the SIMBAD cache records
+      * offline (bool): if ``True``, SIMBAD is never queried and the target must be in the cache. Default is the offline mode of the cache
+      * record (dict): a record already resolved (see :class:`SIMBADCache`), SIMBAD and the cache are then not used, see :func:`resolveSIMBAD`
 
     Raises:
-      N/A
+      * NameError: if the target was not found in SIMBAD
+      * NameError: if the target is not in the cache in offline mode
 
     Creates attributes:
       * ``flux``: a dictionary of the magnitudes of the target. Keys are part or all of ['U','B','V','R','I','J','H','K']
@@ -56,44 +211,37 @@ class TargetSIMBAD(Target):
         self._raiseError = bool(kwargs.get('raiseError', False))
         self.name = str(name)
         self.input_epoch = str(int(input_epoch))
-        customSimbad = _core.Simbad()
-        customSimbad.add_votable_fields('fluxdata(U)', 'fluxdata(B)', 'fluxdata(V)', 'fluxdata(R)', 'fluxdata(I)', 'fluxdata(J)', 'fluxdata(H)', 'fluxdata(K)', 'plx', 'sptype')
+        offline = kwargs.get('offline', None)
         self._error = False
         try:
-            result = customSimbad.query_object(self.name)
+            if kwargs.get('record', None) is not None: # already resolved
+                record = kwargs['record']
+            elif kwargs.get('cache', True):
+                record = simbadCache.resolve(self.name, query=querySIMBAD, ttl=kwargs.get('ttl', None), offline=offline)
+            else:
+                record = querySIMBAD(self.name)
         except:
+            record = None
+        if record is None:
             self._error = True
-        if self._error is True or result is None:
-            self._error = True
-            if _exc.raiseIt(_exc.TargetMissingSIMBAD, self._raiseError, self.name): return
-        self._ra = _core.Angle(str(result['RA'][0])+'h')
-        self._dec = _core.Angle(str(result['DEC'][0])+'d')
-
-        # copies the fluxes
-        self.flux = {}
-        if not hasattr(result['FLUX_U'][0], 'mask'): self.flux['U'] = float(result['FLUX_U'][0])
-        if not hasattr(result['FLUX_B'][0], 'mask'): self.flux['B'] = float(result['FLUX_B'][0])
-        if not hasattr(result['FLUX_V'][0], 'mask'): self.flux['V'] = float(result['FLUX_V'][0])
-        if not hasattr(result['FLUX_R'][0], 'mask'): self.flux['R'] = float(result['FLUX_R'][0])
-        if not hasattr(result['FLUX_I'][0], 'mask'): self.flux['I'] = float(result['FLUX_I'][0])
-        if not hasattr(result['FLUX_J'][0], 'mask'): self.flux['J'] = float(result['FLUX_J'][0])
-        if not hasattr(result['FLUX_H'][0], 'mask'): self.flux['H'] = float(result['FLUX_H'][0])
-        if not hasattr(result['FLUX_K'][0], 'mask'): self.flux['K'] = float(result['FLUX_K'][0])
-        self.sptype = str(result['SP_TYPE'][0])
-        if not hasattr(result['PLX_VALUE'][0],'mask'):
-            self.plx = float(result['PLX_VALUE'][0])
-            self.dist = 1000/self.plx
-
-        # searches for HD, HR, and HIP numbers
-        for i in _core.Simbad.query_objectids(self.name)['ID']:
-            i = i.upper()
-            if i[:3]=='HD ':
-                self.hd = int(_core.make_num(_core.re.sub('^(HD)','',i).strip()))
-            if i[:3]=='HR ':
-                self.hr = int(_core.make_num(_core.re.sub('^(HR)','',i).strip()))
-            if i[:4]=='HIP ':
-                self.hip = int(_core.make_num(_core.re.sub('^(HIP)','',i).strip()))
+            if (simbadCache.offline if offline is None else offline) and kwargs.get('cache', True):
+                if _exc.raiseIt(_exc.OfflineSIMBAD, self._raiseError, self.name): return
+            else:
+                if _exc.raiseIt(_exc.TargetMissingSIMBAD, self._raiseError, self.name): return
+        self._fill(record)
+        if obs is not None: self.process(obs=obs, **kwargs)
 
+    def _fill(self, record):
+        """
+        Sets the attributes of the target from a SIMBAD record, see :class:`SIMBADCache`
+        """
+        self._set_coords(ra=_radians(record['ra'], hours=True), dec=_radians(record['dec']))
+        self.flux = dict(record['flux'])
+        self.sptype = str(record['sptype'])
+        if record.get('plx') is not None:
+            self.plx = float(record['plx'])
+            self.dist = 1000/self.plx
+        for item in ['hd', 'hr', 'hip']:
+            if record.get(item) is not None: setattr(self, item, int(record[item]))
         self.link = "http://simbad.u-strasbg.fr/simbad/sim-id?Ident=" + self.name.replace("+","%2B").replace("#","%23").replace(" ","+")
         self.linkbib = self.link + "&submit=display&bibdisplay=refsum&bibyear1=1950&bibyear2=%24currentYear#lab_bib"
-        if obs is not None: self.process(obs=obs, **kwargs)
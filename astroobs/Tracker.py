@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from . import _core
+from . import _astroobsexception as _exc
+from . import _kernels
+
+from .Observatory import Observatory
+from .MoonCache import getMoonCache
+from .Night import _observer
+from .TargetCatalog import _apparentPlaces
+
+
+class Tracker(object):
+    """
+    Live tracking of the ticked targets of an :class:`Observation`: evaluates the exact position of all of them at a single date, e.g. *now*, at each call of :func:`Tracker.update`. The terms which do not depend on the date of the tick are kept between ticks: the list of ticked targets, their apparent places (refreshed every ``refresh`` minutes) and the :class:`MoonCache` of the site
+
+    Args:
+      * observation (:class:`Observation`): the observation whose ticked targets are tracked
+      * refresh (float - minutes) [optional]: the time after which the apparent places of the targets are computed again, default is 60. Their drift over an hour is below 0.1"
+
+    Kwargs:
+      * raiseError (bool): if ``True``, errors will be raised; if ``False``, they will be printed. Default is ``False``
+      * engine (str): ``'numpy'`` (default) to evaluate all targets in one vectorized call, ``'pyephem'`` to compute each target and the moon with pyephem at each tick
+
+    Raises:
+      * :class:`NonObservatory`: if ``observation`` is not an observatory
+
+    Creates vector attributes at each :func:`Tracker.update`, one element per ticked target:
+      * ``names``: the names of the targets
+      * ``airmass``: the airmass of the targets
+      * ``ha``: the hour angle of the targets (degrees)
+      * ``alt``: the altitude of the targets (degrees - horizon is 0)
+      * ``az``: the azimuth of the targets (degrees)
+      * ``moondist``: the distance from the targets to the moon (degrees)
+      * ``observable``: whether the targets are above ``horizon_obs`` and farther than ``moonAvoidRadius`` from the moon
+
+    Other attributes:
+      * ``date``: the date (ephem.Date) of the last tick
+      * ``moonalt``, ``moonaz`` (degrees), ``moonphase`` (%): the position and phase of the moon at the last tick
+
+    .. note::
+      * The ticked targets and the site are read from the observation at each tick, so that ticking, adding targets or changing the observatory of the observation are followed. Neither the observation nor its targets are modified
+      * Contrary to :func:`Observatory.nowArg`, no grid is used: the positions are exact at the date of the tick
+
+    >>> import astroobs as obs
+    >>> import time
+    >>> o = obs.Observation('vlt')
+    >>> o.add_target('canopus')
+    >>> o.add_target('sirius')
+    >>> tracker = obs.Tracker(o)
+    >>> while True:
+    ...     tracker.update()
+    ...     print(tracker.alt, tracker.moondist)
+    ...     time.sleep(1)
+    """
+    def __init__(self, observation, refresh=60., **kwargs):
+        self._raiseError = bool(kwargs.get('raiseError', False))
+        if not isinstance(observation, Observatory):
+            if _exc.raiseIt(_exc.NonObservatory, self._raiseError, observation): return
+        self._observation = observation
+        self.refresh = float(refresh)
+        self._engine = kwargs.get('engine', 'numpy')
+        self._reset()
+
+    def _reset(self):
+        """
+        Forgets the cached terms, they are computed again at the next tick
+        """
+        self._key = None
+        self._placesDate = None
+
+    def _info(self):
+        if getattr(self, 'date', None) is None:
+            return "Tracker of %i targets at %s, not updated" % (len(self._ticked()), self._observation.name)
+        return "Tracker of %i targets at %s on %s" % (len(self.names), self._observation.name, self.date)
+    def __repr__(self):
+        return self._info()
+    def __str__(self):
+        return self._info()
+
+    def _ticked(self):
+        """
+        Returns the ticked fixed targets of the observation
+        """
+        return [item for item in self._observation.targets if item._ticked and hasattr(item, '_coords')]
+
+    def _prepare(self, date):
+        """
+        Updates the cached terms if the site or the ticked targets of the observation changed, and the apparent places if they are older than ``refresh``
+        """
+        site = self._observation.site
+        targets = self._ticked()
+        key = (site, tuple((item._coords, item.input_epoch) for item in targets)) # coordinates rather than objects: targets can be refilled in place
+        if key!=self._key:
+            self._key = key
+            self._site = site
+            self.names = [item.name for item in targets]
+            self._coords = _core.np.asarray([item._coords for item in targets], dtype=float).reshape(-1, 2)
+            self._epochs = _core.np.asarray([int(item.input_epoch) for item in targets], dtype=int)
+            self._moon = getMoonCache(long=site.long, lat=site.lat, elevation=site.elevation, epoch=site.epoch)
+            self._placesDate = None
+        if self._placesDate is None or abs(date-self._placesDate)*1440>self.refresh:
+            self._placesDate = date
+            self._ra, self._dec = _apparentPlaces(_observer(site, date), self._coords[:, 0], self._coords[:, 1], self._epochs)
+
+    def update(self, date=None, **kwargs):
+        """
+        Evaluates the ticked targets and the moon at the given date, filling the attributes of the tracker (see :class:`Tracker`)
+
+        Args:
+          * date [optional]: the UT date of the tick, default is *now*. It can be a date-tuple ``(yyyy, mm, dd, [hh, mm, ss])``, a timestamp, a datetime structure or an ephem.Date instance
+
+        Kwargs:
+          See :class:`Tracker`
+
+        Raises:
+          N/A
+        """
+        date = _core.E.now() if date is None else _core.cleanTime(date, format='ed')
+        date = float(date)
+        kwargs['engine'] = kwargs.get('engine', self._engine)
+        if _core.pyephemEngine(kwargs):
+            self._update_ephem(date)
+        else:
+            self._prepare(date)
+            site = self._site
+            lst = _kernels.sidereal_time(date, site.long)
+            moon = self._moon.evaluate(_core.np.asarray([date]))
+            moonha, moonalt, moonaz = _kernels.altaz(ra=moon['ra'][0], dec=moon['dec'][0], lst=lst, lat=site.lat, pressure=site.pressure, temp=site.temp)
+            ha, alt, az = _kernels.altaz(ra=self._ra, dec=self._dec, lst=lst, lat=site.lat, pressure=site.pressure, temp=site.temp)
+            self.airmass = _kernels.rad_to_airmass(alt)
+            self.ha = _core.np.rad2deg(ha)
+            self.alt = _core.np.rad2deg(alt)
+            self.az = _core.np.rad2deg(az)
+            self.moondist = _core.np.rad2deg(_kernels.separation(az, alt, moonaz, moonalt))
+            self.moonalt = float(_core.np.rad2deg(moonalt))
+            self.moonaz = float(_core.np.rad2deg(moonaz))
+            self.moonphase = float(moon['phase'][0])
+        self.observable = (self.alt>=self._site.horizon_obs) & (self.moondist>=self._site.moonAvoidRadius)
+        self.date = _core.E.Date(date)
+
+    def _update_ephem(self, date):
+        """
+        Reference of :func:`Tracker.update`: pyephem computation of each target and of the moon
+        """
+        self._site = site = self._observation.site
+        targets = self._ticked()
+        self.names = [item.name for item in targets]
+        ob = _observer(site, date)
+        moon = _core.E.Moon()
+        moon.compute(ob)
+        values = []
+        for item in targets:
+            body = item._ephemBody()
+            body.compute(ob)
+            values.append((_core.rad_to_airmass(body.alt), _kernels.wrap_pi(ob.sidereal_time() - body.ra), body.alt, body.az, _core.E.separation([body.az, body.alt], [moon.az, moon.alt])))
+        values = _core.np.asarray(values, dtype=float).reshape(-1, 5)
+        self.airmass = values[:, 0]
+        self.ha = _core.np.rad2deg(values[:, 1])
+        self.alt = _core.np.rad2deg(values[:, 2])
+        self.az = _core.np.rad2deg(values[:, 3])
+        self.moondist = _core.np.rad2deg(values[:, 4])
+        self.moonalt = float(_core.np.rad2deg(moon.alt))
+        self.moonaz = float(_core.np.rad2deg(moon.az))
+        self.moonphase = float(moon.phase)
@@ -25,13 +25,17 @@
 ###############################################################################
 
 from time import gmtime as _gmtime
+import sys as _sys
+import os as _os
 
 _disclaimer = """ASTROOBS  Copyright (C) 2015-%s  Guillaume Schworer
 This program comes with ABSOLUTELY NO WARRANTY.
 This is free software, and you are welcome to redistribute it
 under certain conditions.""" % _gmtime()[0]
 
-print(_disclaimer)
+# the disclaimer is only shown in interactive sessions, scripts and workers import quietly
+if not _os.environ.get('ASTROOBS_QUIET') and (hasattr(_sys, 'ps1') or _sys.flags.interactive or 'IPython' in _sys.modules):
+    print(_disclaimer)
 
 
 """
@@ -41,6 +45,9 @@ Provides astronomy ephemeris to plan telescope observations
   * All altitudes, azimuth, hour angle are in degrees
   * However, ``horizon`` attribute of :class:`Observatory` or :class:`Observation` is in radian
   * All times are in UT, except for ``Observatory.localnight`` - obviously
+  * :func:`processNight` and :func:`processTargets` compute nights and targets from the immutable ``Observatory.site`` and ``Observatory.night``, without modifying any object: one observatory can serve many threads
+  * :class:`Tracker` evaluates the ticked targets of an :class:`Observation` at the exact current time, for live displays
+  * matplotlib, astropy and astroquery are only imported on first use of plotting, angle display or SIMBAD, so that ``import astroobs`` stays fast. The license disclaimer is only printed in interactive sessions, never if the ``ASTROOBS_QUIET`` environment variable is set
 
 .. warning::
   * it can occur that the Sun, the Moon or a target does not rise or set for an observatory/date combination. In that case, the corresponding attributes will be set to ``None``
@@ -53,15 +60,22 @@ Real-life example use:
 >>> o.plot()
 
 """
-__all__ = ['ObservatoryList', 'Observatory', 'Target', 'Moon', 'TargetSIMBAD', 'Observation', '_version']
+__all__ = ['ObservatoryList', 'Observatory', 'Target', 'Moon', 'MoonCache', 'Almanac', 'Site', 'Night', 'TargetSIMBAD', 'SIMBADCache', 'LocalCatalog', 'TargetCatalog', 'Observation', 'Tracker', '_version']
 
 from . import obs # left for backward v <= 1.3.7 compatibility
 
 from .ObservatoryList import ObservatoryList, show_all_obs
 from .Observatory import Observatory
+from .Night import Site, Night, processNight, processTargets, night_cache_info, night_cache_clear
 from .Target import Target
 from .Moon import Moon
-from .TargetSIMBAD import TargetSIMBAD
+from .MoonCache import MoonCache, getMoonCache
+from .Almanac import Almanac, buildAlmanac, findAlmanac
+from .TargetSIMBAD import TargetSIMBAD, querySIMBAD, querySIMBADBatch, resolveSIMBAD
+from .SIMBADCache import SIMBADCache, simbadCache, simbad_cache_info, simbad_cache_clear
+from .LocalCatalog import LocalCatalog
+from .TargetCatalog import TargetCatalog
 from .Observation import Observation
+from .Tracker import Tracker
 
 from ._version import __version__, __major__, __minor__, __micro__
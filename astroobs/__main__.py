@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+"""
+Batch planning command: evaluates the targets of a catalog file at observatories of the database over a range of nights, spread over a pool of processes, and streams the results to a columnar output
+
+>>> python -m astroobs targets.txt --spec job.json
+>>> python -m astroobs targets.txt --sites ohp vlt --from 2015/1/1 --to 2015/7/1 --n-jobs -1 --output plan
+"""
+
+import sys as _sys
+import os as _os
+import json as _json
+import time as _time
+import argparse as _argparse
+import multiprocessing as _mp
+
+from . import _core
+from . import _kernels
+
+from .ObservatoryList import ObservatoryList
+from .Sweep import _sweep_shard
+from .LocalCatalog import LocalCatalog
+from .Target import _radians
+
+
+# job spec keys and defaults, overridden by the command line options
+_SPEC = {'sites': None, 'from': 'now', 'to': 'now+30day', 'dday': 1, 'horizon_obs': None, 'moonAvoidRadius': None,
+         'pts': 200, 'margin': 15, 'n_jobs': -1, 'shard': 8, 'output': 'astroobs_plan', 'dataFile': None}
+
+# output columns: name, dtype. The site and target are indices in the lists of the meta.json file
+_COLUMNS = [('site', 'i2'), ('night', 'f8'), ('target', 'i4')] + [(key, 'f4') for key in _kernels.WHENOBS_KEYS] + [('airmass', 'f4'), ('transit_time', 'f8')]
+
+
+def _parser():
+    """
+    Returns the command line parser
+    """
+    parser = _argparse.ArgumentParser(prog='python -m astroobs', description="Evaluates the targets of a catalog at observatories of the database, for each night of a date range. For each site, night and target, the durations (hours) of the observability categories of Target.whenobs, the best airmass between sunset and sunrise and the transit time are written to the output.")
+    parser.add_argument('targets', help="the target file, in the format of LocalCatalog: a '#heads#name ; ra ; dec' line, then one 'name ; ra ; dec' line per target, with J2000 coordinates")
+    parser.add_argument('--spec', help="a JSON job spec, with any of the keys: %s. The options below override it" % (", ".join(sorted(_SPEC.keys()))))
+    parser.add_argument('--sites', nargs='+', help="the ids of the observatories, default is all observatories of the database")
+    parser.add_argument('--from', dest='from', help="the first night, as 'YYYY/MM/DD' in UT, default is now")
+    parser.add_argument('--to', dest='to', help="the end of the date range (excluded), default is 30 days after --from")
+    parser.add_argument('--dday', type=int, help="the step in days between two nights")
+    parser.add_argument('--horizon-obs', dest='horizon_obs', type=float, help="the minimum altitude (degrees) at which a target can be observed, default is 30")
+    parser.add_argument('--moon-avoid-radius', dest='moonAvoidRadius', type=float, help="the minimum distance (degrees) to the moon, default is the database value")
+    parser.add_argument('--pts', type=int, help="the number of samples of each night")
+    parser.add_argument('--n-jobs', dest='n_jobs', type=int, help="the number of processes, -1 (default) for all cores")
+    parser.add_argument('--shard', type=int, help="the number of nights of a site processed by one task")
+    parser.add_argument('--output', help="a directory for one .npy file per column and a meta.json file (default), or a .csv file")
+    parser.add_argument('--data-file', dest='dataFile', help="the observatories database, default is the one of the package")
+    return parser
+
+
+def _date(value):
+    """
+    Returns a date of the spec as understood by ``_core.rangeDates``: 'now', a (yyyy, mm, dd, [hh, mm, ss]) list or a 'YYYY/MM/DD [hh:mm:ss]' string
+    """
+    if isinstance(value, (list, tuple)): return tuple(value)
+    if str(value).startswith('now'): return str(value)
+    return _core.E.Date(str(value).replace('-', '/'))
+
+
+def _spec(args):
+    """
+    Returns the job spec from the spec file and the command line options
+    """
+    spec = dict(_SPEC)
+    if args.spec is not None:
+        spec.update(_json.load(open(args.spec)))
+    for key in _SPEC:
+        if getattr(args, key, None) is not None: spec[key] = getattr(args, key)
+    return spec
+
+
+def _targets(dataFile):
+    """
+    Returns the names, the (n x 2) ra-dec (radian) and the epochs of the targets of a catalog file, whose coordinates are J2000 as those of SIMBAD
+    """
+    catalog = LocalCatalog(dataFile, raiseError=True)
+    coords = [(_radians(item['ra'], hours=True), _radians(item['dec'])) for item in catalog.records]
+    return list(catalog.names), _core.np.asarray(coords, dtype=float).reshape(-1, 2), ['2000']*len(coords)
+
+
+def _midnights(site, ut_dates):
+    """
+    Returns the local midnights in UT of the nights of ``ut_dates`` at the site, as ``Observatory.upd_date``
+    """
+    return [_core.E.Date(_core.convertTime(_core.convertTime(_core.E.Date(item), site.timezone, 'utc', format='dt').replace(hour=23, minute=59, second=59), 'utc', site.timezone, format='ed')) for item in ut_dates]
+
+
+class _CSVWriter(object):
+    """
+    Streams the rows to a csv file, in the order the shards are done. ``abort`` releases the file of an incomplete output
+    """
+    def __init__(self, path, n, sites, names):
+        self.sites, self.names = sites, names
+        self._file = open(path, 'w')
+        self._file.write(",".join([item[0] for item in _COLUMNS]) + "\n")
+
+    def write(self, start, rows):
+        for row in rows:
+            self._file.write(",".join([self.sites[row['site']], str(_core.E.Date(row['night'])), self.names[row['target']].replace(',', ' ')] + ["%.6g" % row[key] for key, kind in _COLUMNS[3:-1]] + [str(_core.E.Date(row['transit_time']))]) + "\n")
+        self._file.flush()
+
+    def close(self, meta):
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+
+
+class _NpyWriter(object):
+    """
+    Streams the rows to one memory-mapped .npy file per column in a directory, each shard to its own rows, with a meta.json file written by ``close`` only. ``abort`` releases the files of an incomplete output
+    """
+    def __init__(self, path, n, sites, names):
+        self.path = path
+        if not _os.path.isdir(path): _os.makedirs(path)
+        self._columns = dict((key, _core.np.lib.format.open_memmap(_os.path.join(path, key+'.npy'), mode='w+', dtype=kind, shape=(n,))) for key, kind in _COLUMNS)
+
+    def write(self, start, rows):
+        for key, kind in _COLUMNS:
+            self._columns[key][start:start+rows.size] = rows[key]
+
+    def close(self, meta):
+        for item in self._columns.values():
+            item.flush()
+        self._columns = {}
+        with open(_os.path.join(self.path, 'meta.json'), 'w') as f:
+            _json.dump(meta, f, indent=1)
+
+    def abort(self):
+        self._columns = {}
+
+
+def main(argv=None):
+    """
+    Runs the batch command with the command line arguments ``argv``, default is ``sys.argv[1:]``. Returns the exit status
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    spec = _spec(args)
+    tstart = _time.time()
+    obslist = ObservatoryList(dataFile=spec['dataFile'], raiseError=True)
+    obsids = list(obslist.obsids) if spec['sites'] is None else [str(item).lower() for item in spec['sites']]
+    unknown = [item for item in obsids if item not in obslist.obsdic]
+    if len(unknown)>0: parser.error("unknown observatories: %s" % (", ".join(unknown)))
+    kwargs = {} if spec['moonAvoidRadius'] is None else {'moonAvoidRadius': spec['moonAvoidRadius']}
+    sites = [obslist.site(item, horizon_obs=spec['horizon_obs'], **kwargs) for item in obsids]
+    names, coords, epochs = _targets(args.targets)
+    dates = _core.rangeDates(fromDate=_date(spec['from']), toDate=_date(spec['to']), dday=spec['dday'])
+    nightkwargs = {'pts': int(spec['pts']), 'margin': float(spec['margin'])}
+    shard = max(1, int(spec['shard']))
+    nrows = len(sites)*dates.size*len(names)
+    # one task per shard of nights of a site, whose rows are contiguous in the output: site, then night, then target
+    tasks = []
+    for idx, site in enumerate(sites):
+        midnights = _midnights(site, dates)
+        for first in range(0, dates.size, shard):
+            tasks.append(((idx*dates.size+first)*len(names), idx, (site, midnights[first:first+shard], coords, epochs, nightkwargs)))
+    output = str(spec['output'])
+    writer = (_CSVWriter if output.lower().endswith('.csv') else _NpyWriter)(output, nrows, obsids, names)
+    n_jobs = _mp.cpu_count() if int(spec['n_jobs'])<0 else max(1, int(spec['n_jobs']))
+    n_jobs = min(n_jobs, max(1, len(tasks)))
+    pool = _mp.Pool(n_jobs) if n_jobs>1 else None
+    try:
+        results = (pool.imap if pool is not None else map)(_sweep_shard, [item[2] for item in tasks])
+        for (start, idx, task), (stats, airmass, transit) in zip(tasks, results):
+            rows = _core.np.zeros(stats.size, dtype=_COLUMNS)
+            rows['site'] = idx
+            rows['night'] = _core.np.repeat(task[1], len(names))
+            rows['target'] = _core.np.tile(_core.np.arange(len(names)), len(task[1]))
+            for key in _kernels.WHENOBS_KEYS:
+                rows[key] = stats[key].ravel()
+            rows['airmass'] = airmass.ravel()
+            rows['transit_time'] = transit.ravel()
+            writer.write(start, rows)
+    except:
+        if pool is not None: pool.terminate() # does not wait for the pending shards
+        writer.abort() # no meta.json: the output is not complete
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+    elapsed = _time.time() - tstart
+    stats = {'sites': len(sites), 'nights': int(dates.size), 'targets': len(names), 'rows': nrows, 'processes': n_jobs, 'tasks': len(tasks), 'seconds': elapsed}
+    writer.close({'sites': obsids, 'targets': names, 'columns': [item[0] for item in _COLUMNS], 'spec': spec, 'stats': stats})
+    print("%i sites x %i nights x %i targets = %i rows in %.2f s with %i processes: %.1f site-nights/s, %.0f rows/s -> %s" % (len(sites), dates.size, len(names), nrows, elapsed, n_jobs, len(sites)*dates.size/max(elapsed, 1e-9), nrows/max(elapsed, 1e-9), output))
+    return 0
+
+
+if __name__=='__main__':
+    _sys.exit(main())
@@ -48,6 +48,38 @@ class TargetMissingSIMBAD(AstroobsException):
         self.message = "The given object '%s' was not found in SIMBAD" % (target)
         self.args = [target] + [a for a in args]
 
+class OfflineSIMBAD(AstroobsException):
+    """
+    If the target name is not in the SIMBAD cache in offline mode
+    """
+    def __init__(self, target="", *args):
+        self.message = "The given object '%s' is not in the SIMBAD cache and the offline mode is on" % (target)
+        self.args = [target] + [a for a in args]
+
+class TargetMissingCatalog(AstroobsException):
+    """
+    If the target name given was not found in the local catalog
+    """
+    def __init__(self, target="", *args):
+        self.message = "The given object '%s' was not found in the local catalog" % (target)
+        self.args = [target] + [a for a in args]
+
+class UncompleteCatalog(AstroobsException):
+    """
+    If the local catalog is missing a column or has a line not understood
+    """
+    def __init__(self, catalog="", item="", *args):
+        self.message = "The local catalog '%s' is not complete or not understood: '%s'" % (catalog, item)
+        self.args = [catalog, item] + [a for a in args]
+
+class CatalogShapeMismatch(AstroobsException):
+    """
+    If the columns given to a target catalog have different lengths
+    """
+    def __init__(self, column="", *args):
+        self.message = "The column '%s' does not have the length of the target catalog" % (column)
+        self.args = [column] + [a for a in args]
+
 class InputNotUnderstood(AstroobsException):
     """
     If the input was not understood
@@ -89,6 +121,14 @@ class UnknownTwilight(AstroobsException):
         self.message = "Unknown twilight '%s'" % (twi)
         self.args = [twi] + [a for a in args]
 
+class UnknownSampling(AstroobsException):
+    """
+    If the sampling mode is not known
+    """
+    def __init__(self, mode="", *args):
+        self.message = "Unknown sampling mode '%s', must be 'linear' or 'adaptive'" % (mode)
+        self.args = [mode] + [a for a in args]
+
 class UnknownObservatory(AstroobsException):
     """
     If the observatory key is not known
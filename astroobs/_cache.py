@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+
+from collections import OrderedDict
+from threading import RLock
+
+
+class LRUCache(object):
+    """
+    A bounded dictionary which discards the least recently used items first, and counts its hits and misses. It can be shared by threads
+
+    Args:
+      * maxsize (int): the maximum number of items kept
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = max(int(maxsize), 1)
+        self._data = OrderedDict()
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """
+        Returns the value of ``key`` and marks it as most recently used, or ``default`` if absent
+        """
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            value = self._data.pop(key)
+            self._data[key] = value
+            return value
+
+    def put(self, key, value):
+        """
+        Stores ``value`` under ``key``, and discards the least recently used items beyond ``maxsize``
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data)>self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self, maxsize=None):
+        """
+        Empties the cache and resets the statistics, optionally changes ``maxsize``
+        """
+        with self._lock:
+            if maxsize is not None: self.maxsize = max(int(maxsize), 1)
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Returns a dictionary of the statistics of the cache: ``hits``, ``misses``, ``size``, ``maxsize``
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
@@ -23,19 +23,57 @@
 
 import ephem as E
 import numpy as np
-from pytz import timezone
 from datetime import datetime
 from time import struct_time, mktime
-from astropy.coordinates.angles import Angle
-from astroquery.simbad import Simbad
+import importlib
 import re
 import os
-try:
-    import matplotlib.pyplot as plt
-    from matplotlib.patches import Rectangle
-    NOPLOT = False
-except:
-    NOPLOT = True
+
+
+class _LazyImport(object):
+    """
+    Stand-in for a module, or an attribute of a module, which is only imported on first use, so that ``import astroobs`` does not load the plotting and SIMBAD dependencies
+    """
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+        self._obj = None
+
+    def _load(self):
+        if self._obj is None:
+            obj = importlib.import_module(self._module)
+            self._obj = obj if self._attr is None else getattr(obj, self._attr)
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+
+def _installed(module):
+    """
+    Whether a module can be imported, without importing it
+    """
+    try:
+        from importlib.util import find_spec
+    except ImportError: # python 2
+        import imp
+        try:
+            imp.find_module(module)
+            return True
+        except ImportError:
+            return False
+    return find_spec(module) is not None
+
+
+timezone = _LazyImport('pytz', 'timezone')
+Angle = _LazyImport('astropy.coordinates.angles', 'Angle')
+Simbad = _LazyImport('astroquery.simbad', 'Simbad')
+plt = _LazyImport('matplotlib.pyplot')
+Rectangle = _LazyImport('matplotlib.patches', 'Rectangle')
+NOPLOT = not _installed('matplotlib')
 # force UTF-8 for python 2.x
 from sys import version_info
 if version_info[0] < 3:
@@ -44,8 +82,33 @@ if version_info[0] < 3:
     sys.setdefaultencoding('utf8')
 
 obsDataFile = './obsData.txt'
+
+almanacDir = os.environ.get('ASTROOBS_ALMANAC', os.path.join(os.path.expanduser('~'), '.astroobs', 'almanac'))
+simbadCacheFile = os.environ.get('ASTROOBS_SIMBAD_CACHE', os.path.join(os.path.expanduser('~'), '.astroobs', 'simbad.sqlite'))
+lockDir = os.environ.get('ASTROOBS_LOCKS', os.path.join(os.path.expanduser('~'), '.astroobs', 'locks'))
+
 many_color = ['#40AC1E','#4E9FCC','#9A4ECC','#CC7B4E','#4E2ECC','#CC9EBD','#8EDCCD','#DC1ED2','#F21616','#2816F2','#3BF216','#F2E016']
 
+def pyephemEngine(kwargs):
+    """
+    Returns ``True`` if the reference pyephem engine was requested through the ``engine`` kwarg, ``False`` for the default numpy engine
+    """
+    return str(kwargs.get('engine', 'numpy')).lower()=='pyephem'
+
+def rangeDates(fromDate="now", toDate="now+30day", dday=1):
+    """
+    Returns the vector of UT dates (ephem.Date floats) from ``fromDate`` to ``toDate`` by steps of ``dday`` days, as used by the whenobs methods. ``fromDate`` defaults to now, ``toDate`` to 30 days after ``fromDate``
+    """
+    if fromDate=="now":
+        fromDate = E.now()
+    else:
+        fromDate = cleanTime(fromDate, format='ed')
+    if toDate=="now+30day":
+        toDate = E.Date(fromDate+30)
+    else:
+        toDate = cleanTime(toDate, format='ed')
+    return np.arange(fromDate, toDate, max(1, int(dday)))
+
 def radecFromStr(txt):
     """
     Takes a string that contains ra in decimal degrees or in hh:mm:ss.s and dec in decimal degrees or dd:mm:ss.s
@@ -117,7 +180,7 @@ def cleanTime(t, format=None):
     elif isinstance(t, (tuple, struct_time)):
         t = E.Date(tuple(t)[:6])
     elif isinstance(t, datetime):
-        t = E.Date(t)
+        t = E.Date(t.replace(tzinfo=None)) # pyephem>=4 would convert an aware datetime to UT
     else:
         raise TypeError("Wrong date format, must be ephem.Date, datetime, timestamp (float), tuple, or time.struct_time")
     if format is None: return tinit
@@ -168,7 +231,7 @@ def rad_to_airmass(arr):
     Transforms radians to airmass
     """
     if np.size(arr)>1:
-        arr = np.asarray(x).copy()
+        arr = np.asarray(arr).copy()
         if (arr<0.05).any(): arr[arr<0.05] = 0.05
     else:
         if arr<0.05: arr = 0.05
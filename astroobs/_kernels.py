@@ -0,0 +1,660 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+"""
+Vectorized numpy kernels reproducing the pyephem (libastro) calculations on whole arrays at once.
+
+All angles are in radian, all arrays broadcast together.
+"""
+
+import numpy as np
+
+
+J2000 = 36525.0 # J2000 in Dublin Julian Days, as ephem.Date
+SIDRATE = 0.9972695677 # ratio of sidereal to solar time, as in libastro
+
+# main terms of the IAU 1980 nutation series (Meeus table 22.A): multiples of D, M, M', F, Omega; dpsi (sin) and deps (cos) in 0.0001 arcsec, constant and linear T coefficients
+_NUTATION = np.array([
+    [ 0,  0,  0,  0,  1, -171996, -174.2, 92025,  8.9],
+    [-2,  0,  0,  2,  2,  -13187,   -1.6,  5736, -3.1],
+    [ 0,  0,  0,  2,  2,   -2274,   -0.2,   977, -0.5],
+    [ 0,  0,  0,  0,  2,    2062,    0.2,  -895,  0.5],
+    [ 0,  1,  0,  0,  0,    1426,   -3.4,    54, -0.1],
+    [ 0,  0,  1,  0,  0,     712,    0.1,    -7,  0.0],
+    [-2,  1,  0,  2,  2,    -517,    1.2,   224, -0.6],
+    [ 0,  0,  0,  2,  1,    -386,   -0.4,   200,  0.0],
+    [ 0,  0,  1,  2,  2,    -301,    0.0,   129, -0.1],
+    [-2, -1,  0,  2,  2,     217,   -0.5,   -95,  0.3],
+    [-2,  0,  1,  0,  0,    -158,    0.0,     0,  0.0],
+    [-2,  0,  0,  2,  1,     129,    0.1,   -70,  0.0],
+    [ 0,  0, -1,  2,  2,     123,    0.0,   -53,  0.0],
+    [ 2,  0,  0,  0,  0,      63,    0.0,     0,  0.0],
+    [ 0,  0,  1,  0,  1,      63,    0.1,   -33,  0.0],
+    [ 2,  0, -1,  2,  2,     -59,    0.0,    26,  0.0],
+    [ 0,  0, -1,  0,  1,     -58,   -0.1,    32,  0.0],
+    [ 0,  0,  1,  2,  1,     -51,    0.0,    27,  0.0],
+    [-2,  0,  2,  0,  0,      48,    0.0,     0,  0.0],
+    [ 0,  0, -2,  2,  1,      46,    0.0,   -24,  0.0],
+    [ 2,  0,  0,  2,  2,     -38,    0.0,    16,  0.0],
+    [ 0,  0,  2,  2,  2,     -31,    0.0,    13,  0.0],
+    [ 0,  0,  2,  0,  0,      29,    0.0,     0,  0.0],
+    [-2,  0,  1,  2,  2,      29,    0.0,   -12,  0.0],
+    [ 0,  0,  0,  2,  0,      26,    0.0,     0,  0.0],
+    [-2,  0,  0,  2,  0,     -22,    0.0,     0,  0.0]])
+
+
+# truncated VSOP87 series of the heliocentric longitude L and radius R of the Earth (Meeus appendix III): amplitude (1e-8 rad or AU), phase (rad), frequency (rad per Julian millennium)
+_VSOP_L = [np.array([[175347046, 0, 0], [3341656, 4.6692568, 6283.0758500], [34894, 4.62610, 12566.15170], [3497, 2.7441, 5753.3849],
+                     [3418, 2.8289, 3.5231], [3136, 3.6277, 77713.7715], [2676, 4.4181, 7860.4194], [2343, 6.1352, 3930.2097],
+                     [1324, 0.7425, 11506.7698], [1273, 2.0371, 529.6910], [1199, 1.1096, 1577.3435], [990, 5.233, 5884.927],
+                     [902, 2.045, 26.298], [857, 3.508, 398.149], [780, 1.179, 5223.694], [753, 2.533, 5507.553],
+                     [505, 4.583, 18849.228], [492, 4.205, 775.523], [357, 2.920, 0.067], [317, 5.849, 11790.629],
+                     [284, 1.899, 796.298], [271, 0.315, 10977.079], [243, 0.345, 5486.778], [206, 4.806, 2544.314],
+                     [205, 1.869, 5573.143], [202, 2.458, 6069.777], [156, 0.833, 213.299], [132, 3.411, 2942.463],
+                     [126, 1.083, 20.775], [115, 0.645, 0.980], [103, 0.636, 4694.003], [102, 0.976, 15720.839],
+                     [102, 4.267, 7.114], [99, 6.21, 2146.17], [98, 0.68, 155.42], [86, 5.98, 161000.69],
+                     [85, 1.30, 6275.96], [85, 3.67, 71430.70], [80, 1.81, 17260.15], [79, 3.04, 12036.46],
+                     [75, 1.76, 5088.63], [74, 3.50, 3154.69], [74, 4.68, 801.82], [70, 0.83, 9437.76],
+                     [62, 3.98, 8827.39], [61, 1.82, 7084.90], [57, 2.78, 6286.60], [56, 4.39, 14143.50],
+                     [56, 3.47, 6279.55], [52, 0.19, 12139.55], [52, 1.33, 1748.02], [51, 0.28, 5856.48],
+                     [49, 0.49, 1194.45], [41, 5.37, 8429.24], [41, 2.40, 19651.05], [39, 6.17, 10447.39],
+                     [37, 6.04, 10213.29], [37, 2.57, 1059.38], [36, 1.71, 2352.87], [36, 1.78, 6812.77],
+                     [33, 0.59, 17789.85], [30, 0.44, 83996.85], [30, 2.74, 1349.87], [25, 3.16, 4690.48]]),
+           np.array([[628331966747, 0, 0], [206059, 2.678235, 6283.075850], [4303, 2.6351, 12566.1517], [425, 1.590, 3.523],
+                     [119, 5.796, 26.298], [109, 2.966, 1577.344], [93, 2.59, 18849.23], [72, 1.14, 529.69],
+                     [68, 1.87, 398.15], [67, 4.41, 5507.55], [59, 2.89, 5223.69], [56, 2.17, 155.42],
+                     [45, 0.40, 796.30], [36, 0.47, 775.52], [29, 2.65, 7.11], [21, 5.34, 0.98],
+                     [19, 1.85, 5486.78], [19, 4.97, 213.30], [17, 2.99, 6275.96], [16, 0.03, 2544.31],
+                     [16, 1.43, 2146.17], [15, 1.21, 10977.08], [12, 2.83, 1748.02], [12, 3.26, 5088.63],
+                     [12, 5.27, 1194.45], [12, 2.08, 4694.00], [11, 0.77, 553.57], [10, 1.30, 6286.60],
+                     [10, 4.24, 1349.87], [9, 2.70, 242.73], [9, 5.64, 951.72], [8, 5.30, 2352.87],
+                     [6, 2.65, 9437.76], [6, 4.67, 4690.48]]),
+           np.array([[52919, 0, 0], [8720, 1.0721, 6283.0758], [309, 0.867, 12566.152], [27, 0.05, 3.52],
+                     [16, 5.19, 26.30], [16, 3.68, 155.42], [10, 0.76, 18849.23], [9, 2.06, 77713.77],
+                     [7, 0.83, 775.52], [5, 4.66, 1577.34]]),
+           np.array([[289, 5.844, 6283.076], [35, 0, 0], [17, 5.49, 12566.15]]),
+           np.array([[114, 3.142, 0]])]
+_VSOP_R = [np.array([[100013989, 0, 0], [1670700, 3.0984635, 6283.0758500], [13956, 3.05525, 12566.15170], [3084, 5.1985, 77713.7715],
+                     [1628, 1.1739, 5753.3849], [1576, 2.8469, 7860.4194], [925, 5.453, 11506.770], [542, 4.564, 3930.210],
+                     [472, 3.661, 5884.927], [346, 0.964, 5507.553], [329, 5.900, 5223.694], [307, 0.299, 5573.143],
+                     [243, 4.273, 11790.629], [212, 5.847, 1577.344], [186, 5.022, 10977.079], [175, 3.012, 18849.228],
+                     [110, 5.055, 5486.778]]),
+           np.array([[103019, 1.107490, 6283.075850], [1721, 1.0644, 12566.1517], [702, 3.142, 0]]),
+           np.array([[4359, 5.7846, 6283.0758], [124, 5.579, 12566.152]]),
+           np.array([[145, 4.273, 6283.076]])]
+
+# twilight modes and altitudes of the sun (radian, None for the observatory horizon), in the processing order of Observatory.process_obs
+TWILIGHTS = [('', None), ('astro', -0.314159), ('nautical', -0.2094395), ('civil', -0.104719)]
+
+# fields of the sun events of one night, see sun_events
+SUN_EVENTS_DTYPE = [(key+mode, kind) for mode, alt in TWILIGHTS for key, kind in [('sunrise', 'f8'), ('sunset', 'f8'), ('len_night', 'f8'), ('alwaysDark', bool), ('alwaysLight', bool)]]
+
+
+def deltat(dates):
+    """
+    TT-UT (seconds) for the ephem.Date ``dates``, from the Espenak & Meeus polynomials
+    """
+    y = 2000. + (np.asarray(dates, dtype=float) - J2000)/365.25
+    t = y - 2000.
+    u = (y - 1820.)/100.
+    longterm = -20. + 32.*u*u - 0.5628*(2150. - y)*((y>=2050) & (y<2150))
+    return np.where((y>1986) & (y<2005), 63.86 + t*(0.3345 + t*(-0.060374 + t*(0.0017275 + t*(0.000651814 + t*0.00002373599)))),
+                    np.where((y>=2005) & (y<2050), 62.92 + t*(0.32217 + t*0.005589), longterm))
+
+
+def _vsop(series, tau):
+    """
+    Evaluates a VSOP87 series for the Julian millennia ``tau``
+    """
+    ret = 0.
+    for tab in series[::-1]:
+        ret = ret*tau + (tab[:, 0]*np.cos(tab[:, 1] + tab[:, 2]*tau[..., None])).sum(axis=-1)
+    return ret*1e-8
+
+
+def sun_radec(dates):
+    """
+    Apparent geocentric right ascension, declination (radian) and distance (AU) of the Sun for the ephem.Date ``dates`` (UT), accurate to about 1 arcsec
+
+    Returns ra, dec, dist
+    """
+    dates = np.asarray(dates, dtype=float)
+    tt = dates + deltat(dates)/86400.
+    tau = (tt - J2000)/365250.
+    dist = _vsop(_VSOP_R, tau)
+    deps, dpsi = nutation(tt)
+    lon = _vsop(_VSOP_L, tau) + np.pi + np.deg2rad((-0.09033 - 20.4898/dist)/3600.) + dpsi # FK5, aberration and nutation
+    eps = obliquity(tt) + deps
+    ra = np.arctan2(np.cos(eps)*np.sin(lon), np.cos(lon))
+    return np.mod(ra, 2*np.pi), np.arcsin(np.sin(eps)*np.sin(lon)), dist
+
+
+def _sun_crossing(t, long, lat, horizon, pressure, temp, rising, direction, maxiter=10):
+    """
+    Finds the next (``direction=1``) or previous (``direction=-1``) rising or setting of the upper limb of the Sun across the apparent altitude ``horizon`` after ``t``, as in pyephem ``Observer._find_rise_or_set``
+
+    Returns the time and the cosine of the hour angle of the crossing (out of [-1, 1] if the Sun does not cross ``horizon``)
+    """
+    t = np.array(t, dtype=float)
+    for i in range(maxiter):
+        ra, dec, dist = sun_radec(t)
+        alt = horizon - np.deg2rad(959.63/3600.)/dist # upper limb
+        alt = unrefract(pressure, temp, alt)
+        alt = alt + np.deg2rad(8.794/3600.)/dist*np.cos(alt) # geocentric to topocentric parallax
+        cosha = horizon_cosha(dec, lat, alt)
+        target = np.arccos(np.clip(cosha, -1, 1))
+        if rising: target = -target
+        diff = target - wrap_pi(sidereal_time(t, long) - ra)
+        if i==0:
+            diff = np.mod(diff, 2*np.pi)
+            if direction<0: diff -= 2*np.pi
+        else:
+            diff = wrap_pi(diff)
+        t += diff/(2*np.pi)
+        if (np.abs(diff)<1e-6).all(): break
+    return t, cosha
+
+
+def sun_events(nights, long, lat, horizon, pressure=0., temp=15.):
+    """
+    Solves the sunsets and sunrises of all twilight modes for each night of ``nights``, the ephem.Date (UT) of the local midnights. The sunrise is the next one after midnight, the sunset the previous one before this sunrise
+
+    Returns a structured array with, for each mode ``XXX`` in {'' (horizon ``horizon``), 'civil', 'nautical', 'astro'}:
+      * ``sunriseXXX``, ``sunsetXXX``: the times (ephem.Date), NaN if the sun does not rise or set
+      * ``len_nightXXX``: the duration of the night (hours), 0 if the sun does not rise or set
+      * ``alwaysDarkXXX``: ``True`` if the sun stays below the mode altitude
+      * ``alwaysLightXXX``: ``True`` if the sun stays above the mode altitude
+    """
+    nights = np.atleast_1d(np.asarray(nights, dtype=float))
+    ret = np.zeros(nights.size, dtype=SUN_EVENTS_DTYPE)
+    for mode, alt in TWILIGHTS:
+        if alt is None: alt = horizon
+        rise, cosrise = _sun_crossing(nights, long, lat, alt, pressure, temp, rising=True, direction=1)
+        sset, cosset = _sun_crossing(rise, long, lat, alt, pressure, temp, rising=False, direction=-1)
+        dark = (cosrise>1) | (cosset>1)
+        light = ~dark & ((cosrise<-1) | (cosset<-1))
+        good = ~dark & ~light
+        ret['sunrise'+mode] = np.where(good, rise, np.nan)
+        ret['sunset'+mode] = np.where(good, sset, np.nan)
+        ret['len_night'+mode] = np.where(good, (rise - sset)*24, 0.)
+        ret['alwaysDark'+mode] = dark
+        ret['alwaysLight'+mode] = light
+    return ret
+
+
+def obliquity(dates):
+    """
+    Mean obliquity of the ecliptic (radian) for the ephem.Date ``dates``, as in libastro
+    """
+    t = (np.asarray(dates, dtype=float) - J2000)/36525.
+    return np.deg2rad(23.4392911 + t*(-46.8150 + t*(-0.00059 + t*0.001813))/3600.)
+
+
+def nutation(dates):
+    """
+    Nutation in obliquity and in longitude (deps, dpsi, radian) for the ephem.Date ``dates``, truncated IAU 1980 series accurate to a few milli-arcseconds
+    """
+    t = (np.asarray(dates, dtype=float) - J2000)/36525.
+    t2, t3 = t*t, t*t*t
+    args = np.deg2rad(np.array([297.85036 + 445267.111480*t - 0.0019142*t2 + t3/189474.,
+                                357.52772 + 35999.050340*t - 0.0001603*t2 - t3/300000.,
+                                134.96298 + 477198.867398*t + 0.0086972*t2 + t3/56250.,
+                                93.27191 + 483202.017538*t - 0.0036825*t2 + t3/327270.,
+                                125.04452 - 1934.136261*t + 0.0020708*t2 + t3/450000.]))
+    arg = np.tensordot(_NUTATION[:, :5], args, axes=(1, 0))
+    coeffs = _NUTATION[:, 5:].reshape((-1, 4) + (1,)*t.ndim)
+    dpsi = ((coeffs[:, 0] + coeffs[:, 1]*t)*np.sin(arg)).sum(axis=0)
+    deps = ((coeffs[:, 2] + coeffs[:, 3]*t)*np.cos(arg)).sum(axis=0)
+    return np.deg2rad(deps/36000000.), np.deg2rad(dpsi/36000000.)
+
+
+def sidereal_time(dates, long):
+    """
+    Apparent local sidereal time (radian, in [0, 2pi[) for the ephem.Date ``dates`` (any shape, e.g. a nights x samples grid) at longitude ``long`` (radian), as in libastro ``now_lst``
+    """
+    dates = np.asarray(dates, dtype=float)
+    day = np.floor(dates - 0.5) + 0.5 # 0h UT of the day
+    t = (day - J2000)/36525.
+    gmst0 = (24110.54841 + (8640184.812866 + (0.093104 - 6.2e-6*t)*t)*t)/3600.
+    gst = gmst0 + (dates - day)*24./SIDRATE
+    deps, dpsi = nutation(dates)
+    lst = gst*np.pi/12 + long + dpsi*np.cos(obliquity(dates) + deps)
+    return np.mod(lst, 2*np.pi)
+
+
+def unrefract(pressure, temp, aa):
+    """
+    Apparent altitude ``aa`` to true altitude, as in libastro ``unrefract``
+    """
+    aa = np.asarray(aa, dtype=float)
+    if pressure==0: return aa
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rge15 = 7.888888e-5*pressure/((273.+temp)*np.tan(aa))
+        aadeg = np.rad2deg(aa)
+        a = ((2e-5*aadeg+1.96e-2)*aadeg+1.594e-1)*pressure
+        b = (273.+temp)*((8.45e-2*aadeg+5.05e-1)*aadeg+1)
+        rlt15 = np.deg2rad(a/b)
+    lt15 = np.where((aa<0) & (rlt15<0), aa, aa-rlt15)
+    return np.where(aa<np.deg2rad(15.), lt15, aa-rge15)
+
+
+def refract(pressure, temp, ta, maxiter=8):
+    """
+    True altitude ``ta`` to apparent altitude, as in libastro ``refract``: secant search of the altitude which unrefracts to ``ta``
+    """
+    ta = np.asarray(ta, dtype=float)
+    if pressure==0: return ta
+    shape = ta.shape
+    ta = ta.ravel()
+    t0 = unrefract(pressure, temp, ta)
+    d = 0.8*(ta-t0)
+    aa = ta.copy()
+    idx = np.arange(ta.size)
+    for i in range(maxiter):
+        # only the altitudes not converged yet are iterated
+        aa[idx] += d
+        t = unrefract(pressure, temp, aa[idx])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d = -d*(ta[idx]-t)/(t0-t)
+        going = (np.abs(ta[idx]-t)>np.deg2rad(0.1/3600)) & np.isfinite(d) & (d!=0)
+        if not going.any(): break
+        idx, d, t0 = idx[going], d[going], t[going]
+    return aa.reshape(shape)
+
+
+def hadec_to_altaz(ha, dec, lat):
+    """
+    Converts hour angle and declination to geometric altitude and azimuth (North=0, East=pi/2)
+    """
+    sinlat, coslat = np.sin(lat), np.cos(lat)
+    sindec, cosdec = np.sin(dec), np.cos(dec)
+    cosha = np.cos(ha)
+    alt = np.arcsin(np.clip(sinlat*sindec + coslat*cosdec*cosha, -1, 1))
+    az = np.arctan2(-cosdec*np.sin(ha), sindec*coslat - cosdec*sinlat*cosha)
+    return alt, np.mod(az, 2*np.pi)
+
+
+def separation(lon1, lat1, lon2, lat2):
+    """
+    Angular separation between two (lon, lat) positions, e.g. (az, alt), with the numerically stable Vincenty formula
+    """
+    dlon = lon2 - lon1
+    sinlat1, coslat1 = np.sin(lat1), np.cos(lat1)
+    sinlat2, coslat2 = np.sin(lat2), np.cos(lat2)
+    num1 = coslat2*np.sin(dlon)
+    num2 = coslat1*sinlat2 - sinlat1*coslat2*np.cos(dlon)
+    return np.arctan2(np.hypot(num1, num2), sinlat1*sinlat2 + coslat1*coslat2*np.cos(dlon))
+
+
+def wrap_pi(ang):
+    """
+    Wraps an angle in [-pi, pi[
+    """
+    return np.mod(np.asarray(ang)+np.pi, 2*np.pi) - np.pi
+
+
+def altaz(ra, dec, lst, lat, pressure=0., temp=15.):
+    """
+    Computes the hour angle, the refracted altitude and the azimuth of the apparent position (ra, dec) for the local sidereal times ``lst`` (radian)
+
+    Returns ha, alt, az
+    """
+    ha = wrap_pi(lst - ra)
+    alt, az = hadec_to_altaz(ha, dec, lat)
+    return ha, refract(pressure, temp, alt), az
+
+
+def horizon_cosha(dec, lat, alt):
+    """
+    Cosine of the hour angle at which a body of declination ``dec`` crosses the true altitude ``alt``, for the latitude ``lat``. Greater than 1 if the body never reaches ``alt``, lower than -1 if it never goes below
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (np.sin(alt) - np.sin(lat)*np.sin(dec))/(np.cos(lat)*np.cos(dec))
+
+
+def hourangle_time(t0, ra, long, ha, direction=1):
+    """
+    Time (ephem.Date) of the next (``direction=1``) or previous (``direction=-1``) passage at the hour angle ``ha`` of a fixed apparent right ascension ``ra``, starting from ``t0`` (ephem.Date)
+    """
+    ha0 = wrap_pi(sidereal_time(t0, long) - ra)
+    if direction>0:
+        return t0 + np.mod(ha - ha0, 2*np.pi)*SIDRATE/(2*np.pi)
+    else:
+        return t0 - np.mod(ha0 - ha, 2*np.pi)*SIDRATE/(2*np.pi)
+
+
+def rise_set_transit(ra, dec, t0, long, lat, horizon, pressure=0., temp=15.):
+    """
+    Closed-form rise, set and transit of fixed apparent positions ``ra``, ``dec`` (radian, any shape), searched from ``t0`` (ephem.Date) as the pyephem searches of ``Night._riseSetTransit``: next setting, previous rising, then next transit after the rising (after ``t0`` if the body does not rise or set). ``horizon`` is the apparent altitude (radian) of the horizon
+
+    Returns a dictionary of arrays: ``rise_time``, ``set_time``, ``transit_time`` (ephem.Date), ``rise_az``, ``set_az``, ``transit_az``, ``transit_alt`` (radian, refracted altitude), with ``nan`` rise and set values where the body does not cross the horizon, and ``alwaysUp`` (int8): 1 if the body never sets, 0 if it never rises, -1 otherwise
+    """
+    ra, dec = np.broadcast_arrays(np.asarray(ra, dtype=float), np.asarray(dec, dtype=float))
+    cosha = horizon_cosha(dec, lat, unrefract(pressure, temp, horizon))
+    crosses = np.abs(cosha)<=1
+    ha = np.arccos(np.clip(cosha, -1, 1))
+    settime = hourangle_time(t0, ra, long, ha)
+    risetime = settime - ha*SIDRATE/np.pi
+    transit_alt, transit_az = hadec_to_altaz(np.zeros(dec.shape), dec, lat)
+    ret = {'set_time': np.where(crosses, settime, np.nan),
+           'rise_time': np.where(crosses, risetime, np.nan),
+           'set_az': np.where(crosses, hadec_to_altaz(ha, dec, lat)[1], np.nan),
+           'rise_az': np.where(crosses, hadec_to_altaz(-ha, dec, lat)[1], np.nan),
+           'transit_time': hourangle_time(np.where(crosses, risetime, t0), ra, long, 0.),
+           'transit_alt': refract(pressure, temp, transit_alt),
+           'transit_az': transit_az,
+           'alwaysUp': np.where(crosses, -1, cosha<-1).astype(np.int8)}
+    return ret
+
+
+def radec_to_xyz(ra, dec):
+    """
+    Unit vectors (..., 3) of the directions ``ra``, ``dec`` (radian)
+    """
+    cosdec = np.cos(dec)
+    return np.stack([cosdec*np.cos(ra), cosdec*np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def xyz_to_radec(xyz):
+    """
+    Right ascension in [0, 2pi[ and declination (radian) of the vectors ``xyz`` (..., 3)
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    return np.mod(np.arctan2(xyz[..., 1], xyz[..., 0]), 2*np.pi), np.arctan2(xyz[..., 2], np.hypot(xyz[..., 0], xyz[..., 1]))
+
+
+def apparent_fit(catalog, apparent, niter=4):
+    """
+    Fits the transformation from catalog to apparent places of fixed stars: a rotation ``rot`` (precession, nutation and frame, 3x3) followed by the first-order annual aberration of velocity ``beta`` (3, in units of c), from the matching unit vectors ``catalog`` and ``apparent`` (n x 3) of a few reference directions computed with pyephem
+
+    Returns rot, beta, see :func:`apparent_apply`
+    """
+    catalog = np.asarray(catalog, dtype=float)
+    apparent = np.asarray(apparent, dtype=float)
+    beta = np.zeros(3)
+    for i in range(niter):
+        # removes the current aberration estimate, then best rotation (Kabsch)
+        q = apparent - beta + (apparent.dot(beta))[:, None]*apparent
+        u, s, vt = np.linalg.svd(catalog.T.dot(q))
+        d = np.sign(np.linalg.det(vt.T.dot(u.T)))
+        rot = vt.T.dot(np.diag([1., 1., d])).dot(u.T)
+        # linear least-squares of the aberration on the residuals
+        w = catalog.dot(rot.T)
+        a = np.eye(3)[None, :, :] - w[:, :, None]*w[:, None, :]
+        beta = np.linalg.lstsq(a.reshape(-1, 3), (apparent - w).reshape(-1), rcond=None)[0]
+    return rot, beta
+
+
+def apparent_apply(ra, dec, rot, beta):
+    """
+    Apparent places (radian) of the catalog positions ``ra``, ``dec`` (radian, any shape) from a transformation fitted by :func:`apparent_fit`
+
+    Returns ra, dec
+    """
+    w = radec_to_xyz(ra, dec).dot(np.asarray(rot).T)
+    w += beta - (w.dot(beta))[..., None]*w
+    return xyz_to_radec(w)
+
+
+def block(ra, dec, lst, lat, moonaz, moonalt, pressure=0., temp=15.):
+    """
+    Processes a (n_targets x n_dates) block from the apparent positions ``ra`` and ``dec`` (n_targets vectors) and the ``lst``, ``moonaz``, ``moonalt`` (n_dates vectors), all in radian
+
+    Returns a dictionary of 2D arrays: ``ha``, ``alt``, ``az``, ``moondist`` in degrees and ``airmass``
+    """
+    ra = np.atleast_1d(np.asarray(ra, dtype=float))[:, None]
+    dec = np.atleast_1d(np.asarray(dec, dtype=float))[:, None]
+    ha, alt, az = altaz(ra=ra, dec=dec, lst=np.asarray(lst)[None, :], lat=lat, pressure=pressure, temp=temp)
+    ret = {'moondist': np.rad2deg(separation(az, alt, np.asarray(moonaz)[None, :], np.asarray(moonalt)[None, :])),
+           'airmass': rad_to_airmass(alt)}
+    ret['alt'] = np.rad2deg(alt)
+    ret['az'] = np.rad2deg(az)
+    ret['ha'] = np.rad2deg(ha)
+    return ret
+
+
+def rad_to_airmass(alt):
+    """
+    Transforms altitudes (radian) to airmass, as ``_core.rad_to_airmass`` but without the array-size switch
+    """
+    alt = np.maximum(alt, 0.05)
+    sz = 1.0/np.sin(alt) - 1.0
+    return 1.0 + sz*(0.9981833 - sz*(0.002875 + sz*0.0008083))
+
+
+WHENOBS_KEYS = ['obs','moon','dusk','duskmoon','dawn','dawnmoon','darklow','twighlightlow']
+
+
+def grid_altmoondist(ra, dec, lst, moonaz, moonalt, lat, pressure=0., temp=15.):
+    """
+    Altitude and moon distance (degrees) on a (n_nights x n_samples) grid of ``lst``, ``moonaz`` and ``moonalt`` (radian), for the apparent positions ``ra`` and ``dec`` (radian) given for each night, with optional leading dimensions (e.g. n_targets x n_nights)
+
+    Returns alt, moondist of shape (..., n_nights, n_samples)
+    """
+    ra = np.asarray(ra, dtype=float)[..., None]
+    dec = np.asarray(dec, dtype=float)[..., None]
+    ha, alt, az = altaz(ra=ra, dec=dec, lst=lst, lat=lat, pressure=pressure, temp=temp)
+    return np.rad2deg(alt), np.rad2deg(separation(az, alt, moonaz, moonalt))
+
+
+def night_mask(dates, events, alwaysdark):
+    """
+    The (n_nights x n_samples) mask of the samples of a time grid ``dates`` between sunset and sunrise, and all the samples of the polar nights flagged by ``alwaysdark`` (see :func:`whenobs_stats`)
+    """
+    polar = np.isnan(events['sunset']) | np.isnan(events['sunrise'])
+    good = (dates>events['sunset'][:, None]) & (dates<events['sunrise'][:, None])
+    good[polar & alwaysdark] = True
+    return good
+
+
+def whenobs_stats(dates, alt, moondist, events, alwaysdark, horizon_obs, moonAvoidRadius, weights=None):
+    """
+    Computes the durations (hours) of the observability categories of a target for each night of a (n_nights x n_samples) grid
+
+    Args:
+      * dates: (n_nights x n_samples) array of the time grid (ephem.Date)
+      * alt, moondist: altitude and moon distance of the target (degrees) on the grid, with optional leading dimensions (e.g. n_targets x n_nights x n_samples)
+      * events: the n_nights sun events, see :func:`sun_events`
+      * alwaysdark: n_nights booleans, whether the observatory is in polar night, as ``Observatory.alwaysDark``
+      * weights: optional (n_nights x n_samples) durations (hours) of the samples, for non-linear grids. Default is the uniform step of each night
+
+    Returns a (..., n_nights) structured array with keys :data:`WHENOBS_KEYS`, as ``Target.whenobs``
+    """
+    dates = np.asarray(dates, dtype=float)
+    if weights is None:
+        weights = np.repeat((dates[:, 1] - dates[:, 0])[:, None]*24, dates.shape[1], axis=1)
+    polar = np.isnan(events['sunset']) | np.isnan(events['sunrise'])
+    good = night_mask(dates, events, alwaysdark)
+    noastro = (np.isnan(events['sunsetastro']) | np.isnan(events['sunriseastro']))[:, None]
+    badalt = alt<horizon_obs
+    badsunsetting = noastro | (dates<events['sunsetastro'][:, None])
+    badsunrising = noastro | (dates>events['sunriseastro'][:, None])
+    badmoon = moondist<moonAvoidRadius
+    goodalt = good & ~badalt
+    dark = ~badsunrising & ~badsunsetting
+    masks = [dark & goodalt & ~badmoon, dark & goodalt & badmoon,
+             badsunsetting & goodalt & ~badmoon, badsunsetting & goodalt & badmoon,
+             badsunrising & goodalt & ~badmoon, badsunrising & goodalt & badmoon,
+             good & badalt & dark, good & badalt & ~dark]
+    ret = np.zeros(np.broadcast(alt, moondist).shape[:-1], dtype=[(key, 'f8') for key in WHENOBS_KEYS])
+    for key, mask in zip(WHENOBS_KEYS, masks):
+        ret[key] = (mask*weights).sum(axis=-1)
+    light = polar & ~alwaysdark # polar day: all twilight
+    for key in WHENOBS_KEYS:
+        ret[key][..., light] = 0.
+    ret['dusk'][..., light] = weights[light].sum(axis=-1)
+    return ret
+
+
+def cell_roots(dates, f, func, tol=1e-6, maxiter=20):
+    """
+    Refines the zero crossings of a function sampled on a time grid, only in the cells where its sign changes
+
+    Args:
+      * dates: (n_nights x n_samples) array of the time grid (ephem.Date)
+      * f: the function sampled on the grid, with optional leading dimensions (..., n_nights, n_samples)
+      * func: callable ``func(t, where)`` returning the exact function at times ``t``, for the (..., n_nights) indices ``where`` (a tuple of index arrays)
+      * tol (float - day): the convergence of the crossing times
+      * maxiter (int): the maximum number of refining iterations
+
+    Returns a (..., n_nights, n_samples-1) array of the crossing time in each cell, ``NaN`` where the sign does not change
+    """
+    f = np.asarray(f, dtype=float)
+    dates = np.broadcast_to(np.asarray(dates, dtype=float), f.shape)
+    pos = f>=0
+    roots = np.full(f.shape[:-1]+(f.shape[-1]-1,), np.nan)
+    where = np.nonzero(pos[..., :-1]!=pos[..., 1:])
+    if where[0].size==0: return roots
+    nxt = where[:-1]+(where[-1]+1,)
+    a, b, fa, fb = dates[where], dates[nxt], f[where], f[nxt]
+    side = np.zeros(a.shape)
+    c = a
+    for i in range(int(maxiter)): # Illinois regula falsi
+        cold = c
+        c = (a*fb-b*fa)/(fb-fa)
+        fc = np.asarray(func(c, where[:-1]), dtype=float)
+        right = (fc>=0)==(fb>=0) # root is in [a, c]
+        fa = np.where(right & (side==-1), fa/2, fa)
+        fb = np.where(~right & (side==1), fb/2, fb)
+        b, fb = np.where(right, c, b), np.where(right, fc, fb)
+        a, fa = np.where(right, a, c), np.where(right, fa, fc)
+        side = np.where(right, -1, 1)
+        if i>0 and np.abs(c-cold).max()<tol: break
+    roots[where] = c
+    return roots
+
+
+def adaptive_grid(start, end, func, events=(), pts=200, minpts=None, tol=0.05):
+    """
+    Builds a time grid from ``start`` to ``end`` with samples dense only where the curves of ``func`` are not linear
+
+    Args:
+      * start, end (float): the bounds of the grid (ephem.Date)
+      * func: callable ``func(t)`` returning the (n_curves x len(t)) curves (degrees) at the 1D times ``t``, each crossing a threshold of interest at 0
+      * events: times to add to the grid, e.g. the sun events, ignored if out of the bounds
+      * pts (int): the maximum size of the grid
+      * minpts (int): the size of the initial linear grid, default is ``pts//8`` (at least 9)
+      * tol (float - degree): the maximum error of the linear interpolation of the curves between two samples
+
+    The zero crossings of the curves are solved on the initial grid and added to the grid. Then the cells whose mid-point deviates by more than ``tol`` from the linear interpolation are split in two, largest deviations first, until ``tol`` or ``pts`` is reached
+    """
+    pts = max(int(pts), 2)
+    if minpts is None: minpts = max(pts//8, 9)
+    minpts = min(max(int(minpts), 2), pts)
+    t = np.linspace(float(start), float(end), minpts)
+    f = np.atleast_2d(func(t))
+    if f.size>0:
+        roots = cell_roots(t, f, lambda c, where: np.atleast_2d(func(c))[where[0], np.arange(c.size)])
+        events = np.r_[np.asarray(events, dtype=float).ravel(), roots[np.isfinite(roots)]]
+    events = np.asarray(events, dtype=float).ravel()
+    events = events[np.isfinite(events) & (events>t[0]) & (events<t[-1])]
+    t = np.unique(np.r_[t, events])
+    f = np.atleast_2d(func(t))
+    while t.size<pts and f.size>0:
+        mid = (t[:-1]+t[1:])/2
+        fmid = np.atleast_2d(func(mid))
+        err = np.abs(fmid-(f[:, :-1]+f[:, 1:])/2).max(axis=0)
+        split = np.nonzero(err>tol)[0]
+        if split.size==0: break
+        split = split[np.argsort(err[split])[::-1][:pts-t.size]]
+        order = np.argsort(np.r_[t, mid[split]], kind='mergesort')
+        t = np.r_[t, mid[split]][order]
+        f = np.c_[f, fmid[:, split]][:, order]
+    return t
+
+
+def _on_cells(f, roots, on=True):
+    """
+    Bounds (lo, hi) of the part of each grid cell where ``f>=0`` (``on=True``) or ``f<0`` (``on=False``), from the samples and the crossing times of :func:`cell_roots`. Empty parts have lo>hi
+    """
+    f0 = f[..., :-1]>=0
+    f1 = f[..., 1:]>=0
+    if not on:
+        f0, f1 = ~f0, ~f1
+    lo = np.where(f0, -np.inf, np.where(f1, roots, np.inf))
+    hi = np.where(f1, np.inf, np.where(f0, roots, -np.inf))
+    return lo, hi
+
+
+def whenobs_exact(dates, alt, moondist, altroots, moonroots, events, alwaysdark, horizon_obs, moonAvoidRadius):
+    """
+    Same as :func:`whenobs_stats`, but the durations are integrated between the exact crossing times of the thresholds instead of counting samples. The sun events are exact, the crossings of ``horizon_obs`` and ``moonAvoidRadius`` are given by ``altroots`` and ``moonroots``, see :func:`cell_roots`
+
+    The functions are assumed to cross each threshold at most once per grid cell
+    """
+    dates = np.asarray(dates, dtype=float)
+    t0 = dates[:, :-1]
+    t1 = dates[:, 1:]
+    inf = np.full(dates.shape[0], np.inf)
+    polar = np.isnan(events['sunset']) | np.isnan(events['sunrise'])
+    noastro = np.isnan(events['sunsetastro']) | np.isnan(events['sunriseastro'])
+    darkpolar = polar & alwaysdark
+    # time intervals, per night
+    good = (np.where(darkpolar, -inf, events['sunset']), np.where(darkpolar, inf, events['sunrise']))
+    good = tuple(np.where(polar & ~alwaysdark, -x, x) for x in good) # polar day: empty
+    dark = (np.where(noastro, inf, events['sunsetastro']), np.where(noastro, -inf, events['sunriseastro']))
+    badsunsetting = (-inf, np.where(noastro, inf, events['sunsetastro']))
+    badsunrising = (np.where(noastro, -inf, events['sunriseastro']), inf)
+    strictrising = (np.where(noastro, inf, events['sunriseastro']), inf)
+    good, dark, badsunsetting, badsunrising, strictrising = [(x[0][:, None], x[1][:, None]) for x in (good, dark, badsunsetting, badsunrising, strictrising)]
+    # threshold intervals, per cell
+    falt = np.asarray(alt, dtype=float)-horizon_obs
+    fmoon = np.asarray(moondist, dtype=float)-moonAvoidRadius
+    goodalt = _on_cells(falt, altroots)
+    badalt = _on_cells(falt, altroots, on=False)
+    goodmoon = _on_cells(fmoon, moonroots)
+    badmoon = _on_cells(fmoon, moonroots, on=False)
+    def length(*intervals):
+        lo = t0
+        hi = t1
+        for item in intervals:
+            lo = np.maximum(lo, item[0])
+            hi = np.minimum(hi, item[1])
+        return (np.clip(hi-lo, 0, None)*24).sum(axis=-1)
+    terms = [(dark, goodalt, goodmoon), (dark, goodalt, badmoon),
+             (badsunsetting, goodalt, goodmoon), (badsunsetting, goodalt, badmoon),
+             (badsunrising, goodalt, goodmoon), (badsunrising, goodalt, badmoon),
+             (dark, badalt)]
+    ret = np.zeros(np.broadcast(falt, fmoon).shape[:-1], dtype=[(key, 'f8') for key in WHENOBS_KEYS])
+    for key, term in zip(WHENOBS_KEYS, terms):
+        ret[key] = length(good, *term)
+    ret['twighlightlow'] = length(good, badalt, badsunsetting) + length(good, badalt, strictrising)
+    light = polar & ~alwaysdark # polar day: all twilight
+    for key in WHENOBS_KEYS:
+        ret[key][..., light] = 0.
+    ret['dusk'][..., light] = ((dates[:, -1]-dates[:, 0])*24)[light]
+    return ret
+
+
+def alwaysdark(events, default=False):
+    """
+    The ``Observatory.alwaysDark`` flag of each night of ``events`` (see :func:`sun_events`): the last twilight mode which does not rise or set decides
+    """
+    ret = np.zeros(events.size, dtype=bool) | default
+    for mode, alt in TWILIGHTS:
+        ret = np.where(events['alwaysDark'+mode], True, np.where(events['alwaysLight'+mode], False, ret))
+    return ret
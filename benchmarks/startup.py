@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+#  
+#  ASTROOBS - Astronomical Observation
+#  Copyright (C) 2015-2016  Guillaume Schworer
+#  
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  
+#  For any information, bug report, idea, donation, hug, beer, please contact
+#    guillaume.schworer@obspm.fr
+#
+###############################################################################
+
+
+"""
+Startup benchmark: measures the time of ``import astroobs`` in fresh interpreters and checks it against a budget, and that the heavy dependencies are not loaded by the import
+
+Usage:
+  python benchmarks/startup.py [budget_seconds] [runs]
+
+Exits with status 1 if the median import time exceeds the budget (default 0.3 s) or if a lazy dependency was imported
+"""
+
+import os
+import sys
+import subprocess
+import json
+
+BUDGET = 0.3 # seconds, median over the runs
+RUNS = 7
+LAZY = ['matplotlib', 'astropy', 'astroquery', 'pytz']
+
+_PROBE = """
+import sys, time, json
+t = time.time()
+import astroobs
+t = time.time() - t
+print(json.dumps({'time': t, 'loaded': sorted(set(m.split('.')[0] for m in sys.modules) & set(%r))}))
+""" % (LAZY,)
+
+
+def probe():
+    """
+    Imports astroobs in a fresh interpreter, returns the import time (seconds) and the lazy dependencies loaded
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    out = subprocess.check_output([sys.executable, '-c', _PROBE], env=env)
+    ret = json.loads(out.decode().strip().splitlines()[-1])
+    return ret['time'], ret['loaded']
+
+
+def main(budget=BUDGET, runs=RUNS):
+    times = []
+    loaded = set()
+    for i in range(runs):
+        t, mods = probe()
+        times.append(t)
+        loaded.update(mods)
+    times.sort()
+    median = times[len(times)//2]
+    print("import astroobs: median %.3fs, min %.3fs, max %.3fs over %i runs (budget %.3fs)" % (median, times[0], times[-1], runs, budget))
+    ok = True
+    if median>budget:
+        print("FAIL: import time over budget")
+        ok = False
+    if loaded:
+        print("FAIL: dependencies loaded at import: %s" % ', '.join(sorted(loaded)))
+        ok = False
+    return ok
+
+
+if __name__=='__main__':
+    budget = float(sys.argv[1]) if len(sys.argv)>1 else BUDGET
+    runs = int(sys.argv[2]) if len(sys.argv)>2 else RUNS
+    sys.exit(0 if main(budget=budget, runs=runs) else 1)
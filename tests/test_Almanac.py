@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import numpy as np
+
+import astroobs as obs
+from astroobs import _kernels
+
+
+def test_round_trip(tmpdir, monkeypatch):
+    monkeypatch.setenv('ASTROOBS_ALMANAC', str(tmpdir))
+    monkeypatch.setattr(sys.modules['astroobs._core'], 'almanacDir', str(tmpdir)) # read at import
+    monkeypatch.setattr(sys.modules['astroobs.Almanac'], '_ALMANACS', {})
+    o = obs.Observatory('ohp', local_date=(2015,3,10))
+    obs.night_cache_clear()
+    o.process_obs()
+    ref = o.night
+    assert obs.findAlmanac(o) is None
+    almanac = obs.buildAlmanac(o, (2015,3,1), (2015,3,21))
+    assert almanac.path.startswith(str(tmpdir))
+    assert os.path.exists(almanac.path+'.nights.npy')
+    assert obs.findAlmanac(o) is almanac
+    assert obs.findAlmanac(o.site) is almanac
+    assert almanac.nights.size==20
+    obs.night_cache_clear()
+    o.process_obs() # from the almanac
+    night = o.night
+    assert 'moon_rise_time' in night.events.dtype.names # a row of the almanac
+    for key in np.dtype(_kernels.SUN_EVENTS_DTYPE).names:
+        assert np.array_equal(night.events[key], ref.events[key], equal_nan=True)
+    assert np.array_equal(night.dates, ref.dates)
+    for key in ['alt', 'az', 'phase']:
+        assert np.abs(getattr(night.moon, key)-getattr(ref.moon, key)).max()<1e-6
+    for key, value in ref.moon.events.items():
+        assert (value is None and night.moon.events[key] is None) or abs(value-night.moon.events[key])<1e-9
+    obs.night_cache_clear()
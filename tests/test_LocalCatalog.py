@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import astroobs as obs
+
+
+def _catalog(tmpdir, lines, **kwargs):
+    path = tmpdir.join('catalog.txt')
+    path.write("\n".join(['#heads#name ; ra ; dec'] + lines) + "\n")
+    return obs.LocalCatalog(str(path), **kwargs)
+
+
+def _bright(tmpdir):
+    path = tmpdir.join('bright.txt')
+    path.write("\n".join(['# a comment',
+                          '#heads#name ; ra ; dec ; aliases ; hd ; hr ; hip ; sptype ; plx ; V',
+                          'vega ; 18:36:56.336 ; +38:47:01.28 ; alf Lyr|Wega ; 172167 ; 7001 ; 91262 ; A0Va ; 130.23 ; 0.03',
+                          'arcturus ; 213.9153 ; 19.1824 ; alf Boo ; 124897 ; 5340 ; 69673 ; K1.5IIIFe-0.5 ; ; -0.05',
+                          '']))
+    return obs.LocalCatalog(str(path))
+
+
+def test_load(tmpdir):
+    cat = _bright(tmpdir)
+    assert len(cat)==2
+    assert cat.names==['vega', 'arcturus']
+    vega = cat['vega']
+    assert vega['ra']=='18:36:56.336'
+    assert vega['dec']=='+38:47:01.28'
+    assert vega['flux']=={'V': 0.03}
+    assert vega['sptype']=='A0Va'
+    assert vega['plx']==130.23
+    assert (vega['hd'], vega['hr'], vega['hip'])==(172167, 7001, 91262)
+    arcturus = cat['arcturus']
+    assert abs(float(arcturus['ra'])-213.9153/15.)<1e-12 # decimal degrees are stored in hours
+    assert abs(float(arcturus['dec'])-19.1824)<1e-12
+    assert arcturus['plx'] is None
+
+
+def test_aliases_and_numbers(tmpdir):
+    cat = _bright(tmpdir)
+    for name in ['alf Lyr', 'Wega', 'HD 172167', 'HR 7001', 'HIP 91262']:
+        assert cat[name] is cat['vega']
+    for name in ['alf Boo', 'HD 124897', 'HR 5340', 'HIP 69673']:
+        assert cat[name] is cat['arcturus']
+
+
+def test_name_normalisation(tmpdir):
+    cat = _bright(tmpdir)
+    for name in ['HD172167', 'hd 172167', ' Hd  172167 ', 'ALF LYR', 'alflyr', 'VEGA']:
+        assert name in cat
+        assert cat.get(name) is cat['vega']
+
+
+def test_missing_name(tmpdir):
+    cat = _bright(tmpdir)
+    assert 'sirius' not in cat
+    assert cat.get('sirius') is None
+    assert cat.get('sirius', 0)==0
+
+
+def test_bad_lines_skipped(tmpdir):
+    cat = _catalog(tmpdir, ['vega ; 18:36:56.3 ; +38:47:01', 'broken ; 12:00:00', 'nowhere ; notanangle ; +10:00:00', 'arcturus ; 213.9153 ; 19.1824'])
+    assert len(cat)==2
+    assert 'vega' in cat
+    assert 'arcturus' in cat
+    assert 'nowhere' not in cat
+
+
+def test_bad_line_raises(tmpdir):
+    with pytest.raises(obs._astroobsexception.UncompleteCatalog):
+        _catalog(tmpdir, ['nowhere ; notanangle ; +10:00:00'], raiseError=True)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+from astroobs import _kernels
+
+
+def test_evaluate():
+    long, lat, elevation = np.deg2rad(5.71), np.deg2rad(43.93), 650.
+    dates = float(E.Date('2015/1/1')) + np.random.RandomState(1).uniform(0, 60, 300)
+    for epoch in [None, E.Date('2015')]:
+        cache = obs.MoonCache(long, lat, elevation, epoch=epoch)
+        values = cache.evaluate(dates.reshape(30, 10))
+        assert values['ra'].shape==(30, 10)
+        ob = E.Observer()
+        ob.lon, ob.lat, ob.elevation = long, lat, elevation
+        ob.pressure = 0.
+        ob.epoch = cache.epoch
+        moon = E.Moon()
+        ref = []
+        for d in dates:
+            ob.date = d
+            moon.compute(ob)
+            ref.append((moon.ra, moon.dec, moon.a_ra, moon.a_dec, moon.phase))
+        ref = dict(zip(obs.MoonCache._keys, np.asarray(ref).T))
+        for ra, dec in [('ra', 'dec'), ('a_ra', 'a_dec')]:
+            assert np.abs(_kernels.wrap_pi(values[ra].ravel()-ref[ra])*np.cos(ref[dec])).max()<np.deg2rad(0.001/3600) # documented bound
+            assert np.abs(values[dec].ravel()-ref[dec]).max()<np.deg2rad(0.001/3600)
+        assert np.abs(values['phase'].ravel()-ref['phase']).max()<1e-4 # %
+        assert cache.nsegments==np.unique(np.floor(dates/cache.span)).size # one fit per segment used
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+
+
+def _compute(site, date, coords):
+    night = obs.processNight(site, date)
+    radec, rst, block = obs.processTargets(night, coords, ['2000']*len(coords))
+    return night, radec, rst, block
+
+
+def test_threads():
+    site = obs.Observatory('ohp', local_date=(2015,3,1)).site
+    dates = [E.Date(float(E.Date('2015/3/1 23:00')) + i) for i in range(50)]
+    coords = np.deg2rad([(10., 20.), (279.23, 38.78), (200., -45.), (0., 89.)])
+    obs.night_cache_clear()
+    serial = [_compute(site, date, coords) for date in dates]
+    obs.night_cache_clear() # the threads process the nights again
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        threaded = list(pool.map(lambda date: _compute(site, date, coords), dates))
+    for (night, radec, rst, block), (ref, refradec, refrst, refblock) in zip(threaded, serial):
+        assert night.site==site and night.date==ref.date
+        assert np.array_equal(night.dates, ref.dates)
+        assert np.array_equal(night.lst, ref.lst)
+        for key in night.moon._fields[:-1]:
+            assert np.array_equal(getattr(night.moon, key), getattr(ref.moon, key))
+        assert np.array_equal(radec, refradec)
+        for key in rst:
+            assert np.array_equal(rst[key], refrst[key], equal_nan=True)
+        for key in block:
+            assert np.array_equal(block[key], refblock[key])
+
+
+def test_no_mutation():
+    o = obs.Observatory('ohp', local_date=(2015,3,1))
+    date, horizon = o.date, o.horizon
+    o.process_obs(pts=50)
+    assert (o.date, o.horizon)==(date, horizon)
+    t = obs.Target(10., 20., 'star', obs=o)
+    t.process(o)
+    assert (o.date, o.horizon)==(date, horizon)
+    t.whenobs(o, (2015,3,1), (2015,3,11), plot=False)
+    assert (o.date, o.horizon)==(date, horizon)
+
+
+def test_night_cache():
+    obs.night_cache_clear(maxsize=2)
+    o = obs.Observatory('ohp', local_date=(2015,3,1))
+    assert obs.night_cache_info()['misses']==1
+    dates = o.dates
+    o.upd_date(local_date=(2015,3,2))
+    o.upd_date(local_date=(2015,3,1))
+    info = obs.night_cache_info()
+    assert (info['hits'], info['misses'], info['size'], info['maxsize'])==(1, 2, 2, 2)
+    assert o.dates is dates # shared with the cache
+    o.upd_date(local_date=(2015,3,3))
+    o.upd_date(local_date=(2015,3,2)) # least recently used, discarded
+    info = obs.night_cache_info()
+    assert (info['hits'], info['misses'], info['size'])==(1, 4, 2)
+    o.process_obs(pts=100) # another key
+    assert obs.night_cache_info()['misses']==5
+    o.process_obs(sampling='adaptive') # not cached
+    assert obs.night_cache_info()['misses']==5
+    obs.night_cache_clear(maxsize=64)
+    assert obs.night_cache_info()['hits']==0
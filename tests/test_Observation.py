@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+import astroobs as obs
+
+
+def _records(n):
+    rng = np.random.RandomState(0)
+    return dict(('star%i' % i, {'ra': repr(rng.uniform(0, 24)), 'dec': repr(rng.uniform(-80, 80)), 'flux': {}, 'sptype': '', 'plx': None, 'hd': None, 'hr': None, 'hip': None}) for i in range(n))
+
+
+def test_add_targets_processes_new(monkeypatch):
+    records = _records(30)
+    query = lambda names: dict((name, records.get(name)) for name in names)
+    o = obs.Observation('ohp', local_date=(2015,3,31))
+    o.add_targets(sorted(records)[:20], query=query, cache=False)
+    processed = []
+    process_block = obs.Observation._process_block
+    def spy(self, tgts, **kwargs):
+        processed.append(len(tgts))
+        return process_block(self, tgts, **kwargs)
+    monkeypatch.setattr(obs.Observation, '_process_block', spy)
+    o.add_targets(sorted(records)[20:], query=query, cache=False)
+    assert processed==[10]
+    block = o.block
+    assert block['alt'].shape==(30, len(o.dates))
+    assert block['targets']==o.targets
+    for idx, item in enumerate(o.targets):
+        assert np.may_share_memory(item.alt, block['alt'])
+    o._process()
+    for key in ['airmass', 'ha', 'alt', 'az', 'moondist']:
+        assert np.array_equal(block[key], o.block[key]) # as processed all at once
+
+
+def _rows_of_block(o):
+    block = o.block
+    for item in o.targets:
+        if not item._ticked: continue
+        idx = block['targets'].index(item)
+        assert np.shares_memory(item.alt, block['alt'])
+        for key in ['airmass', 'ha', 'alt', 'az', 'moondist']:
+            assert np.array_equal(getattr(item, key), block[key][idx], equal_nan=True)
+
+
+def test_block_rows():
+    o = obs.Observation('ohp', local_date=(2015,3,31))
+    o.add_target('vega', ra=279.23, dec=38.78)
+    o.add_target('arcturus', ra=213.92, dec=19.18)
+    assert o.block['alt'].shape==(2, len(o.dates))
+    _rows_of_block(o)
+    o.tick(1)
+    o.tick(1)
+    assert len(o.block['targets'])==2 # refreshed in place
+    _rows_of_block(o)
+    o.change_date(local_date=(2015,4,15))
+    _rows_of_block(o)
+    alt = np.array(o.targets[0].alt)
+    o.add_target(obs.Target(279.23, 38.78, 'vega2'))
+    _rows_of_block(o)
+    assert np.abs(o.targets[2].alt-alt).max()<0.01
+
+
+def test_plan_whenobs():
+    o = obs.Observation('ohp', local_date=(2015,3,1))
+    for ra, dec in [(10., 20.), (279.23, 38.78), (200., -45.), (45., 60.), (150., -80.)]:
+        o.add_target(obs.Target(ra, dec, 'star'))
+    for exact, tol in [(False, 0.), (True, 1e-6)]:
+        dates, targets, retval = o.plan((2015,3,1), (2015,3,21), chunk=2, exact=exact, pts=40)
+        assert targets==o.targets
+        for idx, item in enumerate(targets):
+            refdates, ref = item.whenobs(o, (2015,3,1), (2015,3,21), plot=False, ret=True, exact=exact, pts=40)
+            assert np.array_equal(dates, refdates)
+            for key in ref.dtype.names:
+                assert np.abs(retval[key][idx]-ref[key]).max()<=tol # hours
+
+
+def test_pool():
+    rs = np.random.RandomState(5)
+    coords = list(zip(rs.uniform(0, 360, 600), rs.uniform(-90, 90, 600)))
+    serial = obs.Observation('ohp', local_date=(2015,3,1))
+    o = obs.Observation('ohp', local_date=(2015,3,1))
+    for item in [serial, o]:
+        for ra, dec in coords:
+            item.add_target(obs.Target(ra, dec, 'star'))
+    serial.change_date(local_date=(2015,3,2))
+    o.n_jobs = 2
+    o.change_date(local_date=(2015,3,2))
+    pool = o._pool
+    assert pool is not None
+    o.change_date(local_date=(2015,3,3))
+    assert o._pool is pool # kept between processings
+    o.change_date(local_date=(2015,3,2))
+    for tgt, ref in zip(o.targets, serial.targets):
+        assert np.array_equal(tgt.alt, ref.alt)
+        assert tgt.rise_time==ref.rise_time
+    assert np.array_equal(o.block['alt'], serial.block['alt'])
+    o.close()
+    assert o._pool is None
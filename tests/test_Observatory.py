@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import ephem as E
+import pytest
+
+import astroobs as obs
+
+
+def test_local_midnights():
+    for site in ['ohp', 'vlt', 'cfht', 'keck', 'aao']:
+        o = obs.Observatory(site, local_date=(2015,3,1))
+        localnights, midnights = o._local_midnights([o.date, E.Date(o.date-0.3)]) # midnight and the evening before
+        assert np.array_equal(midnights, [o.date]*2) # the same night, west or east of Greenwich
+        assert localnights[0].day==1
+
+
+def test_adaptive_sampling(monkeypatch):
+    o = obs.Observatory('ohp', local_date=(2015,3,1))
+    linear = obs.Observatory('ohp', local_date=(2015,3,1), pts=3000)
+    o.process_obs(sampling='adaptive', pts=200, tol=0.05)
+    assert o.npts==len(o.dates)<=200
+    assert (np.diff(o.dates)>0).all()
+    assert (o.dates[0], o.dates[-1])==(linear.dates[0], linear.dates[-1])
+    for key in ['sunset', 'sunrise', 'sunsetastro', 'sunriseastro']:
+        assert float(getattr(o, key)) in o.dates # the twilights are samples
+    assert np.abs(np.interp(linear.dates, o.dates, o.moon.alt)-linear.moon.alt).max()<=0.05+1e-6 # degrees, within tol
+    idx = o.npts//3
+    monkeypatch.setattr(E, 'now', lambda: E.Date(o.dates[idx]+1e-6))
+    assert o.nowArg==idx
+    monkeypatch.setattr(E, 'now', lambda: E.Date(o.dates[-1]+0.1))
+    assert o.nowArg is None
+    with pytest.raises(obs._astroobsexception.UnknownSampling):
+        obs.Observatory('ohp', local_date=(2015,3,1), raiseError=True).process_obs(sampling='log')
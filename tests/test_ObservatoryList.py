@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sys
+import threading
+
+import astroobs as obs
+
+
+def test_edit_lock(tmpdir, monkeypatch):
+    monkeypatch.setattr(sys.modules['astroobs._core'], 'lockDir', str(tmpdir.join('locks')))
+    dataFile = str(tmpdir.join('db', 'obsData.txt'))
+    os.makedirs(os.path.dirname(dataFile))
+    shutil.copy(os.path.join(os.path.dirname(obs.__file__), 'obsData.txt'), dataFile)
+    ol = obs.ObservatoryList(dataFile=dataFile)
+    ol.add('myobs', 'My Observatory', '5:42:48.0', '43:55:51.0', 650., 'Europe/Paris')
+    assert 'myobs' in obs.ObservatoryList(dataFile=dataFile).obsids
+    ol.rem('myobs')
+    assert 'myobs' not in obs.ObservatoryList(dataFile=dataFile).obsids
+    assert os.listdir(os.path.dirname(dataFile))==['obsData.txt'] # nothing left next to the database
+    locks = os.listdir(str(tmpdir.join('locks')))
+    assert len(locks)==1
+    assert locks[0].startswith('obsData.txt_') and locks[0].endswith('.lock')
+
+
+def test_read_during_edit(tmpdir, monkeypatch):
+    monkeypatch.setattr(sys.modules['astroobs._core'], 'lockDir', str(tmpdir.join('locks')))
+    ol = sys.modules['astroobs.ObservatoryList']
+    dataFile = str(tmpdir.join('obsData.txt'))
+    shutil.copy(os.path.join(os.path.dirname(obs.__file__), 'obsData.txt'), dataFile)
+    read = []
+    reader = threading.Thread(target=lambda: read.append(ol._database(dataFile)))
+    with ol._locked(dataFile): # an edit in progress does not block the readers
+        reader.start()
+        reader.join(10)
+        assert read
+    assert read[0] is ol._database(dataFile) # from the registry
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import ephem as E
+import pytest
+
+import astroobs as obs
+
+
+STARS = [(279.23, 38.78), (101.29, -16.72), (95.99, -52.70), (37.95, 89.26), (10.68, 41.27), (200., -80.)]
+VEGA = {'ra': '18 36 56.336', 'dec': '+38 47 01.28', 'flux': {'V': 0.03}, 'sptype': 'A0Va', 'plx': 130.23, 'hd': 172167, 'hr': 7001, 'hip': 91262}
+
+
+def test_sweep_observation():
+    sites = ['ohp', 'vlt', 'cfht']
+    targets = [obs.Target(ra, dec, 'star') for ra, dec in STARS]
+    obsids, retval = obs.ObservatoryList().sweep(targets, (2015,3,1), obsids=sites, n_jobs=2)
+    assert obsids==sites and retval.shape==(len(sites), len(STARS))
+    for idx, site in enumerate(sites):
+        o = obs.Observation(site, local_date=(2015,3,1))
+        for ra, dec in STARS:
+            o.add_target(obs.Target(ra, dec, 'star'))
+        dark = (o.dates>o.sunset) & (o.dates<o.sunrise)
+        for jdx, item in enumerate(o.targets):
+            hours = item.whenobs(o, o.date, E.Date(o.date+0.5), plot=False, ret=True)[1]['obs'][0]
+            assert abs(retval['hours'][idx, jdx]-hours)<1e-6
+            up = dark & (item.alt>0)
+            if up.any():
+                assert abs(retval['airmass'][idx, jdx]-item.airmass[up].min())<1e-6
+            else:
+                assert np.isnan(retval['airmass'][idx, jdx])
+            assert abs(retval['transit_time'][idx, jdx]-item.transit_time)*86400<1e-3 # seconds
+
+
+def test_sweep_names():
+    query = lambda names: dict((name, VEGA if name=='vega' else None) for name in names) # stand-in SIMBAD
+    obsids, retval = obs.ObservatoryList().sweep(['vega', obs.Target(279.23, 38.78, 'star')], (2015,3,1), obsids=['ohp'], query=query, cache=False)
+    assert abs(retval['hours'][0, 0]-retval['hours'][0, 1])<0.05
+    with pytest.raises(obs._astroobsexception.TargetMissingSIMBAD):
+        obs.ObservatoryList(raiseError=True).sweep(['vega', 'nowhere'], (2015,3,1), obsids=['ohp'], query=query, cache=False)
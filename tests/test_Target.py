@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+
+
+# ra, dec (degrees), input epoch
+STARS = [(10., 20., '2000'), (279.23, 38.78, '2000'), (88.79, 7.41, '2000'), (200., -45., '2000'), (45., 60., '2000'), (0., 89., '2000'), (150., -80., '2000'), (101.29, -16.72, '1950')]
+
+
+def _angdiff(a, b):
+    """
+    Difference of angles in degrees, wrapped in [-180, 180[
+    """
+    return (np.asarray(a, dtype=float)-np.asarray(b, dtype=float)+180.)%360.-180.
+
+
+def _pairs():
+    for site, date in [('ohp', (2015,3,31)), ('paranal', (2016,7,14)), ('cfht', (2014,12,2))]:
+        o = obs.Observatory(site, local_date=date)
+        for ra, dec, epoch in STARS:
+            yield obs.Target(ra, dec, 'numpy', input_epoch=epoch, obs=o), obs.Target(ra, dec, 'pyephem', input_epoch=epoch, obs=o, engine='pyephem')
+
+
+def test_process_engines():
+    for tgt, ref in _pairs():
+        assert np.shape(tgt.alt)==np.shape(ref.alt)
+        assert np.abs(tgt.alt-ref.alt).max()<2e-3 # degrees, about the refraction noise close to the horizon
+        assert np.abs(_angdiff(tgt.az, ref.az)*np.cos(np.deg2rad(ref.alt))).max()<2e-3
+        assert np.abs(_angdiff(tgt.ha, ref.ha)*np.cos(ref._decRad)).max()<1e-3 # on the sky
+        assert np.abs(tgt.moondist-ref.moondist).max()<2e-3
+        up = ref.alt>1 # airmasses close to the horizon are not meaningful
+        assert np.abs(tgt.airmass[up]/ref.airmass[up]-1).max(initial=0)<1e-4
+        assert abs(_angdiff(np.rad2deg(tgt._raRad), np.rad2deg(ref._raRad))*np.cos(ref._decRad))<1e-4
+        assert abs(np.rad2deg(tgt._decRad-ref._decRad))<1e-4
+
+
+def test_rise_set_transit_engines():
+    flags = []
+    for tgt, ref in _pairs():
+        assert getattr(tgt, 'alwaysUp', None)==getattr(ref, 'alwaysUp', None)
+        flags.append(getattr(ref, 'alwaysUp', None))
+        for key in ['rise_time', 'set_time', 'rise_az', 'set_az']:
+            assert (getattr(tgt, key) is None)==(getattr(ref, key) is None)
+        if ref.rise_time is not None:
+            assert abs(tgt.rise_time-ref.rise_time)*86400<1 # seconds
+            assert abs(tgt.set_time-ref.set_time)*86400<1
+            assert abs(_angdiff(tgt.rise_az, ref.rise_az))<1e-3
+            assert abs(_angdiff(tgt.set_az, ref.set_az))<1e-3
+        assert abs(tgt.transit_time-ref.transit_time)*86400<1
+        assert abs(tgt.transit_alt-ref.transit_alt)<1e-3
+        if abs(ref.transit_alt)<89.9: # the azimuth at the zenith is undefined
+            assert abs(_angdiff(tgt.transit_az, ref.transit_az))<1e-3
+    assert True in flags # circumpolar
+    assert False in flags # never rises
+    assert None in flags
+
+
+def test_whenobs_engines():
+    o = obs.Observatory('ohp', local_date=(2015,3,1))
+    for ra, dec, epoch in STARS:
+        tgt = obs.Target(ra, dec, 'star', input_epoch=epoch)
+        dates, retval = tgt.whenobs(o, (2015,3,1), (2015,4,1), plot=False, ret=True)
+        refdates, ref = tgt.whenobs(o, (2015,3,1), (2015,4,1), plot=False, ret=True, engine='pyephem')
+        assert np.allclose(dates, refdates)
+        for key in ref.dtype.names:
+            assert np.abs(retval[key]-ref[key]).max()<1e-4 # hours
+
+
+def test_whenobs_exact():
+    o = obs.Observatory('ohp', local_date=(2015,3,1))
+    for ra, dec, epoch in STARS:
+        tgt = obs.Target(ra, dec, 'star', input_epoch=epoch)
+        retval = tgt.whenobs(o, (2015,3,1), (2015,4,1), plot=False, ret=True, exact=True, pts=20)[1]
+        ref = tgt.whenobs(o, (2015,3,1), (2015,4,1), plot=False, ret=True, pts=3000)[1]
+        for key in ref.dtype.names:
+            assert np.abs(retval[key]-ref[key]).max()<0.01 # hours, against ~1h counting the samples of pts=20
+
+
+def test_iwhenobs():
+    o = obs.Observatory('ohp', local_date=(2015,3,1))
+    tgt = obs.Target(279.23, 38.78, 'vega')
+    dates, ref = tgt.whenobs(o, (2015,3,1), (2015,4,10), plot=False, ret=True)
+    stream = list(tgt.iwhenobs(o, (2015,3,1), (2015,4,10), chunk=50))
+    assert np.array_equal([item[0] for item in stream], dates)
+    assert np.array_equal(np.asarray([item[1] for item in stream]), ref)
+    for chunk in [1, 7]:
+        records = np.asarray([item[1] for item in tgt.iwhenobs(o, (2015,3,1), (2015,4,10), chunk=chunk)])
+        for key in ref.dtype.names:
+            assert np.abs(records[key]-ref[key]).max()<0.01 # hours, the target position is interpolated per chunk
+    cancel = threading.Event()
+    got = []
+    for date, record in tgt.iwhenobs(o, (2015,3,1), None, chunk=7, cancel=cancel):
+        got.append((date, record))
+        if len(got)==10: cancel.set()
+    assert len(got)==10 # endless stream, cancelled
+    assert list(tgt.iwhenobs(o, (2015,3,1), None, cancel=lambda: True))==[]
+    resumed = list(tgt.iwhenobs(o, E.Date(got[-1][0]+1), (2015,4,10), chunk=7))
+    assert np.array_equal([item[0] for item in got+resumed], dates)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+
+
+def test_process_observation():
+    ra = np.random.RandomState(2).uniform(0, 360, 40)
+    dec = np.random.RandomState(3).uniform(-85, 85, 40)
+    o = obs.Observation('ohp', local_date=(2015,3,31))
+    for r, d in zip(ra, dec):
+        o.add_target(obs.Target(r, d, 'star'))
+    for exact in [False, True]:
+        cat = obs.TargetCatalog(ra=ra, dec=dec)
+        cat.process(o, exact=exact)
+        night = (o.dates>o.sunset) & (o.dates<o.sunrise)
+        for idx, item in enumerate(o.targets):
+            retval = item.whenobs(o, o.date, E.Date(o.date+0.5), plot=False, ret=True, exact=exact)[1]
+            assert abs(cat['obs'][idx]-retval['obs'][0])<1e-4 # hours, float32 column
+            if item.rise_time is None:
+                assert np.isnan(cat['rise_time'][idx])
+            else:
+                assert abs(cat['rise_time'][idx]-item.rise_time)*86400<1 # seconds
+            assert abs(cat['max_alt'][idx]-item.alt[night].max())<1e-3 # degrees
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+
+import pytest
+
+import astroobs as obs
+
+
+VEGA = {'ra': '18 36 56.336', 'dec': '+38 47 01.28', 'flux': {'V': 0.03}, 'sptype': 'A0Va', 'plx': 130.23, 'hd': 172167, 'hr': 7001, 'hip': 91262}
+SIRIUS = {'ra': '06 45 08.917', 'dec': '-16 42 58.02', 'flux': {'V': -1.46}, 'sptype': 'A1V', 'plx': 379.21, 'hd': 48915, 'hr': 2491, 'hip': 32349}
+RECORDED = {'vega': VEGA, 'sirius': SIRIUS} # recorded responses of the stand-in SIMBAD
+
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    """
+    Points the shared SIMBAD cache to a fresh database
+    """
+    monkeypatch.setattr(obs.simbadCache, 'path', str(tmpdir.join('simbad.sqlite')))
+    monkeypatch.setattr(obs.simbadCache, 'offline', False)
+    obs.simbadCache._reset_stats()
+    yield obs.simbadCache
+    obs.simbadCache._reset_stats()
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    """
+    Records the waits between retries instead of sleeping
+    """
+    waits = []
+    monkeypatch.setattr(sys.modules['astroobs.TargetSIMBAD'], '_sleep', waits.append)
+    return waits
+
+
+class StandIn(object):
+    """
+    A stand-in SIMBAD: answers from RECORDED, after failing ``fails`` times, and logs the queried batches
+    """
+    def __init__(self, fails=0):
+        self.fails = fails
+        self.calls = []
+
+    def __call__(self, names):
+        self.calls.append(list(names))
+        if self.fails>0:
+            self.fails -= 1
+            raise IOError("connection reset")
+        return dict((name, RECORDED.get(name)) for name in names)
+
+
+def test_resolve(cache):
+    query = StandIn()
+    records, errors = obs.resolveSIMBAD(['vega', 'nowhere', 'sirius', 'vega'], query=query, batch=2, workers=2)
+    assert records=={'vega': VEGA, 'sirius': SIRIUS}
+    assert list(errors.keys())==['nowhere']
+    assert 'not found' in errors['nowhere']
+    assert sorted(query.calls)==[['sirius'], ['vega', 'nowhere']]
+    assert cache.get('VEGA')==VEGA # cached
+    assert cache.get('nowhere') is None # not found, not cached
+    records, errors = obs.resolveSIMBAD(['Vega', 'sirius'], query=query)
+    assert records=={'Vega': VEGA, 'sirius': SIRIUS}
+    assert len(query.calls)==2 # from the cache
+
+
+def test_failed_batch(cache, waits):
+    query = StandIn(fails=10)
+    records, errors = obs.resolveSIMBAD(['vega', 'sirius'], query=query, retries=2, backoff=0.5)
+    assert records=={}
+    assert sorted(errors.keys())==['sirius', 'vega']
+    assert 'connection reset' in errors['vega']
+    assert len(query.calls)==3
+    assert waits==[0.5, 1.]
+    assert len(cache)==0
+
+
+def test_retry(cache, waits):
+    query = StandIn(fails=2)
+    records, errors = obs.resolveSIMBAD(['vega', 'sirius'], query=query, retries=3, backoff=1.)
+    assert records=={'vega': VEGA, 'sirius': SIRIUS}
+    assert errors=={}
+    assert len(query.calls)==3
+    assert waits==[1., 2.]
+
+
+def test_expired_fallback(cache, waits):
+    cache.put('vega', VEGA)
+    records, errors = obs.resolveSIMBAD(['vega', 'sirius'], query=StandIn(fails=10), retries=0, ttl=0)
+    assert records=={'vega': VEGA} # expired, used since SIMBAD failed
+    assert list(errors.keys())==['sirius']
+    assert cache.expired==1
+    query = StandIn()
+    records, errors = obs.resolveSIMBAD(['vega'], query=query, ttl=0)
+    assert records=={'vega': VEGA}
+    assert query.calls==[['vega']] # expired, queried again
+
+
+def test_offline(cache):
+    cache.put('vega', VEGA)
+    query = StandIn()
+    records, errors = obs.resolveSIMBAD(['vega', 'sirius'], query=query, ttl=0, offline=True)
+    assert records=={'vega': VEGA} # expired records are used offline
+    assert 'offline' in errors['sirius']
+    assert query.calls==[]
+    cache.offline = True
+    records, errors = obs.resolveSIMBAD(['sirius'], query=query)
+    assert 'sirius' in errors
+    assert query.calls==[]
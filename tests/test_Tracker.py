@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+
+
+def _observation(n):
+    rs = np.random.RandomState(4)
+    o = obs.Observation('paranal', local_date=(2015,3,1))
+    for ra, dec in zip(rs.uniform(0, 360, n), np.rad2deg(np.arcsin(rs.uniform(-1, 1, n)))):
+        o.add_target(obs.Target(ra, dec, 'star'))
+    return o
+
+
+def test_update_engines():
+    o = _observation(300)
+    tracker = obs.Tracker(o)
+    for date in [E.Date('2015/3/2 01:00'), E.Date('2015/3/2 05:30'), E.Date('2015/3/9 03:00')]:
+        tracker.update(date)
+        alt, moondist = tracker.alt.copy(), tracker.moondist.copy()
+        tracker.update(date, engine='pyephem')
+        up = tracker.alt>5 # the refraction close to the horizon differs
+        assert np.abs(alt-tracker.alt)[up].max()*3600<2 # arcsec
+        assert np.abs(moondist-tracker.moondist).max()*3600<1.5
+
+
+def test_refresh(monkeypatch):
+    module = sys.modules['astroobs.Tracker']
+    calls = []
+    def spy(*args, **kwargs):
+        calls.append(args[1].size)
+        return apparentPlaces(*args, **kwargs)
+    apparentPlaces = module._apparentPlaces
+    monkeypatch.setattr(module, '_apparentPlaces', spy)
+    o = _observation(5)
+    tracker = obs.Tracker(o, refresh=60)
+    date = float(E.Date('2015/3/2 01:00'))
+    tracker.update(E.Date(date))
+    tracker.update(E.Date(date+30*E.minute))
+    assert calls==[5] # kept for refresh minutes
+    tracker.update(E.Date(date+61*E.minute))
+    assert calls==[5, 5]
+    o.tick(0)
+    tracker.update(E.Date(date+62*E.minute))
+    assert calls==[5, 5, 4] # new ticked targets
+    assert len(tracker.alt)==4
+    o.add_target(obs.Target(10., 20., 'new'))
+    tracker.update(E.Date(date+63*E.minute))
+    assert calls==[5, 5, 4, 5]
+    tracker.update(E.Date(date+64*E.minute))
+    assert len(calls)==4
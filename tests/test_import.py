@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import astroobs as obs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(obs.__file__))), 'benchmarks'))
+import startup
+
+
+def test_lazy_import():
+    times = []
+    for i in range(3):
+        t, loaded = startup.probe() # python -c "import astroobs" in a fresh interpreter
+        times.append(t)
+        assert loaded==[] # matplotlib, astropy, astroquery, pytz
+    assert sorted(times)[1]<startup.BUDGET # median, seconds
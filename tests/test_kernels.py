@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+from astroobs import _kernels
+
+
+ARCSEC = np.deg2rad(1./3600)
+
+
+def test_sidereal_time():
+    dates = np.linspace(float(E.Date('1980/1/1')), float(E.Date('2040/1/1')), 397) # every ~55 days over 60 years
+    for long in [-155.47, -70.4, 0., 5.71, 116.7, 179.9]:
+        ob = E.Observer()
+        ob.lon = np.deg2rad(long)
+        ref = []
+        for d in dates:
+            ob.date = d
+            ref.append(float(ob.sidereal_time()))
+        lst = _kernels.sidereal_time(dates, np.deg2rad(long))
+        assert lst.shape==dates.shape
+        assert np.abs(_kernels.wrap_pi(lst-np.asarray(ref))).max()<0.1*ARCSEC
+    grid = dates[:12].reshape(3, 4) # any shape
+    assert np.array_equal(_kernels.sidereal_time(grid, 0.1), _kernels.sidereal_time(dates[:12], 0.1).reshape(3, 4))
+
+
+def test_sun_events_polar():
+    nights = float(E.Date('2015/1/1 23:59:59')) + np.arange(0, 365, 4)
+    for lat in [66.5, -66.5, 69., -69., 78., -78.]:
+        o = obs.Observatory('polar', long=15., lat=lat, elevation=100., timezone='UTC', local_date=(2015,1,1))
+        events = _kernels.sun_events(nights=nights, long=o.long, lat=o.lat, horizon=o.horizon, pressure=o.pressure, temp=o.temp)
+        ref = np.zeros(nights.size, dtype=_kernels.SUN_EVENTS_DTYPE)
+        for idx, night in enumerate(nights): # pyephem reference of the pyephem engine
+            o.date = E.Date(night)
+            row = np.zeros((), dtype=_kernels.SUN_EVENTS_DTYPE)
+            for mode, alt in _kernels.TWILIGHTS:
+                o._calc_sunRiseSet(mode=mode, events=row)
+            ref[idx] = row
+        for mode, alt in _kernels.TWILIGHTS:
+            assert np.array_equal(events['alwaysDark'+mode], ref['alwaysDark'+mode])
+            assert np.array_equal(events['alwaysLight'+mode], ref['alwaysLight'+mode])
+            good = ~ref['alwaysDark'+mode] & ~ref['alwaysLight'+mode]
+            for key in ['sunrise', 'sunset']:
+                assert np.isnan(events[key+mode][~good]).all()
+                assert np.abs(events[key+mode][good]-ref[key+mode][good]).max(initial=0)*86400<5 # seconds
+            assert np.abs(events['len_night'+mode]-ref['len_night'+mode]).max()*3600<10
+        if abs(lat)>=69:
+            assert events['alwaysDark'].any() and events['alwaysLight'].any() # polar nights and days
+
+
+def test_cell_roots():
+    dates = 5000. + np.arange(3)[:, None] + np.linspace(0, 0.5, 11)[None, :] # 3 nights x 11 samples
+    start = dates[:, :1] + np.array([0., 0.013, 0.031])[:, None]
+    func = lambda t, where: np.cos(20*(t-start[where[0], 0])) # roots at start + (pi/2 + k pi)/20 in each night
+    f = np.stack([func(dates, (np.arange(3)[:, None],)), -func(dates, (np.arange(3)[:, None],))]) # leading dimension, opposite signs
+    roots = _kernels.cell_roots(dates, f, lambda t, where: (1-2*where[0])*func(t, where[1:]), tol=1e-10)
+    assert roots.shape==(2, 3, 10)
+    for night in range(3):
+        exact = start[night, 0] + (np.pi/2 + np.pi*np.arange(4))/20
+        for sign in range(2):
+            found = roots[sign, night]
+            assert np.abs(np.sort(found[~np.isnan(found)])-exact[exact<dates[night, -1]]).max()<1e-9
+            cells = np.searchsorted(dates[night], exact[exact<dates[night, -1]])-1
+            assert np.array_equal(np.nonzero(~np.isnan(found))[0], cells) # one root in its own cell
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import os
+
+import numpy as np
+import ephem as E
+
+import astroobs as obs
+from astroobs.__main__ import main, _COLUMNS
+
+
+STARS = [('vega', 279.23, 38.78), ('sirius', 101.29, -16.72), ('canopus', 95.99, -52.70), ('polaris', 37.95, 89.26), ('m31', 10.68, 41.27)]
+
+
+def test_main(tmpdir):
+    targets = str(tmpdir.join('targets.txt'))
+    with open(targets, 'w') as f:
+        f.write("#heads#name ; ra ; dec\n")
+        for name, ra, dec in STARS:
+            f.write("%s ; %r ; %r\n" % (name, ra, dec))
+    args = [targets, '--sites', 'ohp', 'vlt', '--from', '2015/3/1', '--to', '2015/3/6', '--n-jobs', '2', '--shard', '2']
+    nrows = 2*5*len(STARS)
+    assert main(args+['--output', str(tmpdir.join('plan'))])==0
+    meta = json.load(open(str(tmpdir.join('plan', 'meta.json'))))
+    assert meta['columns']==[key for key, kind in _COLUMNS]
+    assert meta['sites']==['ohp', 'vlt'] and meta['targets']==[item[0] for item in STARS]
+    columns = dict((key, np.load(str(tmpdir.join('plan', key+'.npy')))) for key in meta['columns'])
+    assert all(item.size==nrows for item in columns.values())
+    assert np.array_equal(columns['site'], np.repeat([0, 1], nrows//2)) # site, then night, then target
+    assert np.array_equal(columns['target'], np.tile(np.arange(len(STARS)), 10))
+    assert main(args+['--output', str(tmpdir.join('plan.csv'))])==0
+    rows = list(csv.reader(open(str(tmpdir.join('plan.csv')))))
+    assert rows[0]==meta['columns']
+    assert len(rows)==nrows+1
+    # first night at ohp: the local night of 2015/3/1
+    obsids, ref = obs.ObservatoryList().sweep([obs.Target(ra, dec, name) for name, ra, dec in STARS], (2015,3,1), obsids=['ohp'])
+    for idx in range(len(STARS)):
+        assert rows[idx+1][:3]==['ohp', str(E.Date(columns['night'][idx])), STARS[idx][0]]
+        assert abs(columns['obs'][idx]-ref['hours'][0, idx])<1e-4
+        assert abs(float(rows[idx+1][3])-ref['hours'][0, idx])<1e-4
+        assert np.allclose(columns['airmass'][idx], ref['airmass'][0, idx], rtol=1e-6, equal_nan=True)
+        assert abs(columns['transit_time'][idx]-ref['transit_time'][0, idx])<1e-9